@@ -0,0 +1,93 @@
+"""
+Mapping upgrade benchmark on deep trees: a chain of `--depth` levels, each one with `--width` sibling sub models
+holding a couple of leaves.
+
+    PYTHONPATH=src python benchmarks/bench_mapping_upgrade.py [--depth 200] [--width 20]
+
+Compares the path index lookups of CorvinaManager._mapping_update_fun against the previous recursive go_to_path ones.
+"""
+import argparse
+import functools
+import time
+
+from model.corvina_manager import CorvinaManager
+from model.datamodel.datamodel_root import DataModelRoot
+from model.mapping.mapping_root import MappingRoot
+from model.tree.intermediate_node import IntermediateNode
+from model.tree.tree_node import TreeNode
+from utils.tree_index import TreeIndex
+from utils.tree_visit_utils import dfs, walk_tree
+
+MAPPING_LEAF = {
+    'version': '1.0.0', 'type': 'integer', 'mode': 'R', 'historyPolicy': {'enabled': True},
+    'sendPolicy': {'triggers': [{'changeMask': 'value', 'minIntervalMs': 1000, 'skipFirstNChanges': 0, 'type': 'onchange'}]}
+}
+
+
+def build_deep_tree(depth: int, width: int, version: str, mapping: bool) -> dict:
+    def _leaf(source: str) -> dict:
+        return dict(MAPPING_LEAF, datalink={'source': source}) if mapping else {'version': '1.0.0', 'type': 'integer'}
+
+    root = {'type': 'object', 'instanceOf': f'Bench:{version}', 'properties': {}}
+    node, name = root, 'Bench'
+    for level in range(depth):
+        for i in range(width):
+            cell_name = f'{name}.Cell{i}'
+            node['properties'][f'Cell{i}'] = {
+                'type': 'object', 'instanceOf': f'{cell_name}:{version}',
+                'properties': {'Value': _leaf(f'{cell_name}.Value'), 'Count': _leaf(f'{cell_name}.Count')}
+            }
+        name = f'{name}.L{level}'
+        child = {'type': 'object', 'instanceOf': f'{name}:{version}', 'properties': {}}
+        node['properties'][f'L{level}'] = child
+        node = child
+    return {'name': 'Bench_Mapping' if mapping else 'Bench', 'data': root}
+
+
+def legacy_go_to_path(root: TreeNode, path: list[str]) -> TreeNode:
+    if len(path) == 0:
+        return root
+    return legacy_go_to_path(root.get_tree_node_children()[path[0]], path[1:])
+
+
+def legacy_mapping_update_fun(mapping_to_edit: TreeNode, node: TreeNode, path: str) -> bool:
+    if isinstance(node, IntermediateNode):
+        mapping_node = legacy_go_to_path(mapping_to_edit, node.get_tree_node_name().split('.')[1:])
+        if node.get_node_version() != mapping_node.get_node_version():
+            mapping_node.instanceOf = node.get_tree_node_name() + ':' + node.get_node_version()
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--depth', type=int, default=200)
+    parser.add_argument('--width', type=int, default=20)
+    args = parser.parse_args()
+
+    upgraded_model = DataModelRoot.from_dict(build_deep_tree(args.depth, args.width, '1.1.0', mapping=False))
+    mapping_dict = build_deep_tree(args.depth, args.width, '1.0.0', mapping=True)
+    print(f'depth {args.depth}, {args.depth * (args.width + 1)} sub models')
+
+    start = time.perf_counter()
+    for _ in walk_tree(upgraded_model.data):
+        pass
+    print(f'{"traversal only":<30} {time.perf_counter() - start:8.3f} s')
+
+    mapping = MappingRoot.from_dict(mapping_dict)
+    start = time.perf_counter()
+    dfs(upgraded_model.data, functools.partial(legacy_mapping_update_fun, mapping.data))
+    print(f'{"go_to_path (recursive)":<30} {time.perf_counter() - start:8.3f} s')
+    legacy_mapping = mapping
+
+    mapping = MappingRoot.from_dict(mapping_dict)
+    start = time.perf_counter()
+    mapping_index = TreeIndex(mapping.data)
+    for node, path, _ in walk_tree(upgraded_model.data):
+        CorvinaManager._mapping_update_fun(mapping_index, node, path)
+    print(f'{"TreeIndex (incl. build)":<30} {time.perf_counter() - start:8.3f} s')
+
+    assert mapping == legacy_mapping, 'The upgraded mappings differ!'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Mapping memory benchmark: sample_files/mapping_4.json replicated up to ~500k leaves.
+
+    PYTHONPATH=src python benchmarks/bench_memory.py [--leaves 500000]
+
+Prints the process RSS before parsing (the serialized mapping), the peak RSS of decode + parse, the RSS once parsed
+(decoded JSON still alive) and the heap still held
+by the parsed MappingRoot once the decoded JSON is released, traced by tracemalloc in a second parse (the RSS hardly
+goes down after a release, as the allocator arenas stay fragmented).
+"""
+import argparse
+import gc
+import pathlib
+import resource
+import tracemalloc
+
+import orjson
+
+from model.mapping.mapping_root import MappingRoot
+
+SAMPLE_FILES = pathlib.Path(__file__).parents[1] / 'sample_files'
+
+
+def _count_leaves(node: dict) -> int:
+    return sum(_count_leaves(p) if p['type'] == 'object' else 1 for p in node['properties'].values())
+
+
+def build_scaled_mapping(leaves: int) -> tuple[bytes, int]:
+    """ Serialized mapping holding the sample tree under Bench.Plant<i>, built without decoding the copies """
+    template = orjson.loads((SAMPLE_FILES / 'mapping_4.json').read_bytes())['data']
+    template_leaves = _count_leaves(template)
+    plants = max(1, leaves // template_leaves)
+
+    template.pop('instanceOf')
+    body = orjson.dumps(template)[1:]  # everything after the opening brace
+    parts = [b'{"name":"Bench_Mapping","data":{"type":"object","instanceOf":"Bench:1.0.0","properties":{']
+    for i in range(plants):
+        parts.append(b'%s"Plant%d":{"instanceOf":"Bench.Plant%d:1.0.0",%s' % (b',' if i > 0 else b'', i, i, body))
+    parts.append(b'}}}')
+    return b''.join(parts), plants * template_leaves
+
+
+def _current_rss_mb() -> float:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 1024 / 1024
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--leaves', type=int, default=500_000)
+    args = parser.parse_args()
+
+    raw, leaves = build_scaled_mapping(args.leaves)
+    gc.collect()
+    before = _current_rss_mb()
+
+    mapping = MappingRoot.from_dict(orjson.loads(raw))
+    parsed = _current_rss_mb()
+    peak = _peak_rss_mb()
+    del mapping
+    gc.collect()
+
+    tracemalloc.start()  # from the decode on: leaves may keep pieces of the decoded JSON
+    data = orjson.loads(raw)
+    mapping = MappingRoot.from_dict(data)
+    del data
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'leaves: {leaves} ({len(mapping.data.properties)} plants)')
+    print(f'{"RSS before (MB)":>16} {"peak RSS (MB)":>14} {"RSS parsed (MB)":>16} {"tree heap (MB)":>15} {"bytes/leaf":>11}')
+    print(f'{before:>16.1f} {peak:>14.1f} {parsed:>16.1f} {retained / 1024 / 1024:>15.1f} {retained / leaves:>11.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Mapping parse benchmark: sample_files/mapping_4.json replicated up to realistic plant sizes.
+
+    PYTHONPATH=src python benchmarks/bench_parse.py [--sizes-mb 5 20 50]
+
+For each size prints the JSON decode time, the MappingRoot.from_dict time and the peak memory allocated by the parse.
+"""
+import argparse
+import copy
+import gc
+import pathlib
+import time
+import tracemalloc
+
+import orjson
+
+from model.mapping.mapping_root import MappingRoot
+
+SAMPLE_FILES = pathlib.Path(__file__).parents[1] / 'sample_files'
+
+
+def build_scaled_mapping(size_mb: float) -> bytes:
+    """ Replicates the sample mapping tree under Bench.Plant<i> until the serialized mapping reaches `size_mb` """
+    template = orjson.loads((SAMPLE_FILES / 'mapping_4.json').read_bytes())
+    template_size = len(orjson.dumps(template['data']))
+    plants = max(1, int(size_mb * 1024 * 1024 / template_size))
+
+    root = {'type': 'object', 'instanceOf': 'Bench:1.0.0', 'properties': {}}
+    for i in range(plants):
+        plant = copy.deepcopy(template['data'])
+        plant['instanceOf'] = f'Bench.Plant{i}:1.0.0'
+        root['properties'][f'Plant{i}'] = plant
+    return orjson.dumps({'name': 'Bench_Mapping', 'data': root})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes-mb', type=float, nargs='+', default=[5, 20, 50])
+    args = parser.parse_args()
+
+    print(f'{"size (MB)":>10} {"decode (s)":>11} {"from_dict (s)":>14} {"peak (MB)":>10}')
+    for size_mb in args.sizes_mb:
+        raw = build_scaled_mapping(size_mb)
+        gc.collect()
+
+        start = time.perf_counter()
+        data = orjson.loads(raw)
+        decoded = time.perf_counter()
+        MappingRoot.from_dict(data)
+        parsed = time.perf_counter()
+
+        gc.collect()
+        tracemalloc.start()
+        MappingRoot.from_dict(data)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f'{len(raw) / 1024 / 1024:>10.1f} {decoded - start:>11.3f} {parsed - decoded:>14.3f} {peak / 1024 / 1024:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Data model diff benchmark over the sample datamodels scaled up to ~100k leaves.
+
+    PYTHONPATH=src python benchmarks/bench_tree_diff.py [--leaves 100000]
+
+Compares the digest based diff, digests of both trees included, against a full walk of both trees (digests disabled).
+Leaf digests are taken while parsing (a cached lookup per leaf), so the parse times include them.
+"""
+import argparse
+import copy
+import pathlib
+import time
+import unittest.mock
+
+import orjson
+
+from model.datamodel.datamodel_root import DataModelRoot
+from model.tree.tree_node import TreeNode
+from utils.tree_utils import compute_data_model_difference_map
+
+SAMPLE_FILES = pathlib.Path(__file__).parents[1] / 'sample_files'
+
+
+def _count_leaves(node: dict) -> int:
+    return sum(_count_leaves(p) if p['type'] == 'object' else 1 for p in node['properties'].values())
+
+
+def build_scaled_model(sample: str, leaves: int, sites: int = 20) -> dict:
+    """ Replicates the sample tree under Bench.Site<j>.Plant<i> until the requested number of leaves is reached """
+    template = orjson.loads((SAMPLE_FILES / sample).read_bytes())['data']
+    plants = max(1, leaves // _count_leaves(template))
+    root = {'type': 'object', 'instanceOf': 'Bench:1.0.0', 'properties': {}}
+    for i in range(plants):
+        site_name = f'Site{i % sites}'
+        site = root['properties'].setdefault(site_name, {'type': 'object', 'instanceOf': f'Bench.{site_name}:1.0.0', 'properties': {}})
+        plant = copy.deepcopy(template)
+        plant['instanceOf'] = f'Bench.{site_name}.Plant{i}:1.0.0'
+        site['properties'][f'Plant{i}'] = plant
+    return {'name': 'Bench', 'data': root}
+
+
+def _timed(label: str, fun):
+    start = time.perf_counter()
+    res = fun()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<40} {elapsed:8.3f} s')
+    return res, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--leaves', type=int, default=100_000)
+    args = parser.parse_args()
+
+    old_dict = build_scaled_model('datamodel_4.json', args.leaves)
+    new_dict = copy.deepcopy(old_dict)
+    # a small changed region: one leaf type changed and one new leaf in a single plant
+    plant = new_dict['data']['properties']['Site3']['properties']['Plant3']
+    plant['properties']['ECommon']['properties']['BenchNewLeaf'] = {'version': '1.0.0', 'type': 'integer'}
+    print(f'Leaves per model: {_count_leaves(old_dict["data"])}')
+
+    old_model, _ = _timed('parse old model', lambda: DataModelRoot.from_dict(old_dict))
+    new_model, _ = _timed('parse new model', lambda: DataModelRoot.from_dict(new_dict))
+    # the intermediate digests of both models are computed by this first diff
+    diff_map, digest_time = _timed('diff (digests included)', lambda: compute_data_model_difference_map(old_model, new_model))
+
+    with unittest.mock.patch.object(TreeNode, 'get_tree_node_digest', lambda node: id(node)):
+        full_diff_map, full_time = _timed('diff (full walk)', lambda: compute_data_model_difference_map(old_model, new_model))
+
+    assert diff_map.keys() == full_diff_map.keys()
+    print(f'Differences found: {len(diff_map)}, the digest diff is {full_time / digest_time:.2f}x faster than the full walk')
+
+
+if __name__ == '__main__':
+    main()
@@ -9,8 +9,47 @@ corvina_org = os.environ.get('FACTORYAL_CORVINA_ORG')
 corvina_suffix = os.environ.get('FACTORYAL_CORVINA_SUFFIX', '.io')
 corvina_prefix = os.environ.get('FACTORYAL_CORVINA_PREFIX')
 
+# HTTP connection pool
+corvina_max_connections_per_host = int(os.environ.get('FACTORYAL_CORVINA_MAX_CONNECTIONS_PER_HOST', '10'))
+corvina_keepalive_timeout = float(os.environ.get('FACTORYAL_CORVINA_KEEPALIVE_TIMEOUT', '30'))
+corvina_dns_cache_ttl = int(os.environ.get('FACTORYAL_CORVINA_DNS_CACHE_TTL', '300'))
+corvina_max_in_flight_requests = int(os.environ.get('FACTORYAL_CORVINA_MAX_IN_FLIGHT_REQUESTS', '0'))  # 0 = no limit
+# Request bodies bigger than this (bytes) are sent gzipped, 0 = never (responses are always accepted compressed)
+corvina_gzip_request_threshold = int(os.environ.get('FACTORYAL_CORVINA_GZIP_REQUEST_THRESHOLD', '0'))
+
+# Rate limiting and retries
+corvina_rate_limit = float(os.environ.get('FACTORYAL_CORVINA_RATE_LIMIT', '20'))  # req/s, 0 = no limit
+corvina_rate_burst = int(os.environ.get('FACTORYAL_CORVINA_RATE_BURST', '20'))
+corvina_max_retries = int(os.environ.get('FACTORYAL_CORVINA_MAX_RETRIES', '5'))
+corvina_retry_base_delay = float(os.environ.get('FACTORYAL_CORVINA_RETRY_BASE_DELAY', '0.5'))
+corvina_retry_max_delay = float(os.environ.get('FACTORYAL_CORVINA_RETRY_MAX_DELAY', '30'))
+
+# Paged queries
+corvina_page_size = int(os.environ.get('FACTORYAL_CORVINA_PAGE_SIZE', '500'))
+corvina_page_prefetch = int(os.environ.get('FACTORYAL_CORVINA_PAGE_PREFETCH', '2'))
+corvina_lookup_cache_ttl = float(os.environ.get('FACTORYAL_CORVINA_LOOKUP_CACHE_TTL', '60'))
+
+# Local cache of the Corvina models (disabled when not set)
+model_cache_dir = os.environ.get('FACTORYAL_MODEL_CACHE_DIR')
+
+# Async jobs polling
+corvina_job_poll_initial_delay = float(os.environ.get('FACTORYAL_CORVINA_JOB_POLL_INITIAL_DELAY', '1'))
+corvina_job_poll_max_delay = float(os.environ.get('FACTORYAL_CORVINA_JOB_POLL_MAX_DELAY', '30'))
+corvina_job_timeout = float(os.environ.get('FACTORYAL_CORVINA_JOB_TIMEOUT', '900'))
+# Presets bigger than this (bytes) are created through the async mapping job API, 0 = never
+corvina_async_mapping_threshold = int(os.environ.get('FACTORYAL_CORVINA_ASYNC_MAPPING_THRESHOLD', str(8 * 1024 * 1024)))
+
+# Identical sub models are created once and referenced from every occurrence
+dedup_sub_models = os.environ.get('FACTORYAL_DEDUP_SUB_MODELS', 'false').lower() in ('1', 'true', 'yes')
+
+# Deploys whose fingerprint matches the one stored in the deployed preset are not synced again
+skip_unchanged_deploys = os.environ.get('FACTORYAL_SKIP_UNCHANGED_DEPLOYS', 'true').lower() in ('1', 'true', 'yes')
+
 # Debug part!!!
 tree_path_separator_char = os.environ.get('FACTORYAL_TREE_PATH_SEPARATOR', '.')
+max_concurrent_upgrades = int(os.environ.get('FACTORYAL_MAX_CONCURRENT_UPGRADES', '8'))
+max_concurrent_deploys = int(os.environ.get('FACTORYAL_MAX_CONCURRENT_DEPLOYS', '4'))
+max_concurrent_device_assignments = int(os.environ.get('FACTORYAL_MAX_CONCURRENT_DEVICE_ASSIGNMENTS', '16'))
 
 
 def validate_configuration():
@@ -1,16 +1,100 @@
 
+import asyncio
+import collections
+import collections.abc
+import contextlib
+import contextvars
+import dataclasses
+import gzip
 import orjson
 import aiohttp
 import logging
+import time
+import zlib
 
+from corvina_connector.rate_limiter import AdaptiveTokenBucket, backoff_delay, parse_retry_after
 from model.datamodel.datamodel_root import DataModelRoot
 from model.device.corvina_device import CorvinaDevice
+from model.device.device_group_config_job import DeviceGroupConfigJob
+from model.mapping.mapping_job import MappingJob, MappingJobStatus
 from model.mapping.mapping_root import MappingRoot
+from model.model_catalog import ModelCatalog
+from model.semver_version import SemverVersion
+from utils.corvina_version_utils import split_instance_of
+from utils.async_utils import poll_with_backoff
 from utils.dataclass_utils import BaseDataClass
-from utils.dict_utils import remove_nulls
+from utils.payload_utils import dumps_payload
+from utils.ttl_cache import TtlCache
 
 logger = logging.getLogger('app.corvina')
 
+_MISSING = object()  # cached lookups may be None
+_NEWEST_FIRST = {'orderBy': 'creationDate', 'orderDir': 'desc'}  # a preset name may be on a model version more than once
+
+
+@dataclasses.dataclass
+class UploadStats(BaseDataClass):
+    """ Request bodies sent within count_uploads, e.g. along one sync """
+    requests: int = 0
+    bytes_sent: int = 0  # before compression
+    wire_bytes_sent: int = 0
+
+
+_upload_stats: contextvars.ContextVar[UploadStats | None] = contextvars.ContextVar('upload_stats', default=None)
+
+
+@contextlib.contextmanager
+def count_uploads() -> collections.abc.Iterator[UploadStats]:
+    """ Counts the bodies sent by the current task and by the tasks it starts meanwhile (they share its context) """
+    stats = UploadStats()
+    token = _upload_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _upload_stats.reset(token)
+
+
+def record_upload(size: int, wire_size: int):
+    stats = _upload_stats.get()
+    if stats is not None:
+        stats.requests += 1
+        stats.bytes_sent += size
+        stats.wire_bytes_sent += wire_size
+
+
+@dataclasses.dataclass
+class ConnectionStats(BaseDataClass):
+    requests: int = 0
+    connections_created: int = 0
+    connections_reused: int = 0
+    dns_cache_hits: int = 0
+    dns_cache_misses: int = 0
+    retries: int = 0
+    throttled_responses: int = 0  # 429 and 503 responses
+    throttled_time: float = 0.0  # seconds waited for the rate limiter
+    retry_wait_time: float = 0.0  # seconds slept before retrying
+    bytes_sent: int = 0  # request bodies before compression
+    wire_bytes_sent: int = 0
+    bytes_received: int = 0  # response bodies after decompression
+    wire_bytes_received: int = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        total = self.connections_created + self.connections_reused
+        return self.connections_reused / total if total > 0 else 0.0
+
+
+def decode_body(raw: bytes, content_encoding: str | None) -> bytes:
+    """ Response body as sent by the server, decompressed (the session does not decompress, to count wire bytes) """
+    content_encoding = (content_encoding or 'identity').strip().lower()
+    if content_encoding in ('identity', ''):
+        return raw
+    assert content_encoding in ('gzip', 'x-gzip', 'deflate'), f'Unsupported response encoding {content_encoding}'
+    try:
+        return zlib.decompress(raw, wbits=32 + zlib.MAX_WBITS)  # gzip or zlib header
+    except zlib.error:
+        return zlib.decompress(raw, wbits=-zlib.MAX_WBITS)  # raw deflate, sent by some servers
+
 
 class CorvinaClient:
 
@@ -20,13 +104,47 @@ class CorvinaClient:
         username: str,
         token: str,
         corvina_suffix: str,
-        corvina_prefix: str
+        corvina_prefix: str,
+        max_connections_per_host: int = 10,
+        keepalive_timeout: float = 30.0,
+        dns_cache_ttl: int = 300,
+        page_size: int = 500,
+        page_prefetch: int = 2,
+        lookup_cache_ttl: float = 60.0,
+        max_in_flight_requests: int = 0,
+        job_poll_initial_delay: float = 1.0,
+        job_poll_max_delay: float = 30.0,
+        job_timeout: float = 900.0,
+        rate_limit: float = 20.0,
+        rate_burst: int = 20,
+        max_retries: int = 5,
+        retry_base_delay: float = 0.5,
+        retry_max_delay: float = 30.0,
+        async_mapping_threshold: int = 0,
+        gzip_request_threshold: int = 0,
+        base_url: str | None = None
     ):
         self._org = org
         self._username = username
         self._token = token
         self._corvina_suffix = corvina_suffix
         self._corvina_prefix = corvina_prefix
+        self._max_connections_per_host = max_connections_per_host
+        self._keepalive_timeout = keepalive_timeout
+        self._dns_cache_ttl = dns_cache_ttl
+        self._page_size = page_size
+        self._page_prefetch = page_prefetch
+        self._job_poll_initial_delay = job_poll_initial_delay
+        self._job_poll_max_delay = job_poll_max_delay
+        self._job_timeout = job_timeout
+        self._async_mapping_threshold = async_mapping_threshold  # payload bytes, 0 = never use the async mapping jobs
+        self._gzip_request_threshold = gzip_request_threshold  # request body bytes, 0 = never compress them
+        self._gzip_requests_accepted = True  # until the server answers 415 to a compressed body
+        self._max_retries = max_retries
+        self._retry_base_delay = retry_base_delay
+        self._retry_max_delay = retry_max_delay
+        self._rate_limiter = AdaptiveTokenBucket(rate_limit, rate_burst) if rate_limit > 0 else None
+        self._base_url = base_url or f'https://{self._corvina_prefix}corvina{self._corvina_suffix}/svc/mappings/'
 
         # self._api_client = ApiClient(
         #     configuration=Configuration(
@@ -35,186 +153,403 @@ class CorvinaClient:
         #     )
         # )
 
+        # Global request budget, shared by every caller of this client (0 = only bounded by the connection pool)
+        self._request_slots = asyncio.Semaphore(max_in_flight_requests) if max_in_flight_requests > 0 else contextlib.nullcontext()
+
+        # Results of the targeted lookups (find_*, get_datamodel_versions/names); any write clears it
+        self._lookup_cache = TtlCache(lookup_cache_ttl)
+
         self._jwt_token: str | None = None
+        self._http_session: aiohttp.ClientSession | None = None
+        self.stats = ConnectionStats()
+
+    async def __aenter__(self) -> 'CorvinaClient':
+        connector = aiohttp.TCPConnector(
+            limit_per_host=self._max_connections_per_host,
+            keepalive_timeout=self._keepalive_timeout,
+            ttl_dns_cache=self._dns_cache_ttl,
+            use_dns_cache=True
+        )
+        self._http_session = aiohttp.ClientSession(
+            connector=connector,
+            base_url=self._base_url,
+            headers={'Accept-Encoding': 'gzip, deflate'},
+            auto_decompress=False,  # see decode_body
+            trace_configs=[self._create_trace_config()]
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self._http_session is not None:
+            await self._http_session.close()
+            self._http_session = None
+        logger.info(
+            f'HTTP stats: {self.stats.requests} requests, {self.stats.connections_created} connections created, '
+            f'{self.stats.connections_reused} reused ({self.stats.reuse_ratio:.0%}), '
+            f'DNS cache {self.stats.dns_cache_hits} hits / {self.stats.dns_cache_misses} misses, '
+            f'lookup cache {self._lookup_cache.hits} hits / {self._lookup_cache.misses} misses'
+        )
+        logger.info(
+            f'Throttling stats: {self.stats.retries} retries, {self.stats.throttled_responses} throttled responses, '
+            f'{self.stats.throttled_time:.1f}s waiting the rate limiter'
+            f'{f" (now {self._rate_limiter.rate:.1f} req/s)" if self._rate_limiter is not None else ""}, '
+            f'{self.stats.retry_wait_time:.1f}s waiting before retries'
+        )
+        logger.info(
+            f'Transfer stats: sent {self.stats.bytes_sent / 1024:.1f} KiB ({self.stats.wire_bytes_sent / 1024:.1f} KiB on the wire), '
+            f'received {self.stats.bytes_received / 1024:.1f} KiB ({self.stats.wire_bytes_received / 1024:.1f} KiB on the wire)'
+        )
 
-    async def login(self):
-        logger.info(f'Logging client {self._username} to https://{self._corvina_prefix}corvina{self._corvina_suffix} org {self._org}')
-        async with aiohttp.ClientSession(auth=aiohttp.BasicAuth(self._username, self._token)) as session:
-            async with session.post(
-                url=f'https://auth.corvina{self._corvina_suffix}/auth/realms/{self._org}/protocol/openid-connect/token',
-                headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                data=f'grant_type=client_credentials&scope=org:{self._org}'
-            ) as req:
-                token = await req.json(loads=orjson.loads)
-                assert 'error' not in token, f'Cannot perform Corvina Login! Got {token}'
-                self._jwt_token = token['access_token']
-                # self._api_client.configuration.api_key['Authorization'] = self._jwt_token
-
-    # @staticmethod
-    # async def _merge_pages(session: aiohttp.ClientSession, url: str) -> list[dict]:
-    #     res = []
-    #     cur_page = 0
-    #     is_last_page = False
-    #     while not is_last_page:
-    #         logger.debug(f'GET {url}&page={cur_page}')
-    #         async with session.get(url + f'&page={cur_page}') as req:
-    #             data = await req.text()
-    #             assert req.ok, f'Got {req.status} with body {data} while asking for {url}&page={cur_page}'
-    #             json_data = orjson.loads(data)
-    #             assert 'number' in json_data and 'data' in json_data and 'last' in json_data, f'Got invalid body {json_data}'
-    #
-    #             res.extend(json_data['data'])
-    #             is_last_page = json_data['last']
-    #             cur_page += 1
-    #
-    #     return res
+    def _create_trace_config(self) -> aiohttp.TraceConfig:
+        async def on_request_start(_session, _ctx, _params):
+            self.stats.requests += 1
 
-    @staticmethod
-    async def _get_json(session: aiohttp.ClientSession, path: str, **kwargs) -> dict:
-        async with session.get(path, params=kwargs) as req:
-            data = await req.text()
-            assert req.ok, f'Got {req.status} with body {data} while asking for {path}'
-            return orjson.loads(data)
+        async def on_connection_create_end(_session, _ctx, _params):
+            self.stats.connections_created += 1
 
-    @staticmethod
-    async def _delete_json(session: aiohttp.ClientSession, path: str, data: str | bytes | None = None, **kwargs) -> dict:
-        async with session.delete(path, data=data, params=kwargs) as req:
-            data = await req.text()
-            assert req.ok, f'Got {req.status} with body {data} while asking for {path}'
-            return orjson.loads(data)
+        async def on_connection_reuseconn(_session, _ctx, _params):
+            self.stats.connections_reused += 1
 
-    @staticmethod
-    async def _put_json(session: aiohttp.ClientSession, path: str, data: str | bytes, **kwargs) -> dict:
+        async def on_dns_cache_hit(_session, _ctx, _params):
+            self.stats.dns_cache_hits += 1
+
+        async def on_dns_cache_miss(_session, _ctx, _params):
+            self.stats.dns_cache_misses += 1
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+    async def login(self):
+        logger.info(f'Logging client {self._username} to https://{self._corvina_prefix}corvina{self._corvina_suffix} org {self._org}')
+        async with self._session.post(
+            url=f'https://auth.corvina{self._corvina_suffix}/auth/realms/{self._org}/protocol/openid-connect/token',
+            auth=aiohttp.BasicAuth(self._username, self._token),
+            headers={'Content-Type': 'application/x-www-form-urlencoded'},
+            data=f'grant_type=client_credentials&scope=org:{self._org}'
+        ) as req:
+            token = orjson.loads(decode_body(await req.read(), req.headers.get('Content-Encoding')))
+            assert 'error' not in token, f'Cannot perform Corvina Login! Got {token}'
+            self._jwt_token = token['access_token']
+            # self._api_client.configuration.api_key['Authorization'] = self._jwt_token
+
+    async def _iter_pages(self, path: str, **kwargs) -> collections.abc.AsyncIterator[list[dict]]:
+        """
+        Yields the `data` list of every page of a paged endpoint, in order. Once the first page says there is more,
+        up to `page_prefetch` following pages are downloaded in background (at most that many requests pending, the
+        awaited one included; with 0 each page is asked once the previous one is consumed); closing the generator
+        early (e.g. with contextlib.aclosing) cancels them.
+        """
+        def fetch_pages(count: int):
+            nonlocal next_page
+            while len(pending) < count and (total_pages is None or next_page < total_pages):
+                pending.append(asyncio.ensure_future(self._get_json(path, page=next_page, pageSize=self._page_size, **kwargs)))
+                next_page += 1
+
+        pending: collections.deque[asyncio.Future] = collections.deque()
+        next_page = 0
+        total_pages: int | None = None  # known once the server reports it
+        try:
+            fetch_pages(1)
+            while len(pending) > 0:
+                json_data = await pending.popleft()
+                assert 'data' in json_data and 'last' in json_data, f'Got invalid body {json_data} while asking for {path}'
+                logger.debug(f'Got page {json_data.get("number")} of {path} with {len(json_data["data"])} items')
+                if json_data['last'] or len(json_data['data']) == 0:
+                    if len(json_data['data']) > 0:
+                        yield json_data['data']
+                    return
+
+                total_pages = json_data.get('totalPages', total_pages)
+                fetch_pages(self._page_prefetch)  # downloaded while the caller consumes this page
+                yield json_data['data']
+                fetch_pages(1)
+        finally:
+            for future in pending:
+                future.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _request_json(self, method: str, path: str, data: str | bytes | None, headers: dict[str, str], params: dict) -> dict:
+        """
+        Performs the request through the rate limiter. Throttled responses are retried, honoring Retry-After: 429,
+        and 503 too for idempotent verbs (everything but POST); a POST gets a 503 retried only along with Retry-After,
+        as a gateway may answer it after the backend created the object. Other server errors and connection errors are
+        retried only for idempotent verbs. Retries wait a jittered exponential backoff. The last failure is reported as before (AssertionError or the raised error).
+        Bodies above gzip_request_threshold go out gzipped (plain again once the server answers 415); responses are
+        accepted gzip/deflate compressed and parsed straight from their bytes.
+        """
+        idempotent = method != 'POST'
+        body = data.encode() if isinstance(data, str) else data
+        wire_body, wire_headers = await self._maybe_compress(body, headers)
+        attempt = 0
+        while True:
+            if self._rate_limiter is not None:
+                start = time.monotonic()
+                await self._rate_limiter.acquire()
+                self.stats.throttled_time += time.monotonic() - start
+
+            retry_after: float | None = None
+            try:
+                async with self._request_slots, self._session.request(method, path, headers=wire_headers, data=wire_body, params=params) as req:
+                    raw = await req.read()
+                    self.stats.bytes_sent += len(body or b'')
+                    self.stats.wire_bytes_sent += len(wire_body or b'')
+                    if body is not None:
+                        record_upload(len(body), len(wire_body))
+                    if req.status == 415 and wire_body is not body:
+                        logger.warning(f'Compressed request bodies refused while {method} {path}, sending them uncompressed')
+                        self._gzip_requests_accepted = False
+                        wire_body, wire_headers = body, headers
+                        continue
+                    response_body = decode_body(raw, req.headers.get('Content-Encoding'))
+                    self.stats.bytes_received += len(response_body)
+                    self.stats.wire_bytes_received += len(raw)
+
+                    throttled = req.status == 429 or (req.status == 503 and (idempotent or 'Retry-After' in req.headers))
+                    if throttled:
+                        self.stats.throttled_responses += 1
+                        retry_after = parse_retry_after(req.headers.get('Retry-After'))
+                        if self._rate_limiter is not None:
+                            self._rate_limiter.on_throttled(retry_after)
+                    elif req.ok and self._rate_limiter is not None:
+                        self._rate_limiter.on_success()
+
+                    retryable = throttled or (idempotent and req.status >= 500)
+                    if not retryable or attempt >= self._max_retries:
+                        assert req.ok, f'Got {req.status} with body {response_body.decode(errors="replace")} while {method} {path}'
+                        return orjson.loads(response_body)
+                    logger.warning(f'Got {req.status} while {method} {path}, retrying ({attempt + 1}/{self._max_retries})')
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if not idempotent or attempt >= self._max_retries:
+                    raise
+                logger.warning(f'Got {type(e).__name__} while {method} {path}, retrying ({attempt + 1}/{self._max_retries})')
+
+            delay = max(retry_after or 0.0, backoff_delay(attempt, self._retry_base_delay, self._retry_max_delay))
+            self.stats.retries += 1
+            self.stats.retry_wait_time += delay
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _maybe_compress(self, body: bytes | None, headers: dict[str, str]) -> tuple[bytes | None, dict[str, str]]:
+        if body is None or not self._gzip_requests_accepted or not 0 < self._gzip_request_threshold <= len(body):
+            return body, headers
+        compressed = await asyncio.to_thread(gzip.compress, body, 6)  # big models and mappings: off the event loop
+        return compressed, headers | {'Content-Encoding': 'gzip'}
+
+    async def _get_json(self, path: str, **kwargs) -> dict:
+        return await self._request_json('GET', path, None, self._headers(), kwargs)
+
+    async def _delete_json(self, path: str, data: str | bytes | None = None, **kwargs) -> dict:
+        self._lookup_cache.clear()
+        return await self._request_json('DELETE', path, data, self._headers(), kwargs)
+
+    async def _put_json(self, path: str, data: str | bytes, **kwargs) -> dict:
         logger.debug(f'Putting {data} to {path}')
-        async with session.put(path, headers={'Content-Type': 'application/json'}, data=data, params=kwargs) as req:
-            data = await req.text()
-            assert req.ok, f'Got {req.status} with body {data} while posting {data} in {path}'
-            return orjson.loads(data)
+        self._lookup_cache.clear()
+        return await self._request_json('PUT', path, data, self._headers({'Content-Type': 'application/json'}), kwargs)
 
-    @staticmethod
-    async def _post_json(session: aiohttp.ClientSession, path: str, data: str | bytes, **kwargs) -> dict:
+    async def _post_json(self, path: str, data: str | bytes, **kwargs) -> dict:
         logger.debug(f'Posting {data} to {path}')
-        async with session.post(path, headers={'Content-Type': 'application/json'}, data=data, params=kwargs) as req:
-            data = await req.text()
-            assert req.ok, f'Got {req.status} with body {data} while posting {data} in {path}'
-            return orjson.loads(data)
+        self._lookup_cache.clear()
+        return await self._request_json('POST', path, data, self._headers({'Content-Type': 'application/json'}), kwargs)
 
     @staticmethod
     def _prepare(obj: dict | BaseDataClass) -> bytes:
-        data = orjson.loads(orjson.dumps(obj))  # Not so efficient, but...
-        remove_nulls(data)
-        return orjson.dumps(data)
+        return dumps_payload(obj)
 
-    def _session(self) -> aiohttp.ClientSession:
-        return aiohttp.ClientSession(
-            headers={'Authorization': self._jwt_token or 'please-login'},
-            base_url=f'https://{self._corvina_prefix}corvina{self._corvina_suffix}/svc/mappings/'
-        )
+    def _headers(self, extra: dict[str, str] | None = None) -> dict[str, str]:
+        headers = {'Authorization': self._jwt_token or 'please-login'}
+        if extra is not None:
+            headers.update(extra)
+        return headers
 
-    # async def _get_paged_obj(self, path: str) -> list[dict]:
-    #     async with self._session() as session:
-    #         return await self._merge_pages(session, path)
+    @property
+    def _session(self) -> aiohttp.ClientSession:
+        assert self._http_session is not None, 'CorvinaClient must be used as an async context manager (async with CorvinaClient(...) as c)'
+        return self._http_session
 
     # ------------------------------------------------------------------------------------------------------------------
     # Devices Part
     # ------------------------------------------------------------------------------------------------------------------
+    async def iter_devices(self, **filters) -> collections.abc.AsyncIterator[CorvinaDevice]:
+        async for page in self._iter_pages('api/v1/devices', organization=self._org, **filters):
+            for i in page:
+                yield CorvinaDevice.from_dict(i)
+
     async def get_devices_by_id(self) -> dict[str, CorvinaDevice]:
         logger.info('Querying Devices')
-        async with self._session() as s:
-            response = await self._get_json(s, 'api/v1/devices', organization=self._org, pageSize=10000)
-            logger.debug(f'Got {orjson.dumps(response)}')
-
-        fix_items = [CorvinaDevice.from_dict(i) for i in response['data']]
-        return {i.id: i for i in fix_items}
+        return {i.id: i async for i in self.iter_devices()}
 
     async def set_device_mapping(self, device_id: str, mapping: MappingRoot):
         assert mapping.id is not None, 'Mapping id must be already set!'
         logger.info(f'Setting mapping {mapping.name}')
 
-        async with self._session() as s:
-            response = await self._put_json(s, f'api/v1/devices/{device_id}', orjson.dumps({'presetId': mapping.id}))
-            logger.debug(f'Got {orjson.dumps(response)}')
+        response = await self._put_json(f'api/v1/devices/{device_id}', orjson.dumps({'presetId': mapping.id}))
+        logger.debug(f'Got {orjson.dumps(response)}')
+
+    async def set_device_group_mapping(self, group_name: str, mapping: MappingRoot) -> DeviceGroupConfigJob:
+        assert mapping.id is not None, 'Mapping id must be already set!'
+        logger.info(f'Setting mapping {mapping.name} on device group {group_name}')
+
+        response = await self._put_json(
+            f'api/v1/devices/groups/{group_name}/async', orjson.dumps({'presetId': mapping.id}), organization=self._org
+        )
+        return DeviceGroupConfigJob.from_dict(response)
+
+    async def get_device_group_job(self, group_name: str, job_id: str) -> DeviceGroupConfigJob:
+        response = await self._put_json(f'api/v1/devices/groups/{group_name}/async/{job_id}', b'', organization=self._org)
+        return DeviceGroupConfigJob.from_dict(response)
+
+    async def wait_device_group_job(self, group_name: str, job: DeviceGroupConfigJob) -> DeviceGroupConfigJob:
+        if job.is_finished:
+            return job
+        job = await poll_with_backoff(
+            lambda: self.get_device_group_job(group_name, job.id), lambda j: j.is_finished,
+            self._job_poll_initial_delay, self._job_poll_max_delay, self._job_timeout
+        )
+        logger.info(f'Device group {group_name} job {job.id} finished with status {job.status.value}')
+        return job
 
     # ------------------------------------------------------------------------------------------------------------------
     # Models Part
     # ------------------------------------------------------------------------------------------------------------------
-    async def get_datamodels_by_id(self) -> dict[str, DataModelRoot]:
-        logger.info('Querying Models')
+    async def iter_datamodels(self, **filters) -> collections.abc.AsyncIterator[DataModelRoot]:
+        async for page in self._iter_pages('api/v1/models', organization=self._org, **filters):
+            for i in page:
+                yield DataModelRoot.from_dict(i)
+
+    async def iter_datamodel_keys(self) -> collections.abc.AsyncIterator[tuple[str, str, str]]:
+        """ (id, name, version) of every model, listed without the model contents """
+        async for page in self._iter_pages('api/v1/models', organization=self._org, omitContent='true'):
+            for i in page:
+                yield i['id'], i['name'], i['version']
 
-        async with self._session() as s:
-            response = await self._get_json(s, 'api/v1/models', organization=self._org, pageSize=10000)
-            logger.debug(f'Got {orjson.dumps(response)}')
+    async def get_datamodel_by_id(self, data_model_id: str) -> DataModelRoot:
+        return DataModelRoot.from_dict(await self._get_json(f'api/v1/models/{data_model_id}', organization=self._org))
 
-        fix_items = [DataModelRoot.from_dict(i) for i in response['data']]
-        return {i.id: i for i in fix_items}
+    async def get_datamodels_from_ids(self, data_model_ids: collections.abc.Iterable[str]) -> list[DataModelRoot]:
+        # Concurrency is bounded by the connection pool, the rate limiter and the request budget
+        return list(await asyncio.gather(*(self.get_datamodel_by_id(i) for i in data_model_ids)))
+
+    async def get_datamodels_by_id(self) -> dict[str, DataModelRoot]:
+        logger.info('Querying Models')
+        return {i.id: i async for i in self.iter_datamodels()}
 
         # api = ModelsApi(self._api_client)
         # models = await api.get_models(organization=self._org, page_size=1000)
         # return {m.id: m for m in models.data}
 
+    async def find_datamodel_id(self, name: str, version: str) -> str | None:
+        """ Id of model name:version, through a single filtered query that omits the model contents """
+        key = ('model_id', name, version)
+        cached = self._lookup_cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        response = await self._get_json(
+            'api/v1/models', organization=self._org, name=name, version=version, omitContent='true', page=0, pageSize=10
+        )
+        model_id = next(
+            (i['id'] for i in response['data'] if i.get('name', name) == name and i.get('version', version) == version),
+            None
+        )
+        self._lookup_cache.put(key, model_id)
+        return model_id
+
+    async def get_datamodel_versions(self, name: str) -> list[str]:
+        """ All the versions of model `name`, as reported by Corvina """
+        key = ('model_versions', name)
+        cached = self._lookup_cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        versions = []
+        async for page in self._iter_pages(f'api/v1/models/{name}/versions', organization=self._org, fullHistory='true'):
+            versions.extend(page)
+        self._lookup_cache.put(key, versions)
+        return versions
+
+    async def get_datamodel_names(self, search: str | None = None) -> list[str]:
+        """ Model names (optionally matching `search`), paged by name cursor """
+        key = ('model_names', search)
+        cached = self._lookup_cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        names = []
+        params = {'organization': self._org, 'pageSize': self._page_size} | ({'search': search} if search is not None else {})
+        while True:
+            response = await self._get_json('api/v1/models/names', **params)
+            names.extend(i['name'] for i in response['data'])
+            if response.get('last', True) or len(response['data']) == 0:
+                break
+            params['after'] = names[-1]
+        self._lookup_cache.put(key, names)
+        return names
+
     async def get_datamodel_from_name(self, name: str) -> list[DataModelRoot]:
         # https://app.corvina.cloud/svc/mappings/api/v1/models?name=PanaTest-Minikube&version=1.1.0&organization=factoryal
         logger.info(f'Querying Model {name}')
 
-        async with self._session() as s:
-            response = await self._get_json(s, 'api/v1/models', organization=self._org, pageSize=10000, name=name)
-            logger.debug(f'Got {orjson.dumps(response)}')
-
-        return [DataModelRoot.from_dict(i) for i in response['data']]
+        models = [m async for m in self.iter_datamodels(name=name)]
+        return sorted(models, key=lambda m: SemverVersion.from_string(m.version))  # oldest first
 
 
     async def create_data_model(self, data_model: DataModelRoot) -> DataModelRoot:
-        async with self._session() as s:
-            # Sample Payload
-            # {"name":"prova:1.0.0","data":{"type":"object","instanceOf":"prova:1.0.0","properties":{"a":{"type":"integer"}},"label":"","unit":"","description":"","tags":[]}}
-            data = await self._post_json(s, 'api/v1/models', self._prepare(data_model.get_create_model_payload()), organization=self._org)
-            new_data_model_root = DataModelRoot.from_dict(data)
-            logger.debug(f'Got {orjson.dumps(new_data_model_root)}')
-            return new_data_model_root
-
-            # TODO should check for equality, or better, set ids etc...
-
-    async def update_data_model(self, old_data_model: DataModelRoot, new_data_model: DataModelRoot, models_cache: dict[str, 'DataModelRoot'] | None = None) -> DataModelRoot:
-        await old_data_model.maybe_fetch_id(self, models_cache)
-
-        async with self._session() as s:
-            data = await self._put_json(
-                s, f'api/v1/models/{old_data_model.id}',
-                self._prepare(new_data_model), organization=self._org
-            )
-            logger.debug(f'Got {orjson.dumps(data)}')  # TODO dump our object instead of the raw response
-            new_data_model_root = DataModelRoot.from_dict(data['value'])
-            return new_data_model_root
+        # Sample Payload
+        # {"name":"prova:1.0.0","data":{"type":"object","instanceOf":"prova:1.0.0","properties":{"a":{"type":"integer"}},"label":"","unit":"","description":"","tags":[]}}
+        data = await self._post_json('api/v1/models', self._prepare(data_model.get_create_model_payload()), organization=self._org)
+        new_data_model_root = DataModelRoot.from_dict(data)
+        logger.debug(f'Got {orjson.dumps(new_data_model_root)}')
+        return new_data_model_root
+
+        # TODO should check for equality, or better, set ids etc...
+
+    async def update_data_model(self, old_data_model: DataModelRoot, new_data_model: DataModelRoot, catalog: ModelCatalog | None = None) -> DataModelRoot:
+        await old_data_model.maybe_fetch_id(self, catalog)
+
+        data = await self._put_json(
+            f'api/v1/models/{old_data_model.id}',
+            self._prepare(new_data_model), organization=self._org
+        )
+        logger.debug(f'Got {orjson.dumps(data)}')  # TODO dump our object instead of the raw response
+        new_data_model_root = DataModelRoot.from_dict(data['value'])
+        if catalog is not None:
+            catalog.add(new_data_model_root)
+        return new_data_model_root
 
     async def update_data_model_by_id(self, data_model_id: str, new_data_model: DataModelRoot) -> DataModelRoot:
-        async with self._session() as s:
-            data = await self._put_json(
-                s, f'api/v1/models/{data_model_id}',
-                self._prepare(new_data_model), organization=self._org
-            )
-            logger.debug(f'Got {orjson.dumps(data)}')  # TODO dump our object instead of the raw response
-            new_data_model_root = DataModelRoot.from_dict(data['value'])
-            return new_data_model_root
+        data = await self._put_json(
+            f'api/v1/models/{data_model_id}',
+            self._prepare(new_data_model), organization=self._org
+        )
+        logger.debug(f'Got {orjson.dumps(data)}')  # TODO dump our object instead of the raw response
+        new_data_model_root = DataModelRoot.from_dict(data['value'])
+        return new_data_model_root
 
-    async def delete_data_model(self, data_model: DataModelRoot, models_cache: dict[str, 'DataModelRoot'] | None = None):
+    async def delete_data_model(self, data_model: DataModelRoot, catalog: ModelCatalog | None = None):
         try:
-            await data_model.maybe_fetch_id(self, models_cache)
+            await data_model.maybe_fetch_id(self, catalog)
         except AssertionError:
             logger.warning(f'Cannot fetch id for model {data_model.name} {data_model.version}; maybe it has already been removed?')
             return
 
-        async with self._session() as s:
-            data = await self._delete_json(s, 'api/v1/models/' + data_model.id, organization=self._org)
-            deleted_data_model_root = DataModelRoot.from_dict(data)
-            logger.debug(f'Got {orjson.dumps(deleted_data_model_root)}')
-            # TODO should check something?
+        data = await self._delete_json('api/v1/models/' + data_model.id, organization=self._org)
+        deleted_data_model_root = DataModelRoot.from_dict(data)
+        logger.debug(f'Got {orjson.dumps(deleted_data_model_root)}')
+        if catalog is not None:
+            catalog.remove(data_model.id)
+        # TODO should check something?
 
     async def delete_data_model_by_id(self, data_model_id: str):
-        async with self._session() as s:
-            data = await self._delete_json(s, 'api/v1/models/' + data_model_id, organization=self._org)
-            deleted_data_model_root = DataModelRoot.from_dict(data)
-            logger.debug(f'Got {orjson.dumps(deleted_data_model_root)}')
-            # TODO should check something?
+        data = await self._delete_json('api/v1/models/' + data_model_id, organization=self._org)
+        deleted_data_model_root = DataModelRoot.from_dict(data)
+        logger.debug(f'Got {orjson.dumps(deleted_data_model_root)}')
+        # TODO should check something?
 
     # ------------------------------------------------------------------------------------------------------------------
     # Mappings Part
@@ -246,50 +581,113 @@ class CorvinaClient:
     # ------------------------------------------------------------------------------------------------------------------
     # Preset Part
     # ------------------------------------------------------------------------------------------------------------------
+    async def iter_presets(self, **filters) -> collections.abc.AsyncIterator[MappingRoot]:
+        async for page in self._iter_pages('api/v1/presets', organization=self._org, **filters):
+            for i in page:
+                yield MappingRoot.from_dict(i)
+
     async def get_presets_by_id(self) -> dict[str, MappingRoot]:
         logger.info('Querying Mappings')
-
-        async with self._session() as s:
-            response = await self._get_json(s, 'api/v1/presets', organization=self._org, pageSize=10000)
-            logger.debug(f'Got {orjson.dumps(response)}')
-
-        fix_items = [MappingRoot.from_dict(i) for i in response['data']]
-        return {i.id: i for i in fix_items}
+        return {i.id: i async for i in self.iter_presets()}
 
         # api = MappingsApi(self._api_client)
         # mappings = await api.search_mapping(organization=self._org, page_size=1000)
         # return {m.id: m for m in mappings.data}
 
+    async def find_preset_id(self, name: str, instance_of: str) -> str | None:
+        """ Id of preset `name` on model `instance_of` (name:version), looking only at the presets of that model """
+        key = ('preset_id', name, instance_of)
+        cached = self._lookup_cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        preset = await self.find_preset(name, instance_of)
+        preset_id = preset.id if preset is not None else None
+        self._lookup_cache.put(key, preset_id)
+        return preset_id
+
+    async def find_preset(self, name: str, instance_of: str) -> MappingRoot | None:
+        match = split_instance_of(instance_of)
+        assert match is not None, f'Invalid model reference {instance_of} for preset {name}'
+        model_id = await self.find_datamodel_id(*match)
+        if model_id is None:
+            return None
+
+        async with contextlib.aclosing(self.iter_presets(modelId=model_id, search=name, **_NEWEST_FIRST)) as presets:
+            async for preset in presets:
+                if preset.name == name and preset.data.instanceOf == instance_of:
+                    return preset
+        return None
+
+    async def find_latest_preset(self, name: str, model_name: str) -> MappingRoot | None:
+        """ Newest preset `name` on the latest version of model `model_name`, through two filtered queries (no catalog) """
+        versions = {
+            i['version']: i['id']
+            async for page in self._iter_pages('api/v1/models', organization=self._org, name=model_name, omitContent='true')
+            for i in page if i.get('name', model_name) == model_name
+        }
+        if len(versions) == 0:
+            return None
+
+        model_id = versions[max(versions, key=SemverVersion.from_string)]
+        async with contextlib.aclosing(self.iter_presets(modelId=model_id, search=name, **_NEWEST_FIRST)) as presets:
+            async for preset in presets:
+                if preset.name == name:
+                    return preset
+        return None
+
     async def create_preset(self, data_model: DataModelRoot, mapping: MappingRoot) -> MappingRoot:
-        async with self._session() as s:
-            # Sample Payload
-            # {"name":"ProvaMapping","data":{"type":"object","instanceOf":"prova:1.0.0","properties":{"a":{"version":"1.0.0","type":"integer","mode":"R","historyPolicy":{"enabled":true},"sendPolicy":{"triggers":[{"changeMask":"value","minIntervalMs":1000,"skipFirstNChanges":0,"type":"onchange"}]},"datalink":{"source":"Ent.S.A.Prova"}}},"label":"","unit":"","description":"","UUID":"z5kn06t96oqqm3fl","tags":[]}}
-            data = await self._post_json(
-                s, 'api/v1/presets', self._prepare(mapping.get_create_mapping_payload(data_model)), organization=self._org
+        # Sample Payload
+        # {"name":"ProvaMapping","data":{"type":"object","instanceOf":"prova:1.0.0","properties":{"a":{"version":"1.0.0","type":"integer","mode":"R","historyPolicy":{"enabled":true},"sendPolicy":{"triggers":[{"changeMask":"value","minIntervalMs":1000,"skipFirstNChanges":0,"type":"onchange"}]},"datalink":{"source":"Ent.S.A.Prova"}}},"label":"","unit":"","description":"","UUID":"z5kn06t96oqqm3fl","tags":[]}}
+        payload = self._prepare(mapping.get_create_mapping_payload(data_model))
+        if 0 < self._async_mapping_threshold <= len(payload):
+            return await self._create_preset_async(payload, mapping.name, f'{data_model.clear_name}:{data_model.version}')
+
+        logger.info(f'Creating preset {mapping.name} ({len(payload)} bytes)')
+        data = await self._post_json('api/v1/presets', payload, organization=self._org)
+        new_mapping = MappingRoot.from_dict(data)
+        logger.debug(f'Got {orjson.dumps(new_mapping)}')
+        return new_mapping
+
+        # TODO should check for equality, or better, set ids etc...
+
+    async def _create_preset_async(self, payload: bytes, name: str, instance_of: str) -> MappingRoot:
+        """
+        Big payloads go through the async mapping job API: the POST returns at once, then the job is polled with
+        backoff (other coroutines keep running meanwhile) and the created preset is looked up once done
+        """
+        logger.info(f'Creating preset {name} through an async mapping job ({len(payload)} bytes)')
+        job = MappingJob.from_dict(await self._post_json('api/v1/mappings/async', payload, organization=self._org))
+        if not job.is_finished:
+            job = await poll_with_backoff(
+                lambda: self.get_mapping_job(job.id), lambda j: j.is_finished,
+                self._job_poll_initial_delay, self._job_poll_max_delay, self._job_timeout
             )
-            new_mapping = MappingRoot.from_dict(data)
-            logger.debug(f'Got {orjson.dumps(new_mapping)}')
-            return new_mapping
+        logger.info(f'Mapping job {job.id} of preset {name} finished with status {job.status.value}')
+        assert job.status == MappingJobStatus.DONE, f'Mapping job {job.id} of preset {name} failed: {job.error}'
+
+        preset = await self.find_preset(name, instance_of)
+        assert preset is not None, f'Cannot find preset {name} on model {instance_of} created by job {job.id}'
+        return preset
 
-            # TODO should check for equality, or better, set ids etc...
+    async def get_mapping_job(self, job_id: str) -> MappingJob:
+        return MappingJob.from_dict(await self._get_json(f'api/v1/mappings/async/{job_id}', organization=self._org))
 
     async def delete_preset(self, mapping: MappingRoot):
         await mapping.maybe_fetch_id(self)
 
-        async with self._session() as s:
-            data = await self._delete_json(s, 'api/v1/presets/' + mapping.id, organization=self._org)
-            deleted_mapping = MappingRoot.from_dict(data)
-            logger.debug(f'Got {orjson.dumps(deleted_mapping)}')
+        data = await self._delete_json('api/v1/presets/' + mapping.id, organization=self._org)
+        deleted_mapping = MappingRoot.from_dict(data)
+        logger.debug(f'Got {orjson.dumps(deleted_mapping)}')
 
-            # TODO should check for equality, or better, set ids etc...
+        # TODO should check for equality, or better, set ids etc...
 
     async def delete_preset_by_id(self, mapping_id: str):
-        async with self._session() as s:
-            data = await self._delete_json(s, 'api/v1/presets/' + mapping_id, organization=self._org)
-            deleted_mapping = MappingRoot.from_dict(data)
-            logger.debug(f'Got {orjson.dumps(deleted_mapping)}')
+        data = await self._delete_json('api/v1/presets/' + mapping_id, organization=self._org)
+        deleted_mapping = MappingRoot.from_dict(data)
+        logger.debug(f'Got {orjson.dumps(deleted_mapping)}')
 
-            # TODO should check for equality, or better, set ids etc...
+        # TODO should check for equality, or better, set ids etc...
 
 
 """
@@ -0,0 +1,69 @@
+import asyncio
+import email.utils
+import random
+import time
+
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket limiting the request rate towards Corvina, adapting it AIMD style:
+    every throttled response (429/503) halves the rate and pauses the bucket for the server provided Retry-After,
+    while every successful response raises it again by `increase_step`, up to the configured `max_rate`.
+    """
+
+    def __init__(self, max_rate: float, burst: int, min_rate: float = 0.5, increase_step: float = 0.5):
+        assert max_rate > 0 and burst > 0, f'Invalid rate limit {max_rate} req/s, burst {burst}'
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = max_rate
+        self._burst = burst
+        self._increase_step = increase_step
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(float(self._burst), self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    async def acquire(self):
+        async with self._lock:  # FIFO: waiters are served in arrival order
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = max(self._paused_until - now, (1.0 - self._tokens) / self.rate if self._tokens < 1.0 else 0.0)
+                if wait <= 0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep(wait)
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self._increase_step)
+
+    def on_throttled(self, retry_after: float | None):
+        now = time.monotonic()
+        self._refill(now)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = min(self._tokens, 0.0)
+        if retry_after is not None:
+            self._paused_until = max(self._paused_until, now + retry_after)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """ Retry-After header value (delay seconds or HTTP date) as seconds from now """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """ Exponential backoff with full jitter: uniform in [0, min(max_delay, base_delay * 2^attempt)] """
+    return random.uniform(0.0, min(max_delay, base_delay * 2 ** attempt))
@@ -5,10 +5,14 @@ import configuration
 import utils.version_utils
 import utils.logging_utils
 from corvina_connector.corvina_client import CorvinaClient
+from model.batch_sync import DeployStatus, format_results_table, load_batch_jobs, run_batch_sync
 from model.corvina_manager import CorvinaManager
 from model.datamodel.datamodel_root import DataModelRoot
+from model.deploy_plan import DeployPlan
+from model.fleet_assignment import DeviceSelector, assign_mapping_to_devices, assign_mapping_to_group, log_assignment_results
 from model.mapping.mapping_root import MappingRoot
-from utils.file_utils import read_json_async
+from model.model_cache import ModelCache
+from utils.file_utils import read_file_async, read_json_async, write_file_async
 
 
 l0 = utils.logging_utils.setup_logging()
@@ -17,48 +21,94 @@ l0 = utils.logging_utils.setup_logging()
 def create_arguments_parser() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
     parser.add_argument(
-        'op', choices=['sync', 'remove'],
+        'op', choices=['sync', 'plan', 'apply', 'remove', 'batch'],
         help=(
             'The operation to perform, where: \n'
             '\t\tsync applies the provided model and mapping\n'
-            '\t\tremove deletes model and mapping (name is took from provided files or by the --deploy-name arg)'
+            '\t\tplan computes the changes needed to sync the provided model and mapping (saved in --plan-file, if set)\n'
+            '\t\tapply executes a plan saved in --plan-file\n'
+            '\t\tremove deletes model and mapping (name is took from provided files or by the --deploy-name arg)\n'
+            '\t\tbatch syncs every datamodel/mapping pair listed by --batch'
         )
     )
     parser.add_argument('-d', '--datamodel', required=False, type=str, help='Path of the datamodel.json file to handle (required when syncing)')
     parser.add_argument('-m', '--mapping', required=False, type=str, help='Path of the mapping.json file to handle (required when syncing)')
-    parser.add_argument('--device-id', required=False, type=str, help='If set, the device will be configured using the provided mapping (only with sync operation)')
+    parser.add_argument('--device-id', required=False, type=str, action='append', default=[], help='If set, the device will be configured using the provided mapping (only with sync operation, can be repeated)')
+    parser.add_argument('--device-tag', required=False, type=str, action='append', default=[], help='Configure every device having this tag (only with sync operation, can be repeated: all tags must match)')
+    parser.add_argument('--device-attribute', required=False, type=str, action='append', default=[], help='Configure every device having attribute KEY=VALUE (only with sync operation, can be repeated: all attributes must match)')
+    parser.add_argument('--device-group', required=False, type=str, help='Configure the whole device group through the Corvina async job API (only with sync operation)')
     parser.add_argument('--deploy-name', type=str, required=False)
+    parser.add_argument('--plan-file', required=False, type=str, help='Where plan operation saves the plan, and apply operation reads it')
+    parser.add_argument('--batch', required=False, type=str, help='Directory (one sub directory with datamodel.json and mapping.json per deploy) or JSON manifest of the deploys to sync (required with batch operation)')
     parser.add_argument('--dry-run', action='store_true', default=False, required=False)
+    parser.add_argument('--dedup', action='store_true', default=configuration.dedup_sub_models, required=False, help='Create identical sub models once, referencing them from every occurrence')
+    parser.add_argument('--force', action='store_true', default=not configuration.skip_unchanged_deploys, required=False, help='Sync even when the fingerprint stored in the deployed preset matches the local files')
+    parser.add_argument('--cache-dir', type=str, required=False, default=configuration.model_cache_dir, help='Directory of the local models cache, revalidated against Corvina at every run (disabled if not set)')
+    parser.add_argument('--max-connections-per-host', type=int, required=False, default=configuration.corvina_max_connections_per_host, help='Maximum number of pooled HTTP connections towards Corvina')
+    parser.add_argument('--concurrency', type=int, required=False, default=configuration.max_concurrent_upgrades, help='Maximum number of concurrent model operations of a deploy: upgrades (as soon as their sub models are done), deletions on remove and model fetches')
+    parser.add_argument('--deploy-concurrency', type=int, required=False, default=configuration.max_concurrent_deploys, help='Maximum number of deploys synced concurrently (only with batch operation)')
+    parser.add_argument('--device-concurrency', type=int, required=False, default=configuration.max_concurrent_device_assignments, help='Maximum number of devices configured concurrently')
+    parser.add_argument('--max-in-flight-requests', type=int, required=False, default=configuration.corvina_max_in_flight_requests, help='Global budget of concurrent requests towards Corvina (0 means no limit)')
 
     args = parser.parse_args()
 
     # Validate arguments
-    assert args.op != 'sync' or (args.datamodel and args.mapping), 'Datamodel and mapping files must be provided when syncing'
+    assert args.op not in ('sync', 'plan') or (args.datamodel and args.mapping), 'Datamodel and mapping files must be provided when syncing or planning'
+    assert args.op != 'apply' or args.plan_file, 'Plan file must be provided with apply operation'
     assert args.op != 'remove' or ((args.datamodel and args.mapping) or args.deploy_name), 'Datamodel and mapping files or deploy-name must be provided when removing'
+    assert args.op != 'batch' or args.batch, 'Batch directory or manifest must be provided with batch operation'
+    assert all('=' in a for a in args.device_attribute), 'Device attributes must be provided as KEY=VALUE'
 
     return args
 
 
-async def async_main():
-    l0.info(f"Corvina Model Manager {utils.version_utils.get_version_and_date()}")
+async def run_batch_operation(args: argparse.Namespace, connector: CorvinaClient, model_cache: ModelCache | None):
+    jobs = await load_batch_jobs(args.batch)
+    l0.info(f'Syncing {len(jobs)} deploys from {args.batch}')
+    results = await run_batch_sync(connector, jobs, args.dry_run, args.deploy_concurrency, args.concurrency, model_cache, args.dedup, not args.force)
 
-    args = create_arguments_parser()
-    configuration.validate_configuration()
+    for line in format_results_table(results).splitlines():
+        l0.info(line)
+    if any(r.status == DeployStatus.FAILED for r in results):
+        raise SystemExit(1)
 
-    connector = CorvinaClient(
-        org=configuration.corvina_org,
-        username=configuration.corvina_username,
-        token=configuration.corvina_client_secret,
-        corvina_prefix=configuration.corvina_prefix,
-        corvina_suffix=configuration.corvina_suffix
+
+async def assign_devices(args: argparse.Namespace, connector: CorvinaClient, mapping: MappingRoot):
+    device_selector = DeviceSelector(
+        device_ids=args.device_id,
+        tags=args.device_tag,
+        attributes=dict(a.split('=', 1) for a in args.device_attribute)
     )
-    await connector.login()
-    manager = CorvinaManager(connector, args.dry_run)
+
+    results = []
+    if len(device_selector.device_ids) > 0 or device_selector.needs_device_list:
+        results.extend(await assign_mapping_to_devices(connector, mapping, device_selector, args.dry_run, args.device_concurrency))
+    if args.device_group is not None:
+        results.append(await assign_mapping_to_group(connector, mapping, args.device_group, args.dry_run))
+    if len(results) > 0:
+        log_assignment_results(results)
+    if any(not r.ok for r in results):
+        raise SystemExit(1)
+
+
+async def run_operation(args: argparse.Namespace, connector: CorvinaClient, model_cache: ModelCache | None = None):
+    if args.op == 'batch':
+        await run_batch_operation(args, connector, model_cache)
+        return
+
+    manager = CorvinaManager(connector, args.dry_run, args.concurrency, model_cache=model_cache, dedup_sub_models=args.dedup, skip_unchanged=not args.force)
+    if args.op == 'apply':
+        l0.info(f'Loading plan from {args.plan_file}')
+        plan = DeployPlan.from_json(await read_file_async(args.plan_file))
+        for line in plan.describe():
+            l0.info(line)
+        new_mapping = plan.mapping if args.dry_run else await manager.apply_plan(plan)
+        await assign_devices(args, connector, new_mapping)
+        return
 
     datamodel: DataModelRoot | None = None
     mapping: MappingRoot | None = None
     deploy_name: str | None = None
-    device_id: str | None = args.device_id
 
     if args.datamodel is not None:
         l0.info(f'Loading datamodel from {args.datamodel}')
@@ -79,17 +129,67 @@ async def async_main():
 
     if args.op == 'sync':
         l0.info('Syncing')
-        await manager.add_deploy_from_files(datamodel, mapping, device_id)
+        new_mapping = await manager.add_deploy_from_files(datamodel, mapping)
+        await assign_devices(args, connector, new_mapping)
+    elif args.op == 'plan':
+        l0.info('Planning')
+        plan = await manager.plan_deploy(datamodel, mapping)
+        for line in plan.describe():
+            l0.info(line)
+        if args.plan_file is not None:
+            await write_file_async(args.plan_file, plan.to_json())
+            l0.info(f'Plan saved to {args.plan_file}')
     elif args.op == 'remove':
         if deploy_name is not None:
             l0.info(f'Removing deploy {deploy_name}')
-            await manager.remove_deploy_by_name(deploy_name)
+            outcomes = await manager.remove_deploy_by_name(deploy_name)
         else:
             l0.info(f'Removing deploy {mapping.get_deploy_name()} (from files)')
-            await manager.remove_deploy_from_files(datamodel, mapping)
+            outcomes = await manager.remove_deploy_from_files(datamodel, mapping)
+        if any(not o.ok for o in outcomes):
+            raise SystemExit(1)
     else:
         l0.info('Nothing to do')
 
+
+async def async_main():
+    l0.info(f"Corvina Model Manager {utils.version_utils.get_version_and_date()}")
+
+    args = create_arguments_parser()
+    configuration.validate_configuration()
+
+    async with CorvinaClient(
+        org=configuration.corvina_org,
+        username=configuration.corvina_username,
+        token=configuration.corvina_client_secret,
+        corvina_prefix=configuration.corvina_prefix,
+        corvina_suffix=configuration.corvina_suffix,
+        max_connections_per_host=args.max_connections_per_host,
+        keepalive_timeout=configuration.corvina_keepalive_timeout,
+        dns_cache_ttl=configuration.corvina_dns_cache_ttl,
+        page_size=configuration.corvina_page_size,
+        page_prefetch=configuration.corvina_page_prefetch,
+        lookup_cache_ttl=configuration.corvina_lookup_cache_ttl,
+        max_in_flight_requests=args.max_in_flight_requests,
+        job_poll_initial_delay=configuration.corvina_job_poll_initial_delay,
+        job_poll_max_delay=configuration.corvina_job_poll_max_delay,
+        job_timeout=configuration.corvina_job_timeout,
+        async_mapping_threshold=configuration.corvina_async_mapping_threshold,
+        gzip_request_threshold=configuration.corvina_gzip_request_threshold,
+        rate_limit=configuration.corvina_rate_limit,
+        rate_burst=configuration.corvina_rate_burst,
+        max_retries=configuration.corvina_max_retries,
+        retry_base_delay=configuration.corvina_retry_base_delay,
+        retry_max_delay=configuration.corvina_retry_max_delay
+    ) as connector:
+        await connector.login()
+        model_cache = ModelCache(args.cache_dir, configuration.corvina_org) if args.cache_dir is not None else None
+        try:
+            await run_operation(args, connector, model_cache)
+        finally:
+            if model_cache is not None:
+                model_cache.close()
+
     l0.info("Bye")
 
 
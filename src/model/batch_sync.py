@@ -0,0 +1,119 @@
+import asyncio
+import dataclasses
+import enum
+import logging
+import pathlib
+import time
+
+import configuration
+from corvina_connector.corvina_client import CorvinaClient
+from model.corvina_manager import CorvinaManager
+from model.datamodel.datamodel_root import DataModelRoot
+from model.mapping.mapping_root import MappingRoot
+from model.model_cache import ModelCache
+from model.model_catalog import ModelCatalog
+from utils.dataclass_utils import BaseDataClass
+from utils.file_utils import read_json_async
+
+logger = logging.getLogger('app.batch_sync')
+
+DATAMODEL_FILE_NAME = 'datamodel.json'
+MAPPING_FILE_NAME = 'mapping.json'
+
+
+class DeployStatus(enum.Enum):
+    SYNCED = 'synced'
+    FAILED = 'failed'
+
+
+@dataclasses.dataclass
+class DeployJob(BaseDataClass):
+    datamodel: str
+    mapping: str
+    device_id: str | None = None
+
+
+@dataclasses.dataclass
+class DeployResult(BaseDataClass):
+    job: DeployJob
+    status: DeployStatus
+    elapsed: float
+    deploy_name: str | None = None
+    error: str | None = None
+
+
+async def load_batch_jobs(path: str) -> list[DeployJob]:
+    """
+    Reads the deploys to sync from either
+    - a directory, where every sub directory holds a datamodel.json and a mapping.json pair, or
+    - a JSON manifest: a list of {"datamodel": ..., "mapping": ..., "device_id": ...} items, with paths relative to it
+    """
+    base = pathlib.Path(path)
+    if base.is_dir():
+        return [
+            DeployJob(datamodel=str(d / DATAMODEL_FILE_NAME), mapping=str(d / MAPPING_FILE_NAME))
+            for d in sorted(base.iterdir())
+            if (d / DATAMODEL_FILE_NAME).is_file() and (d / MAPPING_FILE_NAME).is_file()
+        ]
+
+    manifest = await read_json_async(path)
+    assert isinstance(manifest, list), f'Batch manifest {path} must be a list of datamodel/mapping pairs'
+    return [
+        DeployJob(
+            datamodel=str(base.parent / item['datamodel']),
+            mapping=str(base.parent / item['mapping']),
+            device_id=item.get('device_id')
+        )
+        for item in manifest
+    ]
+
+
+async def run_batch_sync(
+    connector: CorvinaClient,
+    jobs: list[DeployJob],
+    dry_run: bool,
+    deploy_concurrency: int = configuration.max_concurrent_deploys,
+    concurrency: int = configuration.max_concurrent_upgrades,
+    model_cache: ModelCache | None = None,
+    dedup_sub_models: bool = configuration.dedup_sub_models,
+    skip_unchanged: bool = configuration.skip_unchanged_deploys
+) -> list[DeployResult]:
+    """
+    Syncs every deploy against one shared model catalog, running up to `deploy_concurrency` deploys at the same time.
+    A failing deploy does not stop the others; its error is reported in its result.
+    """
+    assert deploy_concurrency > 0, f'Deploy concurrency must be positive, got {deploy_concurrency}'
+    catalog = await ModelCatalog.fetch(connector, model_cache)
+    semaphore = asyncio.Semaphore(deploy_concurrency)
+
+    async def _sync(job: DeployJob) -> DeployResult:
+        async with semaphore:
+            start = time.monotonic()
+            deploy_name = None
+            try:
+                data_model = DataModelRoot.from_dict(await read_json_async(job.datamodel))
+                mapping = MappingRoot.from_dict(await read_json_async(job.mapping))
+                deploy_name = data_model.get_deploy_name()
+                assert deploy_name == mapping.get_deploy_name(), f'Found different deploy names in {job.datamodel} and {job.mapping}'
+
+                logger.info(f'Syncing deploy {deploy_name}')
+                manager = CorvinaManager(connector, dry_run, concurrency, catalog, dedup_sub_models=dedup_sub_models, skip_unchanged=skip_unchanged)
+                await manager.add_deploy_from_files(data_model, mapping, job.device_id)
+                return DeployResult(job, DeployStatus.SYNCED, time.monotonic() - start, deploy_name)
+            except Exception as e:
+                logger.exception(f'Cannot sync deploy {deploy_name or job.datamodel}')
+                return DeployResult(job, DeployStatus.FAILED, time.monotonic() - start, deploy_name, f'{type(e).__name__}: {e}')
+
+    return list(await asyncio.gather(*(_sync(job) for job in jobs)))
+
+
+def format_results_table(results: list[DeployResult]) -> str:
+    rows = [('DEPLOY', 'STATUS', 'TIME', 'ERROR')] + [
+        (r.deploy_name or r.job.datamodel, r.status.value, f'{r.elapsed:.1f}s', r.error or '')
+        for r in results
+    ]
+    widths = [max(len(row[i]) for row in rows) for i in range(3)]
+    lines = [' | '.join([*(c.ljust(w) for c, w in zip(row[:3], widths)), row[3]]).rstrip() for row in rows]
+    failed = sum(1 for r in results if r.status == DeployStatus.FAILED)
+    lines.append(f'{len(results) - failed} synced, {failed} failed')
+    return '\n'.join(lines)
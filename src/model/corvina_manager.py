@@ -1,139 +1,209 @@
 
-import functools
+import collections
 import logging
+import time
 import collections.abc
 
 import orjson
 
 import configuration
-from corvina_connector.corvina_client import CorvinaClient
+from corvina_connector.corvina_client import CorvinaClient, count_uploads
 from model.datamodel.datamodel_leaf import DataModelLeaf
 from model.datamodel.datamodel_root import DataModelRoot
+from model.mapping.mapping_diff import diff_mappings
 from model.mapping.mapping_root import MappingRoot
+from model.deploy_fingerprint import compute_fingerprints, read_fingerprints, set_fingerprints
+from model.deploy_plan import DeployPlan, PlanOp, PlanStep
+from model.deploy_teardown import TeardownOutcome, log_teardown_outcomes, teardown_deploy
+from model.model_cache import ModelCache
+from model.model_catalog import ModelCatalog
 from model.node_diff import NodeDiff, DiffEnum
 from model.semver_version import SemverVersion
+from model.sub_model_dedup import canonicalize_sub_models, find_duplicate_sub_models, log_dedup_report, sync_mapping_sub_models
 from model.tree.intermediate_node import IntermediateNode
 from model.tree.tree_node import TreeNode
-from utils.corvina_version_utils import version_re
-from utils.tree_utils import compute_data_model_difference_map, go_to_path
-from utils.tree_visit_utils import dfs, path_append
+from utils.async_utils import critical_path, gather_bounded, run_dag
+from utils.corvina_version_utils import split_instance_of
+from utils.tree_index import TreeIndex, path_key
+from utils.tree_utils import compute_data_model_difference_map
+from utils.tree_visit_utils import TreePath, path_append, walk_tree
 
 logger = logging.getLogger('app.model_manager')
 
 
 class CorvinaManager:
 
-    def __init__(self, connector: CorvinaClient, dry_run: bool):
+    def __init__(
+        self,
+        connector: CorvinaClient,
+        dry_run: bool,
+        concurrency: int = configuration.max_concurrent_upgrades,
+        catalog: ModelCatalog | None = None,
+        model_cache: ModelCache | None = None,
+        dedup_sub_models: bool = configuration.dedup_sub_models,
+        skip_unchanged: bool = configuration.skip_unchanged_deploys
+    ):
         self._connector = connector
         self._dry_run = dry_run
-        self._all_models_by_id: dict[str, DataModelRoot] | None = None
-        self._all_mappings_by_id: dict[str, MappingRoot] | None = None
+        self._concurrency = concurrency
+        self._catalog: ModelCatalog | None = catalog  # may be shared among managers (see batch_sync)
+        self._model_cache = model_cache
+        self._dedup_sub_models = dedup_sub_models  # identical sub models are created once and shared
+        self._skip_unchanged = skip_unchanged  # compare the fingerprints before downloading the catalog
+        self._resolved_models: dict[str, DataModelRoot] = {}  # models created/upgraded in this run, by name
         if dry_run:
             logger.warning('Dry Run Mode ON! Nothing on Corvina will be set')
 
-    async def add_deploy_from_files(self, data_model: DataModelRoot, mapping: MappingRoot, device_id: str | None = None):
+    async def add_deploy_from_files(self, data_model: DataModelRoot, mapping: MappingRoot, device_id: str | None = None) -> MappingRoot:
         logger.info('Creating Deploy from provided files')
 
-        self._all_models_by_id = await self._connector.get_datamodels_by_id()
-        matching_models = list(filter(lambda m: data_model.clear_name == m.name, self._all_models_by_id.values()))
+        plan = await self.plan_deploy(data_model, mapping)
+        for line in plan.describe():
+            logger.info(line)
+        if self._dry_run:
+            return mapping
+
+        new_mapping = await self.apply_plan(plan)
+        if device_id is not None:
+            await self._connector.set_device_mapping(device_id, new_mapping)
+
+        return new_mapping
+
+    async def plan_deploy(self, data_model: DataModelRoot, mapping: MappingRoot) -> DeployPlan:
+        fingerprint, model_fingerprint = compute_fingerprints(data_model, mapping, self._dedup_sub_models)
+        current_preset = await self._connector.find_latest_preset(mapping.clear_name, data_model.clear_name)
+        if self._skip_unchanged and current_preset is not None:
+            deployed_fingerprint, deployed_model_fingerprint = read_fingerprints(current_preset)
+            if deployed_model_fingerprint == model_fingerprint:
+                logger.info(f'Model unchanged since preset {current_preset.id} was deployed (fingerprint {model_fingerprint})')
+                return DeployPlan(
+                    deploy_name=data_model.get_deploy_name(),
+                    new_deploy=False,
+                    model=data_model,
+                    mapping=mapping,
+                    dedup_sub_models=self._dedup_sub_models,
+                    fingerprint=fingerprint,
+                    model_fingerprint=model_fingerprint,
+                    current_preset=current_preset,
+                    model_unchanged=True,
+                    up_to_date=deployed_fingerprint == fingerprint
+                )
+
+        if self._catalog is None:
+            self._catalog = await ModelCatalog.fetch(self._connector, self._model_cache)
+        plan = self._build_deploy_plan(data_model, mapping)
+        plan.fingerprint, plan.model_fingerprint = fingerprint, model_fingerprint
+        plan.current_preset = current_preset if not plan.new_deploy else None
+        return plan
+
+    def _build_deploy_plan(self, data_model: DataModelRoot, mapping: MappingRoot) -> DeployPlan:
+        """ Pure CPU: everything needed about Corvina is already in the catalog """
+        matching_models = self._catalog.find_by_name(data_model.clear_name)
 
         if len(matching_models) > 1:
             # TODO this is probably not supported (or not possible?)
             assert False, f'Found more than one already existing models that match provided one... {matching_models}'
 
+        aliases: dict[str, str] = {}
         if len(matching_models) > 0:
-            logger.info(f'Model found in Corvina (id={matching_models[0].id})! Performing automatic migration')
-            # new_data_model = await self._connector.update_data_model(matching_models[0], data_model)
-            new_data_model = await self._perform_model_upgrade(matching_models[0], data_model)
-            new_mapping = await self._perform_mapping_upgrade(new_data_model, mapping)
+            logger.info(f'Model found in Corvina (id={matching_models[0].id})! Planning automatic migration')
+            steps, root_step = self._plan_model_upgrade(matching_models[0], data_model, aliases)
         else:
             logger.info('Model and mapping not found in Corvina!')
-            new_mapping = await self._create_new_model_and_mapping(data_model, mapping)
-
-        if device_id is None:
-            return
-
-        await self._connector.set_device_mapping(device_id, new_mapping)
-
-    async def remove_deploy_from_files(self, data_model: DataModelRoot, mapping: MappingRoot):
+            if self._dedup_sub_models:
+                aliases = canonicalize_sub_models(data_model.data)
+                data_model.data.invalidate_tree_node_digest()
+            root_step = f'{PlanOp.CREATE_MODEL.value}:{data_model.clear_name}'
+            steps = [PlanStep(id=root_step, op=PlanOp.CREATE_MODEL, path=data_model.clear_name, model=data_model)]
+        log_dedup_report(aliases)
+
+        return DeployPlan(
+            deploy_name=data_model.get_deploy_name(),
+            new_deploy=len(matching_models) == 0,
+            model=data_model,
+            mapping=mapping,
+            steps=steps,
+            root_step=root_step,
+            dedup_sub_models=self._dedup_sub_models,
+            aliases=aliases
+        )
+
+    async def apply_plan(self, plan: DeployPlan) -> MappingRoot:
+        if plan.up_to_date:
+            logger.info(f'Deploy {plan.deploy_name} is up to date, nothing to do')
+            return plan.current_preset
+
+        logger.info(f'Applying plan for deploy {plan.deploy_name}')
+        with count_uploads() as uploads:
+            preset = await self._apply_plan(plan)
+        logger.info(
+            f'Deploy {plan.deploy_name}: uploaded {uploads.bytes_sent / 1024:.1f} KiB in {uploads.requests} requests '
+            f'({uploads.wire_bytes_sent / 1024:.1f} KiB on the wire)'
+        )
+        return preset
+
+    async def _apply_plan(self, plan: DeployPlan) -> MappingRoot:
+        if plan.fingerprint is not None:
+            set_fingerprints(plan.mapping, plan.fingerprint, plan.model_fingerprint)
+        if plan.model_unchanged:
+            return await self._perform_mapping_only_upgrade(plan.current_preset, plan.model, plan.mapping)
+
+        upgraded_model = await self._apply_model_steps(plan.steps, plan.root_step, plan.model)
+
+        if plan.new_deploy:
+            if plan.dedup_sub_models:
+                sync_mapping_sub_models(upgraded_model.data, plan.mapping.data)
+            logger.info(f'Creating mapping {plan.mapping.name} for model {plan.mapping.data.instanceOf}')
+            return await self._connector.create_preset(upgraded_model, plan.mapping)
+        return await self._perform_mapping_upgrade(upgraded_model, plan.mapping, plan.dedup_sub_models, plan.current_preset)
+
+    async def remove_deploy_from_files(self, data_model: DataModelRoot, mapping: MappingRoot) -> list[TeardownOutcome]:
         # TODO this is not safe to remove model with a version > 1.0.0 (which is not detected)
         logger.info('Removing Deploy from provided files')
 
         all_sub_models = set(data_model.get_intermediate_elems())
-        datamodels_to_remove = [data_model]
-        datamodels_to_remove.extend(await self._get_datamodels_from_names(all_sub_models))
+        datamodels_to_remove = await self._get_datamodels_from_names(all_sub_models)  # fetches the catalog: ids included
+        datamodels_to_remove.insert(0, self._catalog.find(data_model.clear_name, data_model.version) or data_model)
+        if mapping.id is None:
+            mapping.id = await self._connector.find_preset_id(mapping.clear_name, mapping.data.instanceOf)
 
         logger.info(f'Will remove the following models:  {[m.clear_name + ":" + m.version for m in datamodels_to_remove]}')
         logger.info(f'Will remove the following mapping: {mapping.name} on model {mapping.data.instanceOf}')
 
-        logger.info(f'Deleting mapping {mapping.name} on model {mapping.data.instanceOf}')
-        if not self._dry_run:
-            try:
-                await self._connector.delete_preset(mapping)
-            except:
-                logger.exception(f'Cannot delete mapping {mapping.name} on model {mapping.data.instanceOf}')
-
-        for model in datamodels_to_remove:
-            logger.info(f'Deleting model {model.name}:{model.version}')
-            if not self._dry_run:
-                try:
-                    await self._connector.delete_data_model(model, self._all_models_by_id)
-                except:
-                    logger.exception(f'Cannot delete model {model.name}:{model.version}')
+        return await self._teardown([mapping], datamodels_to_remove)
 
-    async def remove_deploy_by_name(self, deploy_name: str):
+    async def remove_deploy_by_name(self, deploy_name: str) -> list[TeardownOutcome]:
         logger.info(f'Removing Deploy {deploy_name}')
 
-        self._all_models_by_id = await self._connector.get_datamodels_by_id()
-        models_to_remove = [m for m in self._all_models_by_id.values() if m.name.startswith(deploy_name + '-')]
+        # Only the matching models and presets are kept, pages are dropped once filtered
+        self._catalog = ModelCatalog([m async for m in self._connector.iter_datamodels() if m.name.startswith(deploy_name + '-')])
+        models_to_remove = self._catalog.find_by_prefix(deploy_name + '-')
 
-        self._all_mappings_by_id = await self._connector.get_presets_by_id()
-        mappings_to_remove = [m for m in self._all_mappings_by_id.values() if m.data.instanceOf.startswith(deploy_name + '-')]
+        mappings_to_remove = [m async for m in self._connector.iter_presets() if m.data.instanceOf.startswith(deploy_name + '-')]
 
         logger.info(f'Will remove the following models:  {[m.clear_name + ":" + m.version for m in models_to_remove]}')
         # TODO but there is a single mapping.. This should work, but can be optimized
         logger.info(f'Will remove the following mappings: {[(m.name + ":" + m.data.instanceOf) for m in mappings_to_remove]}')
 
-        for mapping in mappings_to_remove:
-            logger.info(f'Deleting mapping {mapping.name} on model {mapping.data.instanceOf}')
-            if not self._dry_run:
-                try:
-                    await self._connector.delete_preset(mapping)
-                except:
-                    logger.exception(f'Cannot delete mapping {mapping.name} on model {mapping.data.instanceOf}')
-
-        for model in models_to_remove:
-            logger.info(f'Deleting model {model.name}:{model.version}')
-            if not self._dry_run:
-                try:
-                    await self._connector.delete_data_model(model, self._all_models_by_id)
-                except:
-                    logger.exception(f'Cannot delete model {model.name}:{model.version}')
-
-    async def _create_new_model_and_mapping(self, model: DataModelRoot, mapping: MappingRoot) -> MappingRoot:
-        logger.info(f'Creating model {model.name} {model.version}')
-        if not self._dry_run:
-            await self._connector.create_data_model(model)
-
-        logger.info(f'Creating mapping {mapping.name} for model {mapping.data.instanceOf}')
-        if not self._dry_run:
-            return await self._connector.create_preset(model, mapping)
-
-        return mapping
+        return await self._teardown(mappings_to_remove, models_to_remove)
+
+    async def _teardown(self, presets: list[MappingRoot], models: list[DataModelRoot]) -> list[TeardownOutcome]:
+        outcomes = await teardown_deploy(self._connector, presets, models, self._dry_run, self._concurrency, self._catalog)
+        log_teardown_outcomes(outcomes)
+        return outcomes
 
     async def _get_datamodels_from_names(self, names: collections.abc.Iterable[str]) -> list[DataModelRoot]:
-        if self._all_models_by_id is None:
-            self._all_models_by_id = await self._connector.get_datamodels_by_id()
+        if self._catalog is None:
+            self._catalog = await ModelCatalog.fetch(self._connector, self._model_cache)
 
         res = []
         for name in names:
-            match = version_re.match(name)
-            if match is not None: # split model name and version
-                m_name = match[1]
-                m_version = match[2]
-                found_dms = [dm for dm in self._all_models_by_id.values() if dm.name == m_name and dm.version == m_version]
+            match = split_instance_of(name)
+            if match is not None:  # split model name and version
+                found_dm = self._catalog.find(match[0], match[1])
+                found_dms = [found_dm] if found_dm is not None else []
             else:  # return ALL found versions for that name
-                found_dms = [dm for dm in self._all_models_by_id.values() if dm.name == name]
+                found_dms = self._catalog.find_by_name(name)
 
             if len(found_dms) > 0:  # more than one datamodel can be found (e.g. more than one version available)
                 res.extend(found_dms)
@@ -150,151 +220,348 @@ class CorvinaManager:
         return True
 
     async def _perform_model_upgrade(self, corvina_current_model: DataModelRoot, new_model: DataModelRoot) -> DataModelRoot:
-        if self._all_models_by_id is None:
-            self._all_models_by_id = await self._connector.get_datamodels_by_id()
-
+        if self._catalog is None:
+            self._catalog = await ModelCatalog.fetch(self._connector, self._model_cache)
+
+        steps, root_step = self._plan_model_upgrade(corvina_current_model, new_model)
+        return await self._apply_model_steps(steps, root_step, new_model)
+
+    def _plan_model_upgrade(
+        self, corvina_current_model: DataModelRoot, new_model: DataModelRoot, aliases: dict[str, str] | None = None
+    ) -> tuple[list[PlanStep], str | None]:
+        """
+        Turns the model differences in create/update/delete steps, deepest first. Each changed model depends on the
+        steps of its changed sub models (their new versions are needed to reference them), while a removed sub model
+        is deleted only after its parent stopped referencing it.
+        With dedup on, sub models identical to another one get no step: `aliases` is filled with the one to reference.
+        """
+        aliases = aliases if aliases is not None else {}
         logger.info('Computing differences between old and new models')
         diff_map = compute_data_model_difference_map(corvina_current_model, new_model)
         logger.debug(orjson.dumps(diff_map))
+        current_index = TreeIndex(corvina_current_model.data)
+
+        model_diffs = sorted(
+            (d for d in diff_map.values() if d.op in (DiffEnum.NEW_NODE, DiffEnum.DELETED_NODE, DiffEnum.NODE_CHANGED)),
+            key=lambda d: d.path.count(configuration.tree_path_separator_char), reverse=True
+        )
+        if self._dedup_sub_models:
+            model_diffs = self._dedup_model_diffs(current_index, diff_map, model_diffs, aliases)
+        # sub models that will get a new version from this plan: their references are resolved while applying
+        planned_names = {self._diff_node(d).get_tree_node_name() for d in model_diffs if d.op != DiffEnum.DELETED_NODE}
+
+        steps: dict[str, PlanStep] = {}  # by path
+        for diff in model_diffs:
+            node = self._diff_node(diff)
+            if diff.op == DiffEnum.NEW_NODE:
+                step = PlanStep(id=f'{PlanOp.CREATE_MODEL.value}:{diff.path}', op=PlanOp.CREATE_MODEL, path=diff.path, model=DataModelRoot.from_intermediate_node(node))
+                if self._dedup_sub_models:
+                    aliases.update(canonicalize_sub_models(step.model.data))
+            elif diff.op == DiffEnum.DELETED_NODE:
+                step = PlanStep(id=f'{PlanOp.DELETE_MODEL.value}:{diff.path}', op=PlanOp.DELETE_MODEL, path=diff.path, model=DataModelRoot.from_intermediate_node(node))
+            else:
+                step = self._plan_model_update(current_index, diff.path, node, planned_names, aliases)
+            steps[diff.path] = step
+
+        for path, step in steps.items():
+            parent_step = self._nearest_ancestor_step(steps, path)
+            if parent_step is None:
+                continue
+            if step.op == PlanOp.DELETE_MODEL:
+                step.depends_on.append(parent_step.id)
+            else:
+                parent_step.depends_on.append(step.id)
+
+        # a shared sub model is referenced also from outside of its own path
+        steps_by_name = {s.model.clear_name: s for s in steps.values() if s.op != PlanOp.DELETE_MODEL}
+        for step in steps.values():
+            for child_model_name in step.children.values():
+                child_step = steps_by_name.get(child_model_name)
+                if child_step is not None and child_step.id not in step.depends_on:
+                    step.depends_on.append(child_step.id)
+
+        ordered_steps = self._topological_order([s for s in steps.values() if s.op != PlanOp.DELETE_MODEL] + [s for s in steps.values() if s.op == PlanOp.DELETE_MODEL])
+        root_step = steps.get(new_model.name)
+        return ordered_steps, root_step.id if root_step is not None and root_step.op == PlanOp.UPDATE_MODEL else None
 
-        logger.info('Sorting differences by inverse depth')
-        differences_by_level: dict[int, list[NodeDiff]] = {}
-        for idd, diff in diff_map.items():
-            depth_index = idd.count(configuration.tree_path_separator_char) + 1
-            if depth_index not in differences_by_level: differences_by_level[depth_index] = []
-            differences_by_level[depth_index].append(diff)
-        logger.debug(orjson.dumps({str(k): v for (k,v) in differences_by_level.items()}))
-        diff_depths = sorted(differences_by_level.keys(), reverse=True)
-
-        for depth in diff_depths:
-            logger.info(f'Parsing depth {depth}')
-            for diff in differences_by_level[depth]:
-                logger.debug(f'Parsing diff {orjson.dumps(diff)}')
-                if diff.op == DiffEnum.NEW_NODE:
-                    assert isinstance(diff.node, IntermediateNode)
-                    logger.info(f'Creating model {diff.node.get_tree_node_name()} {diff.node.get_node_version()}')
-                    if not self._dry_run:
-                        created_model = await self._connector.create_data_model(DataModelRoot.from_intermediate_node(diff.node))
-                        diff.new_version = created_model.version
-                    else:
-                        diff.new_version = '9.9.9'
-                elif diff.op == DiffEnum.DELETED_NODE:
-                    assert isinstance(diff.node, IntermediateNode)
-                    logger.info(f'Deleting model {diff.node.get_tree_node_name()} {diff.node.get_node_version()}')
-                    if not self._dry_run:
-                        try:
-                            await self._connector.delete_data_model(DataModelRoot.from_intermediate_node(diff.node), self._all_models_by_id)
-                        except:
-                            logger.exception(f'Exception while deleting data model {diff.node.instanceOf}')
-                    # TODO store the created model version in current datamodel...
-                    # TODO should check all child elements... HELP!!!
-                elif diff.op == DiffEnum.NODE_CHANGED:
-                    assert isinstance(diff.node, IntermediateNode)
-                    logger.debug(f'Extracting model id for {diff.node.get_tree_node_name()}')
-                    old_models = await self._get_datamodels_from_names([diff.node.get_tree_node_name()])
-                    assert len(old_models) > 0 and old_models[0].id is not None, f'Cannot find id for {diff.node.get_tree_node_name()}! Found {old_models}'
-
-                    # Fix the node to apply!
-                    if depth < len(diff_depths):
-                        # sublevel_diffs = differences_by_level[depth + 1]
-                        cur_node_children = diff.node.get_tree_node_children()
-                        for child_name, child in cur_node_children.items():
-                            if isinstance(child, IntermediateNode):
-                                # try to fetch from Corvina
-                                try:
-                                    updated_model = (await self._connector.get_datamodel_from_name(child.get_tree_node_name()))[0]
-                                    cur_node_children[child_name] = updated_model.data
-                                except:
-                                    pass
-
-                        # for sublevel_diff in [sd for sd in sublevel_diffs if
-                        #                       sd.path.startswith(diff.path)]:  # Set new version!
-                        #     child_name = sublevel_diff.path.split(configuration.tree_path_separator_char)[-1]
-                        #     if child_name not in cur_node_children:
-                        #         logger.debug(f'Skipping child {child_name} for current node with path {diff.path}')
-                        #         continue
-                        #
-                        #     if sublevel_diff.op == DiffEnum.NODE_CHANGED:
-                        #         if sublevel_diff.new_version is not None:
-                        #             # Not-tanto-smart approach: query Corvina for the new model...
-                        #             cur_node_children[child_name] = (await self._connector.get_datamodel_from_name(
-                        #                 cur_node_children[child_name].get_tree_node_name()))[0].data
-                        #
-                        #             # child_node = cur_node_children[child_name]
-                        #             # assert isinstance(child_node, IntermediateNode)
-                        #             # child_node.instanceOf = child_node.get_tree_node_name() + ':' + sublevel_diff.new_version
-                        #
-                        #     elif sublevel_diff.op == DiffEnum.DELETED_NODE:
-                        #         cur_node_children[child_name] = (await self._connector.get_datamodel_from_name(
-                        #             cur_node_children[child_name].get_tree_node_name()))[0].data
-                        #         # noinspection PyUnresolvedReferences
-                        #         cur_node_children[child_name].deprecated = True  # TODO find the correct type...
-                        #
-                        #     else:
-                        #         logger.debug(f'Doing nothing for subdiff {sublevel_diff} on {diff}...')
-
-                    equal_node = go_to_path(corvina_current_model, diff.path.split(configuration.tree_path_separator_char))
-                    assert isinstance(equal_node, IntermediateNode)
-                    if diff.node.get_node_version() == '1.0.0':
-                        diff.node.instanceOf = equal_node.instanceOf
-
-                    # maybe_set_deprecated_leaves(diff.node, diff.path, equal_node)
-
-                    logger.info(f'Upgrading model (id={old_models[0].id}) {diff.node.get_tree_node_name()} {diff.node.get_node_version()}')
-                    if not self._dry_run:
-                        upgraded_model = await self._connector.update_data_model_by_id(
-                            old_models[0].id, DataModelRoot.from_intermediate_node(diff.node)
-                        )
-                        diff.new_version = upgraded_model.version
-                    else:
-                        diff.new_version = '9.9.9'
-                        logger.debug(f'Putting {orjson.dumps(DataModelRoot.from_intermediate_node(diff.node))}')
-                    logger.info(f'New version of {diff.node.get_tree_node_name()} is {diff.new_version}!')
-                elif diff.op == DiffEnum.NEW_LEAF:  # Probably nothing to do...
-                    pass
-                elif diff.op == DiffEnum.DELETED_LEAF:  # Probably nothing to do...
-                    pass
-                elif diff.op == DiffEnum.LEAF_CHANGED:  # Probably nothing to do...
-                    pass
-                else:
-                    assert False, f'Not yet supported op! {diff.op}'
-
-        if 1 in differences_by_level:
-            updated_root_node = differences_by_level[1][0]
-            assert isinstance(updated_root_node.node, IntermediateNode)
-            updated_root_node.node.instanceOf = updated_root_node.node.get_tree_node_name() + ':' + updated_root_node.new_version
-
-            updated_model = DataModelRoot.from_intermediate_node(updated_root_node.node)
-            updated_model.data.label = new_model.data.label
-            updated_model.data.unit = new_model.data.unit
-            updated_model.data.description = new_model.data.description
-            updated_model.data.UUID = new_model.data.UUID
-            updated_model.data.tags = new_model.data.tags
-            return updated_model
-
-        return new_model
+    @staticmethod
+    def _topological_order(steps: list[PlanStep]) -> list[PlanStep]:
+        """ Keeps the given order, but moves every step after its dependencies (shared sub models may be anywhere) """
+        steps_by_id = {s.id: s for s in steps}
+        res: list[PlanStep] = []
+        visited: set[str] = set()
+
+        def _visit(step: PlanStep):
+            if step.id in visited:
+                return
+            visited.add(step.id)
+            for dependency in step.depends_on:
+                _visit(steps_by_id[dependency])
+            res.append(step)
+
+        for step in steps:
+            _visit(step)
+        return res
 
     @staticmethod
-    def _mapping_update_fun(mapping_to_edit: MappingRoot, node: TreeNode, path: str) -> bool:
-        if isinstance(node, IntermediateNode):
+    def _diff_node(diff: NodeDiff) -> IntermediateNode:
+        node = diff.node.data if isinstance(diff.node, DataModelRoot) else diff.node
+        assert isinstance(node, IntermediateNode), f'Unexpected node in model diff {diff.path}'
+        return node
+
+    def _dedup_model_diffs(
+        self, current_index: TreeIndex, diff_map: dict[str, NodeDiff], model_diffs: list[NodeDiff], aliases: dict[str, str]
+    ) -> list[NodeDiff]:
+        """
+        Drops the new or changed sub models identical to another one (or to an untouched one already in Corvina),
+        filling `aliases` with the one to reference instead. Since a previous dedup run may have shared some sub models:
+        - a changed sub model without a model of its own (its path referenced a shared one) is created from scratch
+        - a removed sub model still referenced elsewhere is not deleted
+        """
+        sep = configuration.tree_path_separator_char
+        changed_paths = {path_key(p) for p in diff_map}
+        untouched: list[IntermediateNode] = []
+        references = collections.Counter()
+        for path, node in current_index.items():
+            if len(path) > 0:  # the root model is never shared
+                references[node.get_tree_node_name()] += 1
+                if path not in changed_paths:
+                    untouched.append(node)
+
+        recreated_paths: list[str] = []
+        res: list[NodeDiff] = []
+        for diff in sorted(model_diffs, key=lambda d: d.path.count(sep)):  # parents first
+            if any(diff.path.startswith(p + sep) for p in recreated_paths):
+                continue  # part of a sub model created from scratch
+            if diff.op == DiffEnum.DELETED_NODE:
+                if references[self._diff_node(diff).get_tree_node_name()] > 1:
+                    logger.info(f'Not deleting {self._diff_node(diff).get_tree_node_name()}: still shared by other sub models')
+                    continue
+            elif diff.op == DiffEnum.NODE_CHANGED and sep in diff.path and self._catalog.find_latest(self._diff_node(diff).get_tree_node_name()) is None:
+                diff = NodeDiff(DiffEnum.NEW_NODE, diff.node, diff.path)
+                recreated_paths.append(diff.path)
+            res.append(diff)
+
+        candidates = [(d.path, self._diff_node(d)) for d in res if d.op != DiffEnum.DELETED_NODE and sep in d.path]  # the root model is never shared
+        aliases.update(find_duplicate_sub_models(candidates, untouched))
+        res = [d for d in res if d.op == DiffEnum.DELETED_NODE or self._diff_node(d).get_tree_node_name() not in aliases]
+        return sorted(res, key=lambda d: d.path.count(sep), reverse=True)
+
+    @staticmethod
+    def _nearest_ancestor_step(steps: dict[str, PlanStep], path: str) -> PlanStep | None:
+        sep = configuration.tree_path_separator_char
+        while sep in path:
+            path = path.rsplit(sep, 1)[0]
+            if path in steps and steps[path].op == PlanOp.UPDATE_MODEL:
+                return steps[path]
+        return None
+
+    def _plan_model_update(
+        self, current_index: TreeIndex, path: str, node: IntermediateNode, planned_names: set[str], aliases: dict[str, str]
+    ) -> PlanStep:
+        equal_node = current_index[path_key(path)]
+        assert isinstance(equal_node, IntermediateNode)
+
+        old_model = self._catalog.find_latest(node.get_tree_node_name())
+        assert old_model is not None and old_model.id is not None, f'Cannot find id for {node.get_tree_node_name()}!'
+
+        model = DataModelRoot.from_intermediate_node(node)
+        children: dict[str, str] = {}
+        for child_name, child in model.data.properties.items():
+            if not isinstance(child, IntermediateNode):
+                continue
+            child_model_name = aliases.get(child.get_tree_node_name(), child.get_tree_node_name())
+            current_child = equal_node.properties.get(child_name)
+            if self._dedup_sub_models and child.get_tree_node_name() not in aliases and child_model_name not in planned_names and isinstance(current_child, IntermediateNode):
+                child_model_name = current_child.get_tree_node_name()  # keep referencing what Corvina has, maybe shared
+            known_model = self._catalog.find_latest(child_model_name) if child_model_name not in planned_names else None
+            if known_model is not None:  # untouched sub model: reference the version already in Corvina
+                model.data.properties[child_name] = known_model.data
+            else:
+                children[child_name] = child_model_name
+        model.data.invalidate_tree_node_digest()
+
+        if self._dedup_sub_models and node.get_node_version() == '1.0.0' and equal_node.get_tree_node_name() != old_model.clear_name:  # the path referenced a shared sub model
+            model.data.instanceOf = old_model.clear_name + ':' + old_model.version
+            model.name, model.version = old_model.clear_name, old_model.version
+        elif node.get_node_version() == '1.0.0':
+            model.data.instanceOf = equal_node.instanceOf
+            model.name, model.version = split_instance_of(equal_node.instanceOf)
+
+        # maybe_set_deprecated_leaves(diff.node, diff.path, equal_node)
+        return PlanStep(
+            id=f'{PlanOp.UPDATE_MODEL.value}:{path}', op=PlanOp.UPDATE_MODEL, path=path, model=model,
+            model_id=old_model.id, children=children
+        )
+
+    async def _apply_model_steps(self, steps: list[PlanStep], root_step: str | None, new_model: DataModelRoot) -> DataModelRoot:
+        steps_by_id = {s.id: s for s in steps}
+        dependencies = {s.id: s.depends_on for s in steps}
+        timings: dict[str, tuple[float, float]] = {}
+
+        async def _timed_step(step_id: str) -> DataModelRoot | None:
+            start = time.monotonic()
             try:
-                mapping_node = go_to_path(mapping_to_edit, node.get_tree_node_name().split(configuration.tree_path_separator_char)[1:])
+                return await self._apply_model_step(steps_by_id[step_id])
+            finally:
+                timings[step_id] = (start, time.monotonic())
+
+        start = time.monotonic()
+        try:
+            results = await run_dag(dependencies, _timed_step, self._concurrency)
+        finally:
+            self._log_critical_path(dependencies, timings, time.monotonic() - start)
+
+        if root_step is None:
+            return new_model
+
+        root_model = steps_by_id[root_step].model
+        root_model.data.instanceOf = root_model.clear_name + ':' + results[root_step].version
+        updated_model = DataModelRoot.from_intermediate_node(root_model.data)
+        updated_model.data.label = new_model.data.label
+        updated_model.data.unit = new_model.data.unit
+        updated_model.data.description = new_model.data.description
+        updated_model.data.UUID = new_model.data.UUID
+        updated_model.data.tags = new_model.data.tags
+        return updated_model
+
+    @staticmethod
+    def _log_critical_path(dependencies: dict[str, list[str]], timings: dict[str, tuple[float, float]], elapsed: float):
+        if len(timings) == 0:
+            return
+        busy = sum(end - start for start, end in timings.values())
+        logger.info(f'Applied {len(timings)} model steps in {elapsed:.2f}s ({busy:.2f}s of requests, average parallelism {busy / max(elapsed, 1e-9):.1f})')
+
+        path = critical_path(dependencies, timings)
+        report = []
+        previous_end = min(start for start, _ in timings.values())
+        for step_id in path:
+            start, end = timings[step_id]
+            waited = f', waited {start - previous_end:.2f}s for a slot' if start - previous_end > 0.001 else ''
+            report.append(f'{step_id} ({end - start:.2f}s{waited})')
+            previous_end = end
+        logger.info(f'Critical path: {" -> ".join(report)}')
+
+    async def _fetch_latest_models(self, names: collections.abc.Iterable[str]) -> dict[str, DataModelRoot]:
+        async def _fetch(name: str) -> list[DataModelRoot]:
+            try:
+                return await self._connector.get_datamodel_from_name(name)
+            except Exception:
+                logger.warning(f'Cannot fetch model {name} from Corvina', exc_info=True)
+                return []
+
+        names = list(names)
+        logger.debug(f'Fetching models {names} from Corvina')
+        res = {}
+        for name, models in zip(names, await gather_bounded((_fetch(n) for n in names), self._concurrency)):
+            if self._catalog is not None:  # an applied saved plan has none: the fetched versions are enough
+                for model in models:
+                    self._catalog.add(model)
+            same_name = [m for m in models if m.clear_name == name]
+            if len(same_name) > 0:
+                res[name] = max(same_name, key=lambda m: SemverVersion.from_string(m.version))
+        return res
+
+    async def _apply_model_step(self, step: PlanStep) -> DataModelRoot | None:
+        if step.op == PlanOp.CREATE_MODEL:
+            logger.info(f'Creating model {step.model.clear_name} {step.model.version}')
+            created_model = await self._connector.create_data_model(step.model)
+            self._add_to_catalog(created_model)
+            return created_model
+
+        if step.op == PlanOp.DELETE_MODEL:
+            logger.info(f'Deleting model {step.model.clear_name} {step.model.version}')
+            try:
+                await self._connector.delete_data_model(step.model, self._catalog)
             except:
-                logger.warning(f'Node {node.get_tree_node_name().split(configuration.tree_path_separator_char)[1:]} not found in new mapping {node.get_tree_node_name()}')
+                logger.exception(f'Exception while deleting data model {step.model.data.instanceOf}')
+            # TODO should check all child elements... HELP!!!
+            return None
+
+        assert step.op == PlanOp.UPDATE_MODEL, f'Not yet supported op! {step.op}'
+        # Reference the sub models upgraded by this plan (or, when not known, the latest ones in Corvina)
+        unresolved_children: dict[str, str] = {}
+        for child_name, child_model_name in step.children.items():
+            if child_model_name in self._resolved_models:
+                step.model.data.properties[child_name] = self._resolved_models[child_model_name].data
+            else:
+                unresolved_children[child_name] = child_model_name
+        if len(unresolved_children) > 0:  # fallback: fetch from Corvina the missing ones, all together
+            fetched_models = await self._fetch_latest_models(set(unresolved_children.values()))
+            for child_name, child_model_name in unresolved_children.items():
+                if child_model_name in fetched_models:
+                    step.model.data.properties[child_name] = fetched_models[child_model_name].data
+        step.model.data.invalidate_tree_node_digest()
+        step.model.invalidate_tree_node_digest()
+
+        logger.info(f'Upgrading model (id={step.model_id}) {step.model.clear_name} {step.model.version}')
+        upgraded_model = await self._connector.update_data_model_by_id(step.model_id, step.model)
+        self._add_to_catalog(upgraded_model)
+        logger.info(f'New version of {upgraded_model.clear_name} is {upgraded_model.version}!')
+        return upgraded_model
+
+    def _add_to_catalog(self, model: DataModelRoot):
+        if self._catalog is not None:
+            self._catalog.add(model)
+        self._resolved_models[model.clear_name] = model
+
+    @staticmethod
+    def _mapping_update_fun(mapping_index: TreeIndex, node: TreeNode, path: TreePath) -> bool:
+        if isinstance(node, IntermediateNode):
+            mapping_node = mapping_index.get(path)  # the walk path: no name splitting per node
+            if mapping_node is None:
+                logger.warning(f'Node {node.get_tree_node_name()} not found in new mapping')
                 return True
 
             assert isinstance(mapping_node, IntermediateNode), f'Boh {orjson.dumps(mapping_node)} in path {path}'
             if node.get_node_version() != mapping_node.get_node_version():
-                logger.debug(f'Upgrading {path} from {mapping_node.get_node_version()} to {node.get_node_version()}')
+                logger.debug(f'Upgrading {node.get_tree_node_name()} from {mapping_node.get_node_version()} to {node.get_node_version()}')
                 mapping_node.instanceOf = node.get_tree_node_name() + ':' + node.get_node_version()
         return True
 
-    async def _perform_mapping_upgrade(self, upgraded_model: DataModelRoot, mapping: MappingRoot) -> MappingRoot:
+    async def _perform_mapping_only_upgrade(self, current_preset: MappingRoot, data_model: DataModelRoot, mapping: MappingRoot) -> MappingRoot:
+        """ The deployed models are still the ones of the local file: the current preset tells their versions """
+        logger.info(f'Setting the model versions of preset {current_preset.id} in mapping')
+        sync_mapping_sub_models(current_preset.data, mapping.data)
+        model_name, model_version = split_instance_of(current_preset.data.instanceOf)
+        deployed_model = DataModelRoot(id=current_preset.modelId, name=model_name, version=model_version, data=data_model.data)
+        return await self._upload_preset(deployed_model, mapping, current_preset)
+
+    async def _perform_mapping_upgrade(
+        self, upgraded_model: DataModelRoot, mapping: MappingRoot, by_property: bool = False, current_preset: MappingRoot | None = None
+    ) -> MappingRoot:
         logger.info('Setting new model versions in mapping')
-        dfs(upgraded_model.data, functools.partial(self._mapping_update_fun, mapping.data))
-
+        if by_property:  # sub models may be shared, their names do not match the paths anymore
+            sync_mapping_sub_models(upgraded_model.data, mapping.data)
+        else:
+            mapping_index = TreeIndex(mapping.data)
+            for node, path, _ in walk_tree(upgraded_model.data):
+                self._mapping_update_fun(mapping_index, node, path)
+        return await self._upload_preset(upgraded_model, mapping, current_preset)
+
+    async def _upload_preset(self, data_model: DataModelRoot, mapping: MappingRoot, current_preset: MappingRoot | None) -> MappingRoot:
+        """
+        Creates the preset of `mapping`, unless the deployed one is identical: then nothing is sent.
+        The new preset replaces `current_preset`, which is deleted once the new one exists: one preset per name is left.
+        """
         logger.debug(f'Setting new mapping {orjson.dumps(mapping)}')
-        if not self._dry_run:
-            return await self._connector.create_preset(upgraded_model, mapping)
-
-        return mapping
+        mapping_diff = diff_mappings(current_preset, mapping, f'{data_model.clear_name}:{data_model.version}') if current_preset is not None else None
+        if mapping_diff is not None:
+            logger.info(f'Mapping {mapping.name} against preset {current_preset.id}: {mapping_diff.describe()}')
+            if mapping_diff.is_empty:
+                logger.info(f'Preset {current_preset.id} is already up to date, nothing uploaded')
+                return current_preset
+        if self._dry_run:
+            return mapping
+        new_preset = await self._connector.create_preset(data_model, mapping)
+        if current_preset is not None and current_preset.id != new_preset.id:
+            await self._delete_superseded_preset(current_preset, new_preset)
+        return new_preset
+
+    async def _delete_superseded_preset(self, current_preset: MappingRoot, new_preset: MappingRoot):
+        """ A failure leaves both presets in place, the new one being found first (newest first, see find_latest_preset) """
+        logger.info(f'Deleting preset {current_preset.id}, superseded by {new_preset.id}')
+        try:
+            await self._connector.delete_preset_by_id(current_preset.id)
+        except Exception as e:
+            logger.warning(f'Cannot delete superseded preset {current_preset.id} of {current_preset.name}: {e}')
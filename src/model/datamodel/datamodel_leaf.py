@@ -1,11 +1,13 @@
-import copy
 import dataclasses
+import functools
 
 from model.corvina_datatype import CorvinaDatatype
 from model.tree.tree_leaf import TreeLeaf
+from model.tree.tree_node import new_tree_node_hasher
+from utils.intern_utils import intern_str
 
 
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class DataModelLeaf(TreeLeaf):
     version: str | None = None
     type: CorvinaDatatype
@@ -22,8 +24,22 @@ class DataModelLeaf(TreeLeaf):
         if self.version is None:
             self.version = '1.0.0'
 
+    def _compute_tree_node_digest(self) -> bytes:
+        return _leaf_digest(self.version, self.type, self.deprecated)
+
     @classmethod
     def from_dict(cls, dikt: dict) -> 'DataModelLeaf':
-        d = copy.deepcopy(dikt)
+        d = cls.remove_extra_fields(dikt)
         d['type'] = CorvinaDatatype(dikt['type'])
-        return DataModelLeaf(**cls.remove_extra_fields(d))
+        d['version'] = intern_str(d.get('version'))
+        leaf = DataModelLeaf(**d)
+        leaf._digest = leaf._compute_tree_node_digest()  # a cache hit, cheaper here than through the lazy tree walk
+        return leaf
+
+
+@functools.cache
+def _leaf_digest(version: str, datatype: CorvinaDatatype | str, deprecated: bool | None) -> bytes:
+    # only a handful of (version, type) pairs exist in a model: each digest is computed once
+    h = new_tree_node_hasher()
+    h.update(f'{version}\0{getattr(datatype, "value", datatype)}\0{deprecated}'.encode())
+    return h.digest()
@@ -1,15 +1,14 @@
-import copy
-import orjson
 import dataclasses
 
 from model.tree.intermediate_node import IntermediateNode
 # from corvina_connector.corvina_client import CorvinaClient
 from model.tree.root_node import RootNode
 from model.tree.root_node_aux import RootNodeAux
-from utils.corvina_version_utils import version_re
+from utils.corvina_version_utils import split_instance_of, version_re
+from utils.payload_utils import payload_dict
 
 
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class DataModelRoot(RootNode):
     version: str | None = None
 
@@ -26,40 +25,44 @@ class DataModelRoot(RootNode):
 
     @classmethod
     def from_dict(cls, dikt: dict) -> 'DataModelRoot':
-        d = copy.deepcopy(dikt)
+        d = cls.remove_extra_fields(dikt)
         d['data'] = RootNodeAux.from_dict(dikt.get('data') or dikt['json'])
-        return DataModelRoot(**cls.remove_extra_fields(d))
+        return DataModelRoot(**d)
 
     @classmethod
     def from_intermediate_node(cls, node: IntermediateNode) -> 'DataModelRoot':
         # assert not is_leaf(node), f'Cannot create a DataModelRoot starting from a Leaf! {orjson.dumps(node)}'
 
-        match = version_re.match(node.instanceOf)
+        name, version = split_instance_of(node.instanceOf)
         return DataModelRoot(
             id=None,
-            name=match.group(1),
+            name=name,
             data=RootNodeAux.from_intermediate_node(node),
             deleted=False,
-            version=match.group(2)
+            version=version
         )
 
     def get_create_model_payload(self) -> dict:
-        data = orjson.loads(orjson.dumps(self))  # this removes problems like the CorvinaDatatype enum
+        """
+        Top levels of the creation payload (nulls already dropped); the sub tree is left to utils.payload_utils.dumps_payload
+        """
+        data = payload_dict(self)
+        data['data'] = payload_dict(self.data)
         if not version_re.match(data['name']):
             data['name'] = data['name'] + ':1.0.0'
         if not version_re.match(data['data']['instanceOf']):
             data['data']['instanceOf'] = data['data']['instanceOf'] + ':1.0.0'
         return data
 
-    async def maybe_fetch_id(self, connector: 'CorvinaClient', cache: dict[str, 'DataModelRoot'] | None = None):
+    async def maybe_fetch_id(self, connector: 'CorvinaClient', catalog: 'ModelCatalog | None' = None):
         if self.id is not None:
             return
 
-        # TODO implement the get by name (exists!!)
-        models: dict[str, DataModelRoot] = cache or (await connector.get_datamodels_by_id())
-        for model_id, dm in models.items():
-            if dm.name == self.clear_name and dm.version == self.version:
-                self.id = model_id
-                return
+        if catalog is not None:
+            model = catalog.find(self.clear_name, self.version)
+            assert model is not None, f'Cannot find model {self.name}:{self.version}'
+            self.id = model.id
+            return
 
-        assert False, f'Cannot find model {self.name}:{self.version}'
+        self.id = await connector.find_datamodel_id(self.clear_name, self.version)
+        assert self.id is not None, f'Cannot find model {self.name}:{self.version}'
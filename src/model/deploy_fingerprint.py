@@ -0,0 +1,49 @@
+import hashlib
+
+import orjson
+
+from model.datamodel.datamodel_root import DataModelRoot
+from model.mapping.mapping_root import MappingRoot
+from model.tree.root_node import RootNode
+from utils.payload_utils import dumps_payload
+
+# Stored in the tags of the deployed preset: the whole deploy, and its model only
+FINGERPRINT_TAG = 'fingerprint:'
+MODEL_FINGERPRINT_TAG = 'model-fingerprint:'
+
+
+def _is_fingerprint_tag(tag: str) -> bool:
+    return tag.startswith(FINGERPRINT_TAG) or tag.startswith(MODEL_FINGERPRINT_TAG)
+
+
+def _canonical_payload(root: RootNode) -> bytes:
+    """ Content of the local file, with sorted keys and without ids and fingerprint tags """
+    d = orjson.loads(dumps_payload(root))
+    d.pop('id', None)
+    d.pop('modelId', None)
+    if 'tags' in d['data']:
+        d['data']['tags'] = [t for t in d['data']['tags'] if not _is_fingerprint_tag(t)]
+    return orjson.dumps(d, option=orjson.OPT_SORT_KEYS)
+
+
+def compute_fingerprints(data_model: DataModelRoot, mapping: MappingRoot, dedup_sub_models: bool) -> tuple[str, str]:
+    """ (deploy, model) fingerprints of the local files; the dedup mode is included, as it changes what is deployed """
+    model_hasher = hashlib.sha256(b'dedup' if dedup_sub_models else b'plain')
+    model_hasher.update(_canonical_payload(data_model))
+    deploy_hasher = model_hasher.copy()
+    deploy_hasher.update(_canonical_payload(mapping))
+    return deploy_hasher.hexdigest()[:32], model_hasher.hexdigest()[:32]
+
+
+def read_fingerprints(preset: MappingRoot) -> tuple[str | None, str | None]:
+    """ (deploy, model) fingerprints stored in a deployed preset, None when missing """
+    tags = preset.data.tags or []
+    deploy = next((t[len(FINGERPRINT_TAG):] for t in tags if t.startswith(FINGERPRINT_TAG)), None)
+    model = next((t[len(MODEL_FINGERPRINT_TAG):] for t in tags if t.startswith(MODEL_FINGERPRINT_TAG)), None)
+    return deploy, model
+
+
+def set_fingerprints(mapping: MappingRoot, fingerprint: str, model_fingerprint: str):
+    """ Replaces the fingerprint tags of the mapping to deploy, keeping every other tag """
+    tags = [t for t in mapping.data.tags or [] if not _is_fingerprint_tag(t)]
+    mapping.data.tags = tags + [FINGERPRINT_TAG + fingerprint, MODEL_FINGERPRINT_TAG + model_fingerprint]
@@ -0,0 +1,86 @@
+import dataclasses
+import enum
+
+import orjson
+
+from model.datamodel.datamodel_root import DataModelRoot
+from model.mapping.mapping_root import MappingRoot
+from utils.dataclass_utils import BaseDataClass
+from utils.payload_utils import dumps_payload
+
+
+class PlanOp(enum.Enum):
+    CREATE_MODEL = 'create_model'
+    UPDATE_MODEL = 'update_model'
+    DELETE_MODEL = 'delete_model'
+
+
+@dataclasses.dataclass(kw_only=True)
+class PlanStep(BaseDataClass):
+    id: str
+    op: PlanOp
+    path: str
+    model: DataModelRoot  # what is sent to Corvina (for updates, before the `children` are resolved)
+    depends_on: list[str] = dataclasses.field(default_factory=list)
+    model_id: str | None = None  # id of the model to upgrade (only updates)
+    children: dict[str, str] = dataclasses.field(default_factory=dict)  # property -> sub model name, resolved when applying
+
+    @classmethod
+    def from_dict(cls, dikt: dict) -> 'PlanStep':
+        d = cls.remove_extra_fields(dikt)
+        d['op'] = PlanOp(d['op'])
+        d['model'] = DataModelRoot.from_dict(d['model'])
+        return PlanStep(**d)
+
+    def describe(self) -> str:
+        res = f'{self.op.value} {self.model.clear_name}:{self.model.version}'
+        return res + (f' (after {", ".join(self.depends_on)})' if len(self.depends_on) > 0 else '')
+
+
+@dataclasses.dataclass(kw_only=True)
+class DeployPlan(BaseDataClass):
+    """
+    Every Corvina change needed to sync a deploy, computed offline against the model catalog.
+    Steps are listed in a valid execution order, while `depends_on` edges allow to run independent ones concurrently.
+    """
+    deploy_name: str
+    new_deploy: bool
+    model: DataModelRoot
+    mapping: MappingRoot
+    steps: list[PlanStep] = dataclasses.field(default_factory=list)
+    root_step: str | None = None
+    dedup_sub_models: bool = False
+    aliases: dict[str, str] = dataclasses.field(default_factory=dict)  # sub model -> identical one referenced instead
+    fingerprint: str | None = None  # of the local model and mapping, stored in the deployed preset
+    model_fingerprint: str | None = None
+    current_preset: MappingRoot | None = None  # the deployed one, compared with the mapping before uploading it
+    model_unchanged: bool = False  # no model steps are needed, the current preset tells the deployed versions
+    up_to_date: bool = False  # the mapping is unchanged too: nothing to do
+
+    @classmethod
+    def from_dict(cls, dikt: dict) -> 'DeployPlan':
+        d = cls.remove_extra_fields(dikt)
+        d['model'] = DataModelRoot.from_dict(d['model'])
+        d['mapping'] = MappingRoot.from_dict(d['mapping'])
+        d['steps'] = [PlanStep.from_dict(s) for s in d.get('steps', [])]
+        if d.get('current_preset') is not None:
+            d['current_preset'] = MappingRoot.from_dict(d['current_preset'])
+        return DeployPlan(**d)
+
+    @classmethod
+    def from_json(cls, data: bytes | str) -> 'DeployPlan':
+        return cls.from_dict(orjson.loads(data))
+
+    def to_json(self) -> bytes:
+        return dumps_payload(self)
+
+    def describe(self) -> list[str]:
+        if self.up_to_date:
+            return [f'Deploy {self.deploy_name} is up to date (fingerprint {self.fingerprint}), nothing to do']
+        if self.model_unchanged:
+            return [f'Plan for deploy {self.deploy_name}: model unchanged (fingerprint {self.model_fingerprint}), only the mapping']
+        res = [f'Plan for deploy {self.deploy_name} ({len(self.steps)} model steps, then the mapping)']
+        res.extend(f'  {i + 1}. [{s.id}] {s.describe()}' for i, s in enumerate(self.steps))
+        if len(self.aliases) > 0:
+            res.append(f'Dedup: {len(self.aliases)} sub models reuse an identical one ({len(self.aliases)} uploads saved)')
+        return res
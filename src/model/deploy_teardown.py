@@ -0,0 +1,119 @@
+import collections.abc
+import dataclasses
+import logging
+
+from corvina_connector.corvina_client import CorvinaClient
+from model.datamodel.datamodel_root import DataModelRoot
+from model.mapping.mapping_root import MappingRoot
+from model.model_catalog import ModelCatalog
+from utils.async_utils import gather_bounded, run_dag
+from utils.dataclass_utils import BaseDataClass
+
+logger = logging.getLogger('app.deploy_teardown')
+
+
+@dataclasses.dataclass
+class TeardownOutcome(BaseDataClass):
+    kind: str  # preset or model
+    target: str  # model name:version, or preset name on model name:version
+    ok: bool
+    skipped: bool = False
+    error: str | None = None
+
+
+def model_delete_dependencies(models: collections.abc.Iterable[DataModelRoot]) -> dict[str, list[str]]:
+    """
+    For every model id, the ids of the provided models to delete before it: the ones referencing it (at any depth)
+    through instanceOf, as Corvina refuses to delete a model still in use
+    """
+    models = list(models)
+    ids_by_reference = {f'{m.clear_name}:{m.version}': m.id for m in models}
+    dependencies = {m.id: [] for m in models}
+    for model in models:
+        for reference in set(model.get_intermediate_elems()):
+            referenced_id = ids_by_reference.get(reference)
+            if referenced_id is not None and referenced_id != model.id:
+                dependencies[referenced_id].append(model.id)
+    return dependencies
+
+
+async def teardown_deploy(
+    connector: CorvinaClient,
+    presets: collections.abc.Iterable[MappingRoot],
+    models: collections.abc.Iterable[DataModelRoot],
+    dry_run: bool,
+    concurrency: int,
+    catalog: ModelCatalog | None = None
+) -> list[TeardownOutcome]:
+    """
+    Deletes the presets, then the models, with at most `concurrency` requests in flight. Ids must be already resolved
+    (objects without one are reported as not found): no lookup is made here. Models go parents first, every one as
+    soon as all the models referencing it are gone; the ones referenced by a model that could not be deleted are skipped.
+    """
+    presets = list(presets)
+    models = list({m.id if m.id is not None else f'{m.clear_name}:{m.version}': m for m in models}.values())
+    outcomes: list[TeardownOutcome] = []
+
+    def _preset_target(preset: MappingRoot) -> str:
+        return f'{preset.name} on model {preset.data.instanceOf}'
+
+    async def _delete_preset(preset: MappingRoot) -> TeardownOutcome:
+        if preset.id is None:
+            return TeardownOutcome('preset', _preset_target(preset), True, skipped=True, error='not found')
+        logger.info(f'Deleting mapping {_preset_target(preset)}')
+        if dry_run:
+            return TeardownOutcome('preset', _preset_target(preset), True, skipped=True)
+        await connector.delete_preset_by_id(preset.id)
+        return TeardownOutcome('preset', _preset_target(preset), True)
+
+    results = await gather_bounded((_delete_preset(p) for p in presets), concurrency, return_exceptions=True)
+    outcomes.extend(
+        r if isinstance(r, TeardownOutcome) else TeardownOutcome('preset', _preset_target(p), False, error=f'{type(r).__name__}: {r}')
+        for p, r in zip(presets, results)
+    )
+
+    found_models = {m.id: m for m in models if m.id is not None}
+    outcomes.extend(
+        TeardownOutcome('model', f'{m.clear_name}:{m.version}', True, skipped=True, error='not found')
+        for m in models if m.id is None
+    )
+    dependencies = model_delete_dependencies(found_models.values())
+    model_outcomes: dict[str, TeardownOutcome] = {}
+
+    async def _delete_model(model_id: str) -> TeardownOutcome:
+        model = found_models[model_id]
+        target = f'{model.clear_name}:{model.version}'
+        failed_parents = [found_models[d].clear_name for d in dependencies[model_id] if not model_outcomes[d].ok]
+        if len(failed_parents) > 0:
+            outcome = TeardownOutcome('model', target, False, skipped=True, error=f'still referenced by {", ".join(failed_parents)}')
+        elif dry_run:
+            logger.info(f'Deleting model {target}')
+            outcome = TeardownOutcome('model', target, True, skipped=True)
+        else:
+            logger.info(f'Deleting model {target}')
+            try:
+                await connector.delete_data_model_by_id(model_id)
+                outcome = TeardownOutcome('model', target, True)
+                if catalog is not None:
+                    catalog.remove(model_id)
+            except Exception as e:
+                outcome = TeardownOutcome('model', target, False, error=f'{type(e).__name__}: {e}')
+        model_outcomes[model_id] = outcome
+        return outcome
+
+    await run_dag(dependencies, _delete_model, concurrency)
+    outcomes.extend(model_outcomes[i] for i in found_models)
+    return outcomes
+
+
+def log_teardown_outcomes(outcomes: list[TeardownOutcome]):
+    for o in outcomes:
+        if not o.ok:
+            logger.error(f'Cannot delete {o.kind} {o.target}: {o.error}')
+        elif o.error is not None:
+            logger.warning(f'Skipped {o.kind} {o.target}: {o.error}')
+    for kind in ('preset', 'model'):
+        of_kind = [o for o in outcomes if o.kind == kind]
+        failed = sum(1 for o in of_kind if not o.ok)
+        skipped = sum(1 for o in of_kind if o.ok and o.skipped)
+        logger.info(f'{kind.capitalize()}s: {len(of_kind) - failed - skipped} deleted, {skipped} skipped, {failed} failed')
@@ -0,0 +1,28 @@
+import dataclasses
+import enum
+
+from utils.dataclass_utils import BaseDataClass
+
+
+class DeviceGroupConfigJobStatus(enum.Enum):
+    PROCESSING = 'PROCESSING'
+    DONE = 'DONE'
+    ERROR = 'ERROR'
+
+
+@dataclasses.dataclass(kw_only=True)
+class DeviceGroupConfigJob(BaseDataClass):
+    id: str
+    status: DeviceGroupConfigJobStatus
+    instanceOf: str | None = None
+    error: str | None = None
+
+    @classmethod
+    def from_dict(cls, dikt: dict) -> 'DeviceGroupConfigJob':
+        d = cls.remove_extra_fields(dikt)
+        d['status'] = DeviceGroupConfigJobStatus(d['status'])
+        return DeviceGroupConfigJob(**d)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status != DeviceGroupConfigJobStatus.PROCESSING
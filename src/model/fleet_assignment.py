@@ -0,0 +1,91 @@
+import dataclasses
+import logging
+
+import configuration
+from corvina_connector.corvina_client import CorvinaClient
+from model.device.corvina_device import CorvinaDevice
+from model.device.device_group_config_job import DeviceGroupConfigJobStatus
+from model.mapping.mapping_root import MappingRoot
+from utils.async_utils import gather_bounded
+from utils.dataclass_utils import BaseDataClass
+
+logger = logging.getLogger('app.fleet_assignment')
+
+
+@dataclasses.dataclass
+class DeviceSelector(BaseDataClass):
+    """ Devices to configure: explicit ids, plus every device carrying all `tags` and all `attributes` (if any is set) """
+    device_ids: list[str] = dataclasses.field(default_factory=list)
+    tags: list[str] = dataclasses.field(default_factory=list)
+    attributes: dict[str, str] = dataclasses.field(default_factory=dict)
+
+    @property
+    def needs_device_list(self) -> bool:
+        return len(self.tags) > 0 or len(self.attributes) > 0
+
+    def matches(self, device: CorvinaDevice) -> bool:
+        device_attributes = device.attributes or {}
+        return (
+            all(t in (device.tags or []) for t in self.tags) and
+            all(k in device_attributes and str(device_attributes[k]) == v for k, v in self.attributes.items())
+        )
+
+
+@dataclasses.dataclass
+class AssignmentResult(BaseDataClass):
+    target: str  # device id or device group name
+    ok: bool
+    skipped: bool = False
+    error: str | None = None
+
+
+async def select_device_ids(connector: CorvinaClient, selector: DeviceSelector) -> list[str]:
+    device_ids = list(dict.fromkeys(selector.device_ids))
+    if selector.needs_device_list:
+        known = set(device_ids)
+        device_ids.extend([d.id async for d in connector.iter_devices() if d.id not in known and selector.matches(d)])
+    return device_ids
+
+
+async def assign_mapping_to_devices(
+    connector: CorvinaClient,
+    mapping: MappingRoot,
+    selector: DeviceSelector,
+    dry_run: bool,
+    concurrency: int = configuration.max_concurrent_device_assignments
+) -> list[AssignmentResult]:
+    """ Sets `mapping` on every selected device, with at most `concurrency` requests in flight """
+    device_ids = await select_device_ids(connector, selector)
+    logger.info(f'Assigning mapping {mapping.name} to {len(device_ids)} devices')
+
+    async def _assign(device_id: str) -> AssignmentResult:
+        if dry_run:
+            return AssignmentResult(device_id, True, skipped=True)
+        await connector.set_device_mapping(device_id, mapping)
+        return AssignmentResult(device_id, True)
+
+    results = await gather_bounded((_assign(i) for i in device_ids), concurrency, return_exceptions=True)
+    return [
+        r if isinstance(r, AssignmentResult) else AssignmentResult(device_id, False, error=f'{type(r).__name__}: {r}')
+        for device_id, r in zip(device_ids, results)
+    ]
+
+
+async def assign_mapping_to_group(connector: CorvinaClient, mapping: MappingRoot, group_name: str, dry_run: bool) -> AssignmentResult:
+    """ Sets `mapping` on a whole device group through the Corvina async job API, waiting for the job to finish """
+    logger.info(f'Assigning mapping {mapping.name} to device group {group_name}')
+    if dry_run:
+        return AssignmentResult(group_name, True, skipped=True)
+
+    job = await connector.set_device_group_mapping(group_name, mapping)
+    job = await connector.wait_device_group_job(group_name, job)
+    return AssignmentResult(group_name, job.status == DeviceGroupConfigJobStatus.DONE, error=job.error)
+
+
+def log_assignment_results(results: list[AssignmentResult]):
+    for r in results:
+        if not r.ok:
+            logger.error(f'Cannot assign mapping to {r.target}: {r.error}')
+    failed = sum(1 for r in results if not r.ok)
+    skipped = sum(1 for r in results if r.skipped)
+    logger.info(f'Mapping assigned to {len(results) - failed - skipped} targets, {skipped} skipped (dry run), {failed} failed')
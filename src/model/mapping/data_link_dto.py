@@ -3,6 +3,6 @@ import dataclasses
 from utils.dataclass_utils import BaseDataClass
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class DataLinkDto(BaseDataClass):
     source: str
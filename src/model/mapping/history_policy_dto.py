@@ -1,8 +1,14 @@
 import dataclasses
+import functools
 
 from utils.dataclass_utils import BaseDataClass
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class HistoryPolicyDto(BaseDataClass):
     enabled: bool
+
+    @staticmethod
+    @functools.cache
+    def create(enabled: bool) -> 'HistoryPolicyDto':
+        return HistoryPolicyDto(enabled=enabled)
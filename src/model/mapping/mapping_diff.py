@@ -0,0 +1,105 @@
+import dataclasses
+
+import orjson
+
+import configuration
+from model.mapping.mapping_leaf import MappingLeaf
+from model.mapping.mapping_root import MappingRoot
+from model.mapping.send_policy_trigger_dto import SendPolicyTriggerDto
+from model.tree.intermediate_node import IntermediateNode
+from utils.dataclass_utils import BaseDataClass
+from utils.payload_utils import dumps_payload, payload_dict
+from utils.tree_index import TreeIndex
+from utils.tree_visit_utils import walk_tree
+
+_LEAF_FIELDS = ('datalink', 'mode')
+_POLICY_FIELDS = ('sendPolicy', 'historyPolicy')
+_TRIGGER_DEFAULTS = payload_dict(SendPolicyTriggerDto.create_default())
+_ROOT_FIELDS = ('label', 'unit', 'description', 'tags')
+
+
+@dataclasses.dataclass
+class MappingDiff(BaseDataClass):
+    changed_leaves: list[str] = dataclasses.field(default_factory=list)  # paths, from the root properties
+    added_leaves: list[str] = dataclasses.field(default_factory=list)
+    removed_leaves: list[str] = dataclasses.field(default_factory=list)
+    references_changed: bool = False  # the model or a sub model reference changed
+    metadata_changed: bool = False  # label, unit, description or tags of the preset
+
+    @property
+    def leaf_changes(self) -> int:
+        return len(self.changed_leaves) + len(self.added_leaves) + len(self.removed_leaves)
+
+    @property
+    def is_empty(self) -> bool:
+        return self.leaf_changes == 0 and not self.references_changed and not self.metadata_changed
+
+    def describe(self) -> str:
+        res = f'{len(self.changed_leaves)} leaves changed, {len(self.added_leaves)} added, {len(self.removed_leaves)} removed'
+        if self.references_changed:
+            res += ', model references changed'
+        if self.metadata_changed:
+            res += ', metadata changed'
+        return res
+
+
+def _joined(path: tuple[str, ...]) -> str:
+    return configuration.tree_path_separator_char.join(path)
+
+
+def _normalized_policy(policy) -> object:
+    """ Plain JSON value of a policy (dict or DTO), with the trigger fields left out filled in with their defaults """
+    res = orjson.loads(dumps_payload(policy))
+    if isinstance(res, dict) and isinstance(res.get('triggers'), list):
+        res['triggers'] = [_TRIGGER_DEFAULTS | t if isinstance(t, dict) else t for t in res['triggers']]
+    return res
+
+
+def _covers(current, new) -> bool:
+    # every field of `new` has the same value in `current`; the fields only in `current` were added by Corvina
+    if isinstance(new, dict):
+        return isinstance(current, dict) and all(k in current and _covers(current[k], v) for k, v in new.items())
+    if isinstance(new, list):
+        return isinstance(current, list) and len(current) == len(new) and all(map(_covers, current, new))
+    return current == new
+
+
+def _same_policy(current, new) -> bool:
+    """
+    Corvina stores policies with extra fields (e.g. sendPolicyMode) and defaults filled in, so a deployed policy
+    matches the local one when it has every local field with the same value, defaults included
+    """
+    return current == new or _covers(_normalized_policy(current), _normalized_policy(new))
+
+
+def diff_mappings(current: MappingRoot, new: MappingRoot, new_instance_of: str) -> MappingDiff:
+    """
+    Compares a deployed preset with the mapping about to replace it (on model `new_instance_of`), leaf by leaf:
+    only datalink, send/history policies and mode can differ between presets of the same model. Policies are
+    compared on the fields of the local mapping only (see _same_policy).
+    """
+    res = MappingDiff(
+        references_changed=current.data.instanceOf != new_instance_of,
+        metadata_changed=any(getattr(current.data, f) != getattr(new.data, f) for f in _ROOT_FIELDS)
+    )
+
+    current_index = TreeIndex(current.data)
+    for node, path, depth in walk_tree(new.data):
+        current_node = current_index.get(path) if depth > 0 else current.data
+        if isinstance(node, IntermediateNode):
+            if depth > 0 and (not isinstance(current_node, IntermediateNode) or current_node.instanceOf != node.instanceOf):
+                res.references_changed = True
+        elif not isinstance(current_node, MappingLeaf):
+            res.added_leaves.append(_joined(path))
+        elif (
+            any(getattr(node, f) != getattr(current_node, f) for f in _LEAF_FIELDS) or
+            not all(_same_policy(getattr(current_node, f), getattr(node, f)) for f in _POLICY_FIELDS)
+        ):
+            res.changed_leaves.append(_joined(path))
+
+    new_index = TreeIndex(new.data)
+    res.removed_leaves.extend(
+        _joined(path) for node, path, _ in walk_tree(current.data)
+        if isinstance(node, MappingLeaf) and not isinstance(new_index.get(path), MappingLeaf)
+    )
+    return res
@@ -0,0 +1,27 @@
+import dataclasses
+import enum
+
+from utils.dataclass_utils import BaseDataClass
+
+
+class MappingJobStatus(enum.Enum):
+    PROCESSING = 'PROCESSING'
+    DONE = 'DONE'
+    ERROR = 'ERROR'
+
+
+@dataclasses.dataclass(kw_only=True)
+class MappingJob(BaseDataClass):
+    id: str
+    status: MappingJobStatus
+    error: str | None = None
+
+    @classmethod
+    def from_dict(cls, dikt: dict) -> 'MappingJob':
+        d = cls.remove_extra_fields(dikt)
+        d['status'] = MappingJobStatus(d['status'])
+        return MappingJob(**d)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status != MappingJobStatus.PROCESSING
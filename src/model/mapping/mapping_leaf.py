@@ -1,13 +1,17 @@
 import dataclasses
 
+import orjson
+
 from model.corvina_datatype import CorvinaDatatype
 from model.datamodel.datamodel_leaf import DataModelLeaf
 from model.mapping.data_link_dto import DataLinkDto
 from model.mapping.history_policy_dto import HistoryPolicyDto
 from model.mapping.send_policy_dto import SendPolicyDto
+from model.tree.tree_node import new_tree_node_hasher
+from utils.intern_utils import intern_str, share_value
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class MappingLeaf(DataModelLeaf):
     mode: str
     historyPolicy: HistoryPolicyDto
@@ -24,6 +28,26 @@ class MappingLeaf(DataModelLeaf):
             self.datalink == other.datalink
         )
 
+    def _compute_tree_node_digest(self) -> bytes:
+        # policies are serialized as they are (no key sorting): a different key order only costs a leaf comparison
+        h = new_tree_node_hasher(DataModelLeaf._compute_tree_node_digest(self))
+        h.update(self.mode.encode())
+        h.update(orjson.dumps(self.historyPolicy))
+        h.update(orjson.dumps(self.sendPolicy))
+        h.update(orjson.dumps(self.datalink))
+        return h.digest()
+
+    @classmethod
+    def from_dict(cls, dikt: dict) -> 'MappingLeaf':
+        # policies are kept as parsed (Corvina may add fields), but leaves with the same ones share a single instance
+        d = cls.remove_extra_fields(dikt)
+        d['version'] = intern_str(d.get('version'))
+        d['type'] = intern_str(d['type'])
+        d['mode'] = intern_str(d['mode'])
+        d['historyPolicy'] = share_value(d['historyPolicy'])
+        d['sendPolicy'] = share_value(d['sendPolicy'])
+        return MappingLeaf(**d)
+
     @staticmethod
     def create_default(
         source: str,
@@ -36,7 +60,7 @@ class MappingLeaf(DataModelLeaf):
             version=version,
             type=datatype,
             mode=mode,
-            historyPolicy=HistoryPolicyDto(enabled=history_policy),
+            historyPolicy=HistoryPolicyDto.create(history_policy),
             sendPolicy=SendPolicyDto.create_default(),
             datalink=DataLinkDto(source)
         )
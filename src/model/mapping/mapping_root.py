@@ -1,14 +1,12 @@
-import copy
 import dataclasses
 
-import orjson
-
 from model.datamodel.datamodel_root import DataModelRoot
 from model.tree.root_node import RootNode
 from model.tree.root_node_aux import RootNodeAux
+from utils.payload_utils import payload_dict
 
 
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class MappingRoot(RootNode):
     modelId: str | None = None
 
@@ -21,14 +19,15 @@ class MappingRoot(RootNode):
 
     @classmethod
     def from_dict(cls, dikt: dict) -> 'MappingRoot':
-        d = copy.deepcopy(dikt)
+        d = cls.remove_extra_fields(dikt)
         d['data'] = RootNodeAux.from_dict(dikt.get('data') or dikt['json'])
-        return MappingRoot(**cls.remove_extra_fields(d))
+        return MappingRoot(**d)
 
     def get_create_mapping_payload(self, referring_data_model: DataModelRoot) -> dict:
         assert referring_data_model.version is not None
 
-        data = orjson.loads(orjson.dumps(self))  # this removes problems like the CorvinaDatatype enum
+        data = payload_dict(self)
+        data['data'] = payload_dict(self.data)
         data['data']['instanceOf'] = referring_data_model.clear_name + ':' + referring_data_model.version
         return data
 
@@ -36,11 +35,5 @@ class MappingRoot(RootNode):
         if self.id is not None:
             return
 
-        # TODO implement the get by name (exists!!)
-        mappings: dict[str, MappingRoot] = await connector.get_presets_by_id()
-        for mapping_id, m in mappings.items():
-            if m.name == self.clear_name and m.data.instanceOf == self.data.instanceOf:
-                self.id = mapping_id
-                return
-
-        assert False, f'Cannot find mapping {self.name} in model {self.data.instanceOf}'
+        self.id = await connector.find_preset_id(self.clear_name, self.data.instanceOf)
+        assert self.id is not None, f'Cannot find mapping {self.name} in model {self.data.instanceOf}'
@@ -1,22 +1,24 @@
-import copy
 import dataclasses
+import functools
 
 from model.mapping.send_policy_trigger_dto import SendPolicyTriggerDto
 from utils.dataclass_utils import BaseDataClass
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class SendPolicyDto(BaseDataClass):
-    triggers: list[SendPolicyTriggerDto]
+    triggers: tuple[SendPolicyTriggerDto, ...]
 
     @staticmethod
+    @functools.cache
     def create_default() -> 'SendPolicyDto':
+        # immutable, so one instance is shared by every leaf
         return SendPolicyDto(
-            triggers=[SendPolicyTriggerDto.create_default()]
+            triggers=(SendPolicyTriggerDto.create_default(),)
         )
 
     @classmethod
     def from_dict(cls, dikt: dict) -> 'SendPolicyDto':
-        d = copy.deepcopy(dikt)
-        d['triggers'] = [SendPolicyTriggerDto.from_dict(t) for t in dikt['triggers']]
-        return SendPolicyDto(**cls.remove_extra_fields(d))
+        d = cls.remove_extra_fields(dikt)
+        d['triggers'] = tuple(SendPolicyTriggerDto.from_dict(t) for t in dikt['triggers'])
+        return SendPolicyDto(**d)
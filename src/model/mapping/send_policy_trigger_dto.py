@@ -3,7 +3,7 @@ import dataclasses
 from utils.dataclass_utils import BaseDataClass
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class SendPolicyTriggerDto(BaseDataClass):
     changeMask: str
     minIntervalMs: int
@@ -0,0 +1,47 @@
+import logging
+import pathlib
+import sqlite3
+
+import orjson
+
+from model.datamodel.datamodel_root import DataModelRoot
+from utils.payload_utils import dumps_payload
+
+logger = logging.getLogger('app.model.cache')
+
+
+class ModelCache:
+    """
+    On-disk (SQLite) copy of the data models of an organization, keyed by id and by (name, version).
+    A model version never changes once created, so cached entries only need to be checked against the current
+    (id, name, version) listing of Corvina: see ModelCatalog.fetch.
+    """
+
+    def __init__(self, cache_dir: str, org: str):
+        path = pathlib.Path(cache_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        self.path = path / f'{org}_models.sqlite'
+        self._db = sqlite3.connect(self.path)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS models ('
+            'id TEXT PRIMARY KEY, name TEXT NOT NULL, version TEXT NOT NULL, json BLOB NOT NULL, UNIQUE (name, version))'
+        )
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def keys(self) -> set[tuple[str, str, str]]:
+        return set(self._db.execute('SELECT id, name, version FROM models'))
+
+    def load(self) -> list[DataModelRoot]:
+        return [DataModelRoot.from_dict(orjson.loads(row[0])) for row in self._db.execute('SELECT json FROM models')]
+
+    def update(self, new_models: list[DataModelRoot], removed_ids: set[str]):
+        with self._db:
+            self._db.executemany('DELETE FROM models WHERE id = ?', ((i,) for i in removed_ids))
+            self._db.executemany(
+                'INSERT OR REPLACE INTO models (id, name, version, json) VALUES (?, ?, ?, ?)',
+                ((m.id, m.name, m.version, dumps_payload(m)) for m in new_models)
+            )
+        logger.debug(f'Model cache {self.path}: {len(new_models)} models stored, {len(removed_ids)} removed')
@@ -0,0 +1,111 @@
+import bisect
+import collections.abc
+import logging
+
+from model.datamodel.datamodel_root import DataModelRoot
+from model.model_cache import ModelCache
+from model.semver_version import SemverVersion
+
+logger = logging.getLogger('app.model.catalog')
+
+
+class ModelCatalog:
+    """
+    In-memory index of the data models available in Corvina.
+    It is built once from the full model list and then kept up to date in place (see add/remove), so lookups by id,
+    by (name, version), by name and by name prefix never need to scan every model or re-fetch the list.
+    """
+
+    def __init__(self, models: collections.abc.Iterable[DataModelRoot] = ()):
+        self._by_id: dict[str, DataModelRoot] = {}
+        self._by_name_version: dict[tuple[str, str], DataModelRoot] = {}
+        self._by_name: dict[str, dict[str, DataModelRoot]] = {}
+        self._sorted_names: list[str] = []
+        for model in models:
+            self.add(model)
+
+    @classmethod
+    async def fetch(cls, connector: 'CorvinaClient', cache: ModelCache | None = None) -> 'ModelCatalog':
+        if cache is not None:
+            return await cls._fetch_with_cache(connector, cache)
+
+        catalog = cls()
+        async for model in connector.iter_datamodels():
+            catalog.add(model)
+        logger.debug(f'Indexed {len(catalog)} models ({len(catalog._sorted_names)} names)')
+        return catalog
+
+    @classmethod
+    async def _fetch_with_cache(cls, connector: 'CorvinaClient', cache: ModelCache) -> 'ModelCatalog':
+        # The (id, name, version) listing, without contents, tells which cached models are still valid
+        remote_keys = {k async for k in connector.iter_datamodel_keys()}
+        cached_keys = cache.keys()
+        missing_ids = [k[0] for k in remote_keys - cached_keys]
+        removed_ids = {k[0] for k in cached_keys - remote_keys}
+
+        new_models = await connector.get_datamodels_from_ids(missing_ids)
+        cache.update(new_models, removed_ids)
+        catalog = cls(cache.load())
+        logger.info(f'Indexed {len(catalog)} models ({len(missing_ids)} downloaded, {len(removed_ids)} dropped from cache)')
+        return catalog
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, model_id: str) -> bool:
+        return model_id in self._by_id
+
+    def values(self) -> collections.abc.Iterable[DataModelRoot]:
+        return self._by_id.values()
+
+    def add(self, model: DataModelRoot):
+        assert model.id is not None, f'Cannot index model {model.name}:{model.version} without id'
+        if model.id in self._by_id:
+            self.remove(model.id)
+
+        name = model.clear_name
+        self._by_id[model.id] = model
+        self._by_name_version[(name, model.version)] = model
+        if name not in self._by_name:
+            self._by_name[name] = {}
+            bisect.insort(self._sorted_names, name)
+        self._by_name[name][model.id] = model
+
+    def remove(self, model_id: str) -> DataModelRoot | None:
+        model = self._by_id.pop(model_id, None)
+        if model is None:
+            return None
+
+        name = model.clear_name
+        if self._by_name_version.get((name, model.version)) is model:
+            del self._by_name_version[(name, model.version)]
+        same_name = self._by_name[name]
+        del same_name[model_id]
+        if len(same_name) == 0:
+            del self._by_name[name]
+            del self._sorted_names[bisect.bisect_left(self._sorted_names, name)]
+        return model
+
+    def get(self, model_id: str) -> DataModelRoot | None:
+        return self._by_id.get(model_id)
+
+    def find(self, name: str, version: str) -> DataModelRoot | None:
+        return self._by_name_version.get((name, version))
+
+    def find_by_name(self, name: str) -> list[DataModelRoot]:
+        return list(self._by_name.get(name, {}).values())
+
+    def find_latest(self, name: str) -> DataModelRoot | None:
+        same_name = self._by_name.get(name)
+        if not same_name:
+            return None
+        return max(same_name.values(), key=lambda m: SemverVersion.from_string(m.version))
+
+    def find_by_prefix(self, prefix: str) -> list[DataModelRoot]:
+        res = []
+        for i in range(bisect.bisect_left(self._sorted_names, prefix), len(self._sorted_names)):
+            name = self._sorted_names[i]
+            if not name.startswith(prefix):
+                break
+            res.extend(self._by_name[name].values())
+        return res
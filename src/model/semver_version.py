@@ -10,8 +10,12 @@ logger = logging.getLogger('app.model.version')
 instance_of_re = re.compile(r'(.+):(\d+)\.(\d+)\.(\d+)')
 semver_re = re.compile(r'(\d+)\.(\d+)\.(\d+)')
 
+# Parsed versions are immutable, so the same instance is shared by every caller parsing the same string
+_interned_versions: dict[str, 'SemverVersion'] = {}
+_interned_instance_of_versions: dict[str, 'SemverVersion'] = {}
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(frozen=True, order=True, slots=True)
 class SemverVersion(BaseDataClass):
     major: int
     minor: int
@@ -22,44 +26,23 @@ class SemverVersion(BaseDataClass):
         assert self.minor >= 0
         assert self.patch >= 0
 
-    def __hash__(self):
-        return 11 ^ self.major.__hash__() ^ self.major.__hash__() ^ self.patch.__hash__()
-
-    def __eq__(self, other):
-        return isinstance(other, SemverVersion) and self.major == other.minor and self.minor == other.minor and self.patch == other.patch
-
-    def __cmp__(self, other):
-        assert isinstance(other, SemverVersion)
-        return self._weight - other._weight
-
-    def __le__(self, other):
-        assert isinstance(other, SemverVersion)
-        return self._weight <= other._weight
-
-    def __lt__(self, other):
-        assert isinstance(other, SemverVersion)
-        return self._weight < other._weight
-
-    def __gt__(self, other):
-        assert isinstance(other, SemverVersion)
-        return self._weight > other._weight
-
-    def __ge__(self, other):
-        assert isinstance(other, SemverVersion)
-        return self._weight >= other._weight
-
-    @property
-    def _weight(self) -> int:
-        return self.major * 1000000 + self.minor * 1000 + self.patch
+    def __str__(self):
+        return f'{self.major}.{self.minor}.{self.patch}'
 
     @staticmethod
     def from_string(data: str) -> 'SemverVersion':
-        match = semver_re.match(data)
-        assert match is not None, f'Not a semver version string: {data}'
-        return SemverVersion(match.group(1), match.group(2), match.group(3))
+        version = _interned_versions.get(data)
+        if version is None:
+            match = semver_re.match(data)
+            assert match is not None, f'Not a semver version string: {data}'
+            version = _interned_versions.setdefault(data, SemverVersion(int(match.group(1)), int(match.group(2)), int(match.group(3))))
+        return version
 
     @staticmethod
     def from_instance_of_string(data: str) -> 'SemverVersion':
-        match = instance_of_re.match(data)
-        assert match is not None, f'Not an instanceOf valid string: {data}'
-        return SemverVersion(match.group(2), match.group(3), match.group(4))
+        version = _interned_instance_of_versions.get(data)
+        if version is None:
+            match = instance_of_re.match(data)
+            assert match is not None, f'Not an instanceOf valid string: {data}'
+            version = _interned_instance_of_versions.setdefault(data, SemverVersion.from_string(f'{match.group(2)}.{match.group(3)}.{match.group(4)}'))
+        return version
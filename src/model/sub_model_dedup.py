@@ -0,0 +1,80 @@
+import collections
+import collections.abc
+import logging
+
+import configuration
+from model.tree.intermediate_node import IntermediateNode
+from utils.tree_index import TreeIndex
+from utils.tree_visit_utils import walk_tree
+
+logger = logging.getLogger('app.sub_model_dedup')
+
+
+def _path_key(path: str) -> tuple[int, str]:
+    return path.count(configuration.tree_path_separator_char), path
+
+
+def find_duplicate_sub_models(
+    candidates: collections.abc.Iterable[tuple[str, IntermediateNode]],
+    known: collections.abc.Iterable[IntermediateNode] = ()
+) -> dict[str, str]:
+    """
+    Maps the name of every candidate sub model (path, node) to the sub model it can be replaced with: an identical
+    (same structural digest) known one, already in Corvina, or else the first identical candidate by depth and path.
+    Sub models without an identical one are not in the result.
+    """
+    canonical_by_digest: dict[bytes, str] = {}
+    for node in known:
+        canonical_by_digest.setdefault(node.get_tree_node_digest(), node.get_tree_node_name())
+
+    aliases: dict[str, str] = {}
+    for _, node in sorted(candidates, key=lambda c: _path_key(c[0])):
+        name = node.get_tree_node_name()
+        canonical = canonical_by_digest.setdefault(node.get_tree_node_digest(), name)
+        if canonical != name:
+            aliases[name] = canonical
+    return aliases
+
+
+def canonicalize_sub_models(root: IntermediateNode) -> dict[str, str]:
+    """
+    Replaces in place every repeated sub model of the tree with its first occurrence (by depth, then path), so that
+    each distinct definition is sent once. Returns the replaced sub model names, mapped to the kept ones.
+    """
+    canonical_by_digest: dict[bytes, IntermediateNode] = {}
+    aliases: dict[str, str] = {}
+    queue = collections.deque([root])
+    while len(queue) > 0:
+        node = queue.popleft()
+        for child_name in sorted(node.properties.keys()):
+            child = node.properties[child_name]
+            if not isinstance(child, IntermediateNode):
+                continue
+            canonical = canonical_by_digest.setdefault(child.get_tree_node_digest(), child)
+            if canonical is child:
+                queue.append(child)
+            else:  # its own sub models are replaced along with it
+                aliases[child.get_tree_node_name()] = canonical.get_tree_node_name()
+                node.properties[child_name] = canonical
+    return aliases
+
+
+def sync_mapping_sub_models(model_node: IntermediateNode, mapping_node: IntermediateNode):
+    """
+    Copies the sub model references of the model into the mapping, walking both trees by property name: unlike the
+    lookups by sub model name, it works also when a sub model is shared among many properties.
+    """
+    mapping_index = TreeIndex(mapping_node)
+    for child, path, depth in walk_tree(model_node):
+        mapping_child = mapping_index.get(path) if depth > 0 else None
+        if not isinstance(child, IntermediateNode) or not isinstance(mapping_child, IntermediateNode):
+            continue
+        instance_of = child.get_tree_node_name() + ':' + child.get_node_version()
+        if mapping_child.instanceOf != instance_of:
+            logger.debug(f'Mapping {path[-1]} now references {instance_of} (was {mapping_child.instanceOf})')
+            mapping_child.instanceOf = instance_of
+
+
+def log_dedup_report(aliases: dict[str, str]):
+    for canonical, count in collections.Counter(aliases.values()).most_common():
+        logger.debug(f'Dedup: {canonical} shared by {count + 1} sub models')
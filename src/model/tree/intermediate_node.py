@@ -1,12 +1,13 @@
-import copy
 import dataclasses
 
 from model.tree.tree_leaf import TreeLeaf
-from model.tree.tree_node import TreeNode
-from utils.corvina_version_utils import version_re
+from model.tree.tree_node import TreeNode, new_tree_node_hasher
+from utils.corvina_version_utils import split_instance_of
+from utils.intern_utils import intern_str
+from utils.tree_visit_utils import walk_tree
 
 
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class IntermediateNode(TreeNode):
     type: str  # object (always?)
     instanceOf: str
@@ -26,31 +27,39 @@ class IntermediateNode(TreeNode):
         return self.properties
 
     def get_tree_node_name(self) -> str:
-        m = version_re.match(self.instanceOf)
-        return m[1] if m else self.instanceOf
+        m = split_instance_of(self.instanceOf)
+        return m[0] if m else self.instanceOf
+
+    def _compute_tree_node_digest(self) -> bytes:
+        # instanceOf is left out on purpose: the diff matches sub models by name and structure, not by version
+        # no intermediate list: this runs on every intermediate node, often more of them than leaves
+        h = new_tree_node_hasher(self.type.encode())
+        for child_name, child in sorted(self.properties.items()):
+            h.update((child_name + '\0').encode())
+            h.update(child._digest or child.get_tree_node_digest())
+        return h.digest()
 
     def get_node_version(self) -> str:
         """
         Returns the string "1.0.0" or the effective version
         :return:
         """
-        m = version_re.match(self.instanceOf)
-        return m[2] if m else self.instanceOf
+        m = split_instance_of(self.instanceOf)
+        return m[1] if m else self.instanceOf
 
     @classmethod
     def from_dict(cls, dikt: dict) -> 'IntermediateNode':
-        d = copy.deepcopy(dikt)
-        for p_name, p in dikt['properties'].items():
-            if p['type'] == 'object':  # intermediate
-                d['properties'][p_name] = IntermediateNode.from_dict(p)
-            else:  # leaf
-                d['properties'][p_name] = TreeLeaf.from_dict(p)
-        return IntermediateNode(**cls.remove_extra_fields(d))
+        d = cls.remove_extra_fields(dikt)  # already a new dict, the input one is never copied nor modified
+        d['type'] = intern_str(d['type'])
+        d['properties'] = cls.properties_from_dict(dikt['properties'])
+        return IntermediateNode(**d)
+
+    @staticmethod
+    def properties_from_dict(properties: dict[str, dict]) -> dict[str, TreeNode]:
+        return {
+            p_name: IntermediateNode.from_dict(p) if p['type'] == 'object' else TreeLeaf.from_dict(p)  # intermediate or leaf
+            for p_name, p in properties.items()
+        }
 
     def get_intermediate_elems(self) -> list[str]:
-        res = []
-        for child in self.properties.values():
-            if isinstance(child, IntermediateNode):
-                res.append(child.instanceOf)
-                res.extend(child.get_intermediate_elems())
-        return res
+        return [node.instanceOf for node, _, depth in walk_tree(self) if depth > 0 and isinstance(node, IntermediateNode)]
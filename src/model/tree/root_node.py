@@ -1,12 +1,11 @@
-import copy
 import dataclasses
 
 from model.tree.root_node_aux import RootNodeAux
 from model.tree.tree_node import TreeNode
-from utils.corvina_version_utils import version_re
+from utils.corvina_version_utils import split_instance_of
 
 
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class RootNode(TreeNode):
     id: str | None = None
     name: str
@@ -29,16 +28,19 @@ class RootNode(TreeNode):
     def get_tree_node_name(self) -> str:
         return self.clear_name
 
+    def _compute_tree_node_digest(self) -> bytes:
+        return self.data.get_tree_node_digest()
+
     @classmethod
     def from_dict(cls, dikt: dict) -> 'RootNode':
-        d = copy.deepcopy(dikt)
+        d = cls.remove_extra_fields(dikt)
         d['data'] = RootNodeAux.from_dict(dikt.get('data') or dikt['json'])
-        return RootNode(**cls.remove_extra_fields(d))
+        return RootNode(**d)
 
     @property
     def clear_name(self):
-        m = version_re.match(self.name)
-        return m[1] if m else self.name
+        m = split_instance_of(self.name)
+        return m[0] if m else self.name
 
     def get_deploy_name(self) -> str:
         return self.name.split('-')[0]
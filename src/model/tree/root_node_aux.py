@@ -1,13 +1,11 @@
-import copy
 import dataclasses
 
-import orjson
-
 from model.tree.intermediate_node import IntermediateNode
-from model.tree.tree_leaf import TreeLeaf
+from model.tree.tree_node import TreeNode
+from utils.payload_utils import payload_dict
 
 
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class RootNodeAux(IntermediateNode):
     label: str | None = None
     unit: str | None = None
@@ -28,20 +26,21 @@ class RootNodeAux(IntermediateNode):
 
     @classmethod
     def from_dict(cls, dikt: dict) -> 'RootNodeAux':
-        d = copy.deepcopy(dikt)
-        for p_name, p in dikt['properties'].items():
-            if p['type'] == 'object': # intermediate
-                d['properties'][p_name] = IntermediateNode.from_dict(p)
-            else: # leaf
-                d['properties'][p_name] = TreeLeaf.from_dict(p)
-        return RootNodeAux(**cls.remove_extra_fields(d))
+        d = cls.remove_extra_fields(dikt)
+        d['properties'] = cls.properties_from_dict(dikt['properties'])
+        return RootNodeAux(**d)
 
     @classmethod
     def from_intermediate_node(cls, intermediate_node: IntermediateNode) -> 'RootNodeAux':
-        d = copy.deepcopy(orjson.loads(orjson.dumps(intermediate_node)))
-        for p_name, p in d['properties'].items():
-            if p['type'] == 'object':  # intermediate
-                d['properties'][p_name] = IntermediateNode.from_dict(p)
-            else:  # leaf
-                d['properties'][p_name] = TreeLeaf.from_dict(p)
-        return RootNodeAux(**cls.remove_extra_fields(d))
+        d = cls.remove_extra_fields(payload_dict(intermediate_node))
+        d['properties'] = {p_name: _copy_sub_tree(p) for p_name, p in intermediate_node.properties.items()}
+        return RootNodeAux(**d)
+
+
+def _copy_sub_tree(node: TreeNode) -> TreeNode:
+    # Intermediate nodes are rebuilt (sub roots become plain IntermediateNode), leaves are never edited so they are shared
+    if not isinstance(node, IntermediateNode):
+        return node
+    d = IntermediateNode.remove_extra_fields(payload_dict(node))
+    d['properties'] = {p_name: _copy_sub_tree(p) for p_name, p in node.properties.items()}
+    return IntermediateNode(**d)
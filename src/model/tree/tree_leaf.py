@@ -4,7 +4,7 @@ import dataclasses
 from model.tree.tree_node import TreeNode
 
 
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class TreeLeaf(TreeNode, abc.ABC):
     deprecated: bool = None
 
@@ -18,7 +18,7 @@ class TreeLeaf(TreeNode, abc.ABC):
     def from_dict(cls, dikt: dict) -> 'TreeLeaf':
         if 'mode' in dikt:  # MappingLeaf
             from model.mapping.mapping_leaf import MappingLeaf
-            return MappingLeaf(**dikt)
+            return MappingLeaf.from_dict(dikt)
         else:  # DataModelLeaf
             from model.datamodel.datamodel_leaf import DataModelLeaf
             return DataModelLeaf.from_dict(dikt)
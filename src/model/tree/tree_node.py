@@ -1,11 +1,17 @@
 import abc
 import dataclasses
+import hashlib
 
 from utils.dataclass_utils import BaseDataClass
 
 
-@dataclasses.dataclass(kw_only=True)
+def new_tree_node_hasher(data: bytes = b'') -> 'hashlib.blake2b':
+    return hashlib.blake2b(data, digest_size=16)
+
+
+@dataclasses.dataclass(kw_only=True, slots=True)
 class TreeNode(BaseDataClass, abc.ABC):
+    _digest: bytes | None = dataclasses.field(default=None, init=False, repr=False, compare=False)
 
     @abc.abstractmethod
     def get_tree_node_children(self) -> dict[str, 'TreeNode']:
@@ -14,3 +20,20 @@ class TreeNode(BaseDataClass, abc.ABC):
     @abc.abstractmethod
     def get_tree_node_name(self) -> str:
         pass
+
+    def get_tree_node_digest(self) -> bytes:
+        """
+        Structural (Merkle) digest of the subtree rooted in this node, built from the children digests.
+        Subtrees with the same digest are equal for the data model diff. The value is computed once and cached,
+        so call invalidate_tree_node_digest() after editing the node.
+        """
+        if self._digest is None:
+            self._digest = self._compute_tree_node_digest()
+        return self._digest
+
+    def invalidate_tree_node_digest(self):
+        self._digest = None
+
+    @abc.abstractmethod
+    def _compute_tree_node_digest(self) -> bytes:
+        pass
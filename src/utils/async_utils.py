@@ -0,0 +1,104 @@
+import asyncio
+import collections.abc
+import typing
+
+T = typing.TypeVar('T')
+K = typing.TypeVar('K')
+
+
+async def gather_bounded(
+    coros: collections.abc.Iterable[collections.abc.Awaitable[T]],
+    limit: int,
+    return_exceptions: bool = False
+) -> list[T | BaseException]:
+    """
+    Runs the provided awaitables concurrently, with at most `limit` of them in flight at the same time.
+    Results are returned in input order; on the first failure the remaining tasks are cancelled and the
+    exception is re-raised as is, unless `return_exceptions` is set: then failures are returned in place of results.
+    """
+    assert limit > 0, f'Concurrency limit must be positive, got {limit}'
+    semaphore = asyncio.Semaphore(limit)
+
+    async def _run(coro: collections.abc.Awaitable[T]) -> T:
+        async with semaphore:
+            return await coro
+
+    tasks = [asyncio.ensure_future(_run(c)) for c in coros]
+    try:
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def poll_with_backoff(
+    fun: collections.abc.Callable[[], collections.abc.Awaitable[T]],
+    is_done: collections.abc.Callable[[T], bool],
+    initial_delay: float = 1.0,
+    max_delay: float = 30.0,
+    timeout: float = 900.0
+) -> T:
+    """
+    Calls `fun` until `is_done` accepts its result, sleeping between calls with an exponential backoff
+    (doubling from `initial_delay` up to `max_delay`). Raises TimeoutError when `timeout` seconds are not enough.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = initial_delay
+    while True:
+        res = await fun()
+        if is_done(res):
+            return res
+        if loop.time() + delay > deadline:
+            raise TimeoutError(f'Still not done after {timeout}s, last result {res}')
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+
+async def run_dag(
+    dependencies: dict[K, collections.abc.Iterable[K]],
+    fun: collections.abc.Callable[[K], collections.abc.Awaitable[T]],
+    limit: int
+) -> dict[K, T]:
+    """
+    Calls `fun(key)` for every key of `dependencies` as soon as all the keys it depends on are done, with at most
+    `limit` calls running at the same time (waiting for dependencies does not take a slot).
+    Results are returned by key; on the first failure every other call is cancelled and the exception re-raised.
+    """
+    assert limit > 0, f'Concurrency limit must be positive, got {limit}'
+    semaphore = asyncio.Semaphore(limit)
+    tasks: dict[K, asyncio.Future] = {}
+
+    async def _run(key: K) -> T:
+        dependency_tasks = [tasks[d] for d in dependencies[key]]
+        if len(dependency_tasks) > 0:
+            await asyncio.gather(*dependency_tasks)
+        async with semaphore:
+            return await fun(key)
+
+    for key in dependencies:  # every task is registered before any of them starts running
+        tasks[key] = asyncio.ensure_future(_run(key))
+    try:
+        return dict(zip(tasks.keys(), await asyncio.gather(*tasks.values())))
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+
+
+def critical_path(dependencies: dict[K, collections.abc.Iterable[K]], timings: dict[K, tuple[float, float]]) -> list[K]:
+    """
+    Given the (start, end) time of every node run by run_dag, returns the chain of nodes that determined the total
+    wall-clock time: starting from the last node to finish, each step goes back to its latest finishing dependency.
+    """
+    if len(timings) == 0:
+        return []
+    path = [max(timings, key=lambda k: timings[k][1])]
+    while True:
+        done_dependencies = [d for d in dependencies[path[-1]] if d in timings]
+        if len(done_dependencies) == 0:
+            return path[::-1]
+        path.append(max(done_dependencies, key=lambda d: timings[d][1]))
@@ -1,3 +1,17 @@
+import functools
 import re
 
-version_re = re.compile(r'^(.+):(\d\.\d\.\d)$')
+from model.semver_version import semver_re
+
+# "name:x.y.z", with the version numbers of SemverVersion (any number of digits): group 2 is the whole version
+version_re = re.compile(rf'^(.+):({semver_re.pattern})$')
+
+
+@functools.lru_cache(maxsize=65536)
+def split_instance_of(instance_of: str) -> tuple[str, str] | None:
+    """
+    Splits a "name:x.y.z" string in (name, "x.y.z"); returns None when the string does not carry a version.
+    Results are cached, since the same instanceOf strings are parsed over and over while visiting the trees.
+    """
+    m = version_re.match(instance_of)
+    return (m[1], m[2]) if m else None
@@ -1,7 +1,9 @@
+import functools
 import inspect
 
 
 class BaseDataClass:
+    __slots__ = ()
 
     @classmethod
     def from_dict(cls, dikt: dict) -> 'BaseDataClass':
@@ -10,8 +12,7 @@ class BaseDataClass:
 
     @classmethod
     def remove_extra_fields(cls, dikt: dict) -> dict:
-        # fetch the constructor's signature
-        cls_fields = {field for field in inspect.signature(cls).parameters}
+        cls_fields = _get_init_fields(cls)
 
         # split the kwargs into native ones and new ones
         native_args = {}
@@ -23,8 +24,7 @@ class BaseDataClass:
 
     @classmethod
     def get_extra_fields(cls, dikt: dict) -> dict:
-        # fetch the constructor's signature
-        cls_fields = {field for field in inspect.signature(cls).parameters}
+        cls_fields = _get_init_fields(cls)
 
         # split the kwargs into native ones and new ones
         extra_args = {}
@@ -33,3 +33,9 @@ class BaseDataClass:
                 extra_args[name] = val
 
         return extra_args
+
+
+@functools.cache
+def _get_init_fields(cls: type) -> frozenset[str]:
+    # the constructor's signature never changes, so it is inspected once per class
+    return frozenset(inspect.signature(cls).parameters)
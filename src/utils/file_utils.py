@@ -7,6 +7,11 @@ async def read_file_async(path: str) -> str:
         return await fd.read()
 
 
+async def write_file_async(path: str, data: bytes):
+    async with aiofiles.open(path, 'wb') as fd:
+        await fd.write(data)
+
+
 async def read_json_async(path: str) -> dict:
     async with aiofiles.open(path, 'r') as fd:
         return orjson.loads(await fd.read())
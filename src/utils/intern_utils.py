@@ -0,0 +1,21 @@
+import sys
+
+import orjson
+
+_shared_values: dict[bytes, object] = {}
+
+
+def intern_str(value: str | None) -> str | None:
+    """ Types, versions, modes... are repeated on every leaf: one copy of each string is kept """
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def share_value(value: object) -> object:
+    """
+    Returns the shared instance of a JSON-like value (e.g. the send policy of a leaf), so that the many leaves with the
+    same value hold a single object. Values are matched on their exact serialization, key order included, and the
+    returned ones must never be edited in place.
+    """
+    if value is None:
+        return None
+    return _shared_values.setdefault(orjson.dumps(value), value)
@@ -0,0 +1,50 @@
+import dataclasses
+import functools
+import typing
+
+import orjson
+
+
+@functools.cache
+def _payload_fields(cls: type) -> tuple[str, ...]:
+    # private (underscore) fields, like cached digests, never reach Corvina
+    return tuple(f.name for f in dataclasses.fields(cls) if not f.name.startswith('_'))
+
+
+def _without_nulls(dikt: dict) -> dict:
+    # Same result of dict_utils.remove_nulls, but the provided dict is copied only when something must be dropped
+    if not any(v is None or isinstance(v, dict) for v in dikt.values()):
+        return dikt
+    return {k: _without_nulls(v) if isinstance(v, dict) else v for k, v in dikt.items() if v is not None}
+
+
+def payload_dict(obj: typing.Any) -> dict:
+    """
+    Shallow dict of the dataclass fields of `obj` without the null ones; nested objects are kept as they are,
+    they are converted by dumps_payload while writing the JSON
+    """
+    res = {}
+    for name in _payload_fields(type(obj)):
+        value = getattr(obj, name)
+        if value is None:
+            continue
+        res[name] = _without_nulls(value) if isinstance(value, dict) else value
+    return res
+
+
+def _payload_default(obj: typing.Any) -> dict:
+    if dataclasses.is_dataclass(obj):
+        return payload_dict(obj)
+    raise TypeError(f'Type {type(obj)} is not JSON serializable')
+
+
+def dumps_payload(obj: dict | typing.Any) -> bytes:
+    """
+    Serializes dicts and trees of dataclasses (TreeNode etc.) straight to compact JSON bytes, dropping null fields.
+    Every node is visited once, while orjson writes it, and no full dict copy of the tree is ever built.
+    """
+    return orjson.dumps(
+        _without_nulls(obj) if isinstance(obj, dict) else obj,
+        default=_payload_default,
+        option=orjson.OPT_PASSTHROUGH_DATACLASS
+    )
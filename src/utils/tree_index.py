@@ -0,0 +1,81 @@
+import collections.abc
+
+import configuration
+from model.tree.intermediate_node import IntermediateNode
+from model.tree.tree_node import TreeNode
+from utils.tree_visit_utils import TreePath
+
+
+def path_key(path: str, skip_root: bool = True) -> TreePath:
+    """ Turns a separated path string (e.g. a diff path, starting with the root name) in an index key """
+    segments = tuple(path.split(configuration.tree_path_separator_char))
+    return segments[1:] if skip_root else segments
+
+
+class TreeIndex:
+    """
+    Flat index of the nodes of a tree, keyed by the tuple of property names from the indexed root (whose key is ()).
+    Only the nodes having children are stored, leaves are reached through their parent. The index is built once with
+    an explicit stack (no recursion limit on deep trees): edit the tree through replace() to keep it consistent.
+    """
+
+    def __init__(self, root: TreeNode):
+        self.root = root
+        self._nodes: dict[TreePath, TreeNode] = {}
+        self._add_sub_tree((), root)
+
+    def _add_sub_tree(self, path: TreePath, node: TreeNode):
+        stack = [(path, node)]
+        while len(stack) > 0:
+            path, node = stack.pop()
+            self._nodes[path] = node
+            for child_name, child in node.get_tree_node_children().items():
+                if isinstance(child, IntermediateNode):
+                    stack.append((path + (child_name,), child))
+
+    def _remove_sub_tree(self, path: TreePath, node: TreeNode):
+        stack = [(path, node)]
+        while len(stack) > 0:
+            path, node = stack.pop()
+            self._nodes.pop(path, None)
+            for child_name, child in node.get_tree_node_children().items():
+                if isinstance(child, IntermediateNode):
+                    stack.append((path + (child_name,), child))
+
+    def get(self, path: TreePath) -> TreeNode | None:
+        node = self._nodes.get(path)
+        if node is None and len(path) > 0:
+            parent = self._nodes.get(path[:-1])
+            node = parent.get_tree_node_children().get(path[-1]) if parent is not None else None
+        return node
+
+    def __getitem__(self, path: TreePath) -> TreeNode:
+        node = self.get(path)
+        if node is None:
+            raise KeyError(path)
+        return node
+
+    def __contains__(self, path: TreePath) -> bool:
+        return self.get(path) is not None
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def items(self) -> collections.abc.ItemsView[TreePath, TreeNode]:
+        """ The indexed nodes (the ones having children) with their paths """
+        return self._nodes.items()
+
+    def replace(self, path: TreePath, node: TreeNode):
+        """ Puts `node` in place of the one at `path` (which must have a parent), re-indexing that subtree only """
+        assert len(path) > 0, 'Cannot replace the indexed root'
+        parent = self._nodes[path[:-1]]
+        children = parent.get_tree_node_children()
+        old_node = children.get(path[-1])
+        if old_node is not None:
+            self._remove_sub_tree(path, old_node)
+        children[path[-1]] = node
+        if isinstance(node, IntermediateNode):
+            self._add_sub_tree(path, node)
+
+        for i in range(len(path) - 1, -1, -1):  # the ancestors digests depend on the replaced subtree
+            self._nodes[path[:i]].invalidate_tree_node_digest()
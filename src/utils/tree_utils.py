@@ -45,6 +45,10 @@ def _compute_data_model_difference_map_aux(
         map_dict[path] = NodeDiff(DiffEnum.NODE_CHANGED, new_node, path_append(path, current_node_name))
         return False
 
+    # Identical subtrees (same Merkle digest) cannot contain any difference
+    if current_node.get_tree_node_digest() == new_node.get_tree_node_digest():
+        return True
+
     # Leaf base case
     if isinstance(new_node, DataModelLeaf):  # and isinstance(current_node, TreeLeaf): # (redundant since they have the same type)
         if current_node != new_node:
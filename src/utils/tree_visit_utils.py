@@ -1,77 +1,71 @@
+import collections
 import collections.abc
 
 import configuration
 from model.tree.tree_node import TreeNode
 
+TreePath = tuple[str, ...]  # property names from the root of the tree
 
 recursive_fun = collections.abc.Callable[[TreeNode, str], bool]
 recursive_fun_async = collections.abc.Callable[[TreeNode, str], collections.abc.Awaitable[bool]]
+prune_fun = collections.abc.Callable[[TreeNode, TreePath, int], bool]
 
 
 def path_append(path: str, tail: str) -> str:
     return tail if path == '' else f'{path}{configuration.tree_path_separator_char}{tail}'
 
 
-def dfs(root: TreeNode, fun: recursive_fun):
-    _dfs_aux(root, '', fun)
-
+def walk_tree(root: TreeNode, breadth_first: bool = False, prune: prune_fun | None = None) -> collections.abc.Iterator[tuple[TreeNode, TreePath, int]]:
+    """
+    Lazily yields (node, path, depth) for every node of the tree, the root first with path () and depth 0.
+    Depth first uses an explicit stack (children in their order), breadth first a queue: deep trees never hit the
+    recursion limit. Every path extends its parent's tuple, no name is split nor joined.
+    The children of a node are skipped when `prune(node, path, depth)` returns True.
+    """
+    if breadth_first:
+        queue = collections.deque([(root, (), 0)])
+        while len(queue) > 0:
+            node, path, depth = queue.popleft()
+            yield node, path, depth
+            children = node.get_tree_node_children()
+            if len(children) > 0 and (prune is None or not prune(node, path, depth)):
+                queue.extend((child, path + (child_name,), depth + 1) for child_name, child in children.items())
+        return
 
-def _dfs_aux(root: TreeNode, path: str, fun: recursive_fun) -> bool:
-    if not fun(root, path):
-        return False
+    stack = [(root, (), 0)]
+    while len(stack) > 0:
+        node, path, depth = stack.pop()
+        yield node, path, depth
+        children = node.get_tree_node_children()
+        if len(children) > 0 and (prune is None or not prune(node, path, depth)):
+            stack.extend(reversed([(child, path + (child_name,), depth + 1) for child_name, child in children.items()]))
 
-    return all(_dfs_aux(c, path_append(path, root.get_tree_node_name().split(configuration.tree_path_separator_char)[-1]), fun) for c in root.get_tree_node_children().values())
 
+def _joined(path: TreePath) -> str:
+    return configuration.tree_path_separator_char.join(path)
 
-async def dfs_async(root: TreeNode, fun: recursive_fun_async):
-    await _dfs_async_aux(root, '', fun)
 
+def dfs(root: TreeNode, fun: recursive_fun):
+    """ Calls fun(node, path) on every node, depth first, until it returns False. Paths are separated strings """
+    for node, path, _ in walk_tree(root):
+        if not fun(node, _joined(path)):
+            return
 
-async def _dfs_async_aux(root: TreeNode, path: str, fun: recursive_fun_async) -> bool:
-    if not await fun(root, path):
-        return False
 
-    for child in root.get_tree_node_children().values():
-        if not await _dfs_async_aux(child, path_append(path, root.get_tree_node_name()), fun):
-            return False
-    return True
+async def dfs_async(root: TreeNode, fun: recursive_fun_async):
+    for node, path, _ in walk_tree(root):
+        if not await fun(node, _joined(path)):
+            return
 
 
 def bfs(root: TreeNode, fun: recursive_fun):
-    if not fun(root, ''):
-        return
-
-    if not all(fun(child, path_append('', root.get_tree_node_name())) for child in root.get_tree_node_children().values()):
-        return
-    all(_bfs_aux(child, path_append('', root.get_tree_node_name()), fun) for child in root.get_tree_node_children().values())
-
-
-def _bfs_aux(root: TreeNode, path: str, fun: recursive_fun) -> bool:
-    if not all(fun(child, path_append(path, root.get_tree_node_name())) for child in root.get_tree_node_children().values()):
-        return False
-    return all(_bfs_aux(child, path_append(path, root.get_tree_node_name()), fun) for child in root.get_tree_node_children().values())
+    """ Like dfs, level by level: each node is visited once """
+    for node, path, _ in walk_tree(root, breadth_first=True):
+        if not fun(node, _joined(path)):
+            return
 
 
 async def bfs_async(root: TreeNode, fun: recursive_fun_async):
-    if not await fun(root, ''):
-        return
-
-    for child in root.get_tree_node_children().values():
-        if not await fun(child, path_append('', root.get_tree_node_name()),):
+    for node, path, _ in walk_tree(root, breadth_first=True):
+        if not await fun(node, _joined(path)):
             return
-
-    for child in root.get_tree_node_children().values():
-        if not await _bfs_async_aux(child, path_append('', root.get_tree_node_name()), fun):
-            return
-
-
-async def _bfs_async_aux(root: TreeNode, path: str, fun: recursive_fun_async) -> bool:
-    for child in root.get_tree_node_children().values():
-        if not await fun(child, path_append(path, root.get_tree_node_name())):
-            return False
-
-    for child in root.get_tree_node_children().values():
-        if not await _bfs_async_aux(child, path_append(path, root.get_tree_node_name()), fun):
-            return False
-
-    return True
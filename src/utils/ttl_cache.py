@@ -0,0 +1,33 @@
+import time
+import typing
+
+_MISSING = object()
+
+
+class TtlCache:
+    """
+    Tiny dict-like cache whose entries expire `ttl` seconds after being stored.
+    Meant for short-lived (per-run) lookups, so expired entries are just dropped when read.
+    """
+
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        self._entries: dict[typing.Hashable, tuple[float, typing.Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        expires_at, value = self._entries.get(key, (0.0, _MISSING))
+        if value is _MISSING or expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def put(self, key: typing.Hashable, value: typing.Any):
+        if self._ttl > 0:
+            self._entries[key] = (time.monotonic() + self._ttl, value)
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,300 @@
+
+import asyncio
+import contextlib
+import math
+import unittest
+
+import orjson
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from corvina_connector.corvina_client import CorvinaClient, count_uploads
+from model.datamodel.datamodel_root import DataModelRoot
+from model.device.device_group_config_job import DeviceGroupConfigJobStatus
+from model.mapping.mapping_root import MappingRoot
+
+
+def _preset(i: int) -> dict:
+    return {'id': f'p{i}', 'name': f'Preset{i}', 'modelId': 'm1', 'data': {'type': 'object', 'instanceOf': 'Model:1.0.0', 'properties': {}}}
+
+
+class CorvinaClientTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.models = [
+            {'id': f'm{i}', 'name': 'Model', 'version': f'1.{i - 1}.0', 'json': {'type': 'object', 'instanceOf': f'Model:1.{i - 1}.0', 'properties': {}}}
+            for i in (1, 2)
+        ]
+        self.requests: list[str] = []
+
+        async def get_models(request: web.Request) -> web.Response:
+            self.requests.append(request.path_qs)
+            data = [
+                m for m in self.models
+                if request.query.get('name', m['name']) == m['name'] and request.query.get('version', m['version']) == m['version']
+            ]
+            if request.query.get('omitContent') == 'true':
+                data = [{k: v for k, v in m.items() if k != 'json'} for m in data]
+            return web.Response(body=orjson.dumps({'data': data, 'number': 0, 'last': True}), content_type='application/json')
+
+        self.presets = [_preset(i) for i in range(25)]
+        self.requested_pages: list[int] = []
+        self.page_delay = 0.0
+        self.pages_in_flight = self.max_pages_in_flight = 0
+
+        async def get_presets(request: web.Request) -> web.Response:
+            page, page_size = int(request.query['page']), int(request.query['pageSize'])
+            self.requested_pages.append(page)
+            self.requests.append(request.path_qs)
+            self.pages_in_flight += 1
+            self.max_pages_in_flight = max(self.max_pages_in_flight, self.pages_in_flight)
+            try:
+                await asyncio.sleep(self.page_delay)
+            finally:
+                self.pages_in_flight -= 1
+            total_pages = math.ceil(len(self.presets) / page_size)
+            presets = self.presets[::-1] if request.query.get('orderDir') == 'desc' else self.presets  # newest last, like creationDate
+            response = web.Response(body=orjson.dumps({
+                'data': presets[page * page_size:(page + 1) * page_size],
+                'number': page, 'totalPages': total_pages, 'last': page >= total_pages - 1
+            }), content_type='application/json')
+            response.enable_compression()  # as negotiated by Accept-Encoding
+            return response
+
+        self.job_polls = 0
+
+        async def put_group_job(request: web.Request) -> web.Response:
+            if 'jobId' not in request.match_info:
+                self.assertEqual(orjson.loads(await request.read()), {'presetId': 'p1'})
+            else:
+                self.job_polls += 1
+            status = 'DONE' if self.job_polls >= 3 else 'PROCESSING'
+            return web.Response(body=orjson.dumps({'id': 'job1', 'instanceOf': 'Model:1.0.0', 'status': status}), content_type='application/json')
+
+        self.device_responses = [(429, {'Retry-After': '0'}), (503, {}), (200, {})]
+        self.model_posts = 0
+        self.model_post_responses = [(500, {})]
+
+        async def get_devices(_request: web.Request) -> web.Response:
+            status, headers = self.device_responses.pop(0)
+            body = {'data': [], 'number': 0, 'last': True} if status == 200 else {'error': 'slow down'}
+            return web.Response(status=status, headers=headers, body=orjson.dumps(body), content_type='application/json')
+
+        async def post_model(_request: web.Request) -> web.Response:
+            self.model_posts += 1
+            status, headers = self.model_post_responses.pop(0) if len(self.model_post_responses) > 1 else self.model_post_responses[0]
+            return web.Response(status=status, headers=headers, body=b'{"error":"boom"}', content_type='application/json')
+
+        self.mapping_jobs: dict[str, dict] = {}  # id -> {'polls_left', 'preset', 'error'}
+
+        async def post_mapping_job(request: web.Request) -> web.Response:
+            body = orjson.loads(await request.read())
+            job_id = f'job{len(self.mapping_jobs)}'
+            preset = {'id': f'p{100 + len(self.mapping_jobs)}', 'modelId': 'm1', **body}
+            self.mapping_jobs[job_id] = {'polls_left': 3, 'preset': preset, 'error': 'invalid' if body['name'] == 'Broken' else None}
+            return web.Response(body=orjson.dumps({'id': job_id, 'status': 'PROCESSING'}), content_type='application/json')
+
+        async def get_mapping_job(request: web.Request) -> web.Response:
+            job_id = request.match_info['jobId']
+            job = self.mapping_jobs[job_id]
+            job['polls_left'] -= 1
+            status = 'PROCESSING'
+            if job['polls_left'] <= 0:
+                status = 'ERROR' if job['error'] else 'DONE'
+                if status == 'DONE' and job['preset'] not in self.presets:
+                    self.presets.append(job['preset'])
+            return web.Response(body=orjson.dumps({'id': job_id, 'status': status, 'error': job['error']}), content_type='application/json')
+
+        self.request_encodings: list[str | None] = []
+
+        async def put_model(request: web.Request) -> web.Response:
+            self.request_encodings.append(request.headers.get('Content-Encoding'))
+            if request.headers.get('Content-Encoding') is not None:
+                return web.Response(status=415, body=b'{"error":"unsupported"}', content_type='application/json')
+            model = orjson.loads(await request.read()) | {'id': request.match_info['id'], 'version': '1.1.0'}
+            return web.Response(body=orjson.dumps({'value': model}), content_type='application/json')
+
+        async def post_preset(request: web.Request) -> web.Response:
+            self.request_encodings.append(request.headers.get('Content-Encoding'))
+            preset = {'id': f'p{len(self.presets)}', 'modelId': 'm1', **orjson.loads(await request.read())}
+            self.presets.append(preset)
+            return web.Response(body=orjson.dumps(preset), content_type='application/json')
+
+        app = web.Application()
+        app.router.add_post('/svc/mappings/api/v1/mappings/async', post_mapping_job)
+        app.router.add_get('/svc/mappings/api/v1/mappings/async/{jobId}', get_mapping_job)
+        app.router.add_post('/svc/mappings/api/v1/presets', post_preset)
+        app.router.add_put('/svc/mappings/api/v1/models/{id}', put_model)
+        app.router.add_get('/svc/mappings/api/v1/devices', get_devices)
+        app.router.add_post('/svc/mappings/api/v1/models', post_model)
+        app.router.add_put('/svc/mappings/api/v1/devices/groups/{group}/async', put_group_job)
+        app.router.add_put('/svc/mappings/api/v1/devices/groups/{group}/async/{jobId}', put_group_job)
+        app.router.add_get('/svc/mappings/api/v1/models', get_models)
+        app.router.add_get('/svc/mappings/api/v1/presets', get_presets)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    def _client(self, **kwargs) -> CorvinaClient:
+        return CorvinaClient(
+            org='test', username='user', token='token', corvina_suffix='.io', corvina_prefix='',
+            base_url=str(self.server.make_url('/svc/mappings/')), **kwargs
+        )
+
+    async def test_connection_reuse(self):
+        async with self._client() as client:
+            for _ in range(5):
+                self.assertEqual(list(await client.get_datamodels_by_id()), ['m1', 'm2'])
+
+        self.assertEqual(client.stats.requests, 5)
+        self.assertEqual(client.stats.connections_created, 1)
+        self.assertEqual(client.stats.connections_reused, 4)
+
+    async def test_requires_context_manager(self):
+        with self.assertRaises(AssertionError):
+            await self._client().get_datamodels_by_id()
+
+    async def test_paging_collects_every_page(self):
+        async with self._client(page_size=10, page_prefetch=2) as client:
+            presets = await client.get_presets_by_id()
+
+        self.assertEqual(list(presets), [p['id'] for p in self.presets])  # nothing dropped, order kept
+        self.assertEqual(sorted(self.requested_pages), [0, 1, 2])
+
+    async def test_paging_stops_early(self):
+        async with self._client(page_size=10, page_prefetch=1) as client:
+            async with contextlib.aclosing(client.iter_presets()) as presets:
+                async for preset in presets:
+                    if preset.name == 'Preset3':
+                        break
+
+        self.assertEqual(preset.id, 'p3')
+        self.assertLessEqual(max(self.requested_pages), 1)  # page 0, plus at most the prefetched one
+
+    async def test_paging_prefetch_bound(self):
+        self.page_delay = 0.02
+        for prefetch in (0, 1, 3):
+            self.max_pages_in_flight = 0
+            async with self._client(page_size=5, page_prefetch=prefetch) as client:
+                async with contextlib.aclosing(client.iter_presets()) as presets:
+                    async for _ in presets:
+                        await asyncio.sleep(0.01)  # a slow consumer: the prefetched pages are all pending
+
+            self.assertEqual(self.max_pages_in_flight, max(prefetch, 1), f'page_prefetch={prefetch}')
+
+    async def test_targeted_lookups(self):
+        model = DataModelRoot.from_dict(self.models[1] | {'id': None})
+        mapping = MappingRoot.from_dict(_preset(3) | {'id': None})
+        async with self._client() as client:
+            await model.maybe_fetch_id(client)
+            self.assertEqual(self.requests, ['/svc/mappings/api/v1/models?organization=test&name=Model&version=1.1.0&omitContent=true&page=0&pageSize=10'])
+
+            await mapping.maybe_fetch_id(client)
+            self.assertEqual(len(self.requests), 3)  # model id, then only the presets of that model
+            self.assertIn('modelId=m1', self.requests[2])
+
+            self.assertEqual(await client.find_datamodel_id('Model', '1.1.0'), 'm2')  # cached
+            self.assertIsNone(await client.find_datamodel_id('Model', '9.9.9'))
+            self.assertIsNone(await client.find_datamodel_id('Model', '9.9.9'))  # a cached None
+            self.assertEqual(len(self.requests), 4)
+            self.assertEqual((client._lookup_cache.hits, client._lookup_cache.misses), (2, 4))  # each lookup counted once
+
+        self.assertEqual((model.id, mapping.id), ('m2', 'p3'))
+
+    async def test_latest_preset_is_the_newest_duplicate(self):
+        self.presets.append(_preset(3) | {'id': 'p3-new', 'modelId': 'm2', 'data': {**_preset(3)['data'], 'instanceOf': 'Model:1.1.0'}})
+        self.presets.append(self.presets[-1] | {'id': 'p3-newer'})
+        async with self._client() as client:
+            preset = await client.find_latest_preset('Preset3', 'Model')
+
+        self.assertEqual(preset.id, 'p3-newer')
+        self.assertIn('orderBy=creationDate&orderDir=desc', self.requests[-1])
+
+    async def test_device_group_job_polling(self):
+        mapping = MappingRoot.from_dict(_preset(1))
+        async with self._client(job_poll_initial_delay=0.01, job_poll_max_delay=0.02) as client:
+            job = await client.set_device_group_mapping('Plant', mapping)
+            self.assertFalse(job.is_finished)
+            job = await client.wait_device_group_job('Plant', job)
+
+        self.assertEqual(job.status, DeviceGroupConfigJobStatus.DONE)
+        self.assertEqual(self.job_polls, 3)
+
+    async def test_retries(self):
+        async with self._client(retry_base_delay=0.001) as client:
+            self.assertEqual(await client.get_devices_by_id(), {})
+            self.assertEqual((client.stats.retries, client.stats.throttled_responses), (2, 2))
+
+            # POST is not idempotent: a server error is not retried
+            with self.assertRaises(AssertionError):
+                await client.create_data_model(DataModelRoot.from_dict(self.models[0]))
+            self.assertEqual(self.model_posts, 1)
+
+    async def test_post_retries_only_when_throttled(self):
+        async with self._client(retry_base_delay=0.001) as client:
+            # a plain 503 may come from a gateway after the model was created: retrying could create it twice
+            self.model_post_responses = [(503, {})]
+            with self.assertRaises(AssertionError):
+                await client.create_data_model(DataModelRoot.from_dict(self.models[0]))
+            self.assertEqual(self.model_posts, 1)
+
+            self.model_posts = 0
+            self.model_post_responses = [(429, {}), (503, {'Retry-After': '0'}), (500, {})]
+            with self.assertRaises(AssertionError):
+                await client.create_data_model(DataModelRoot.from_dict(self.models[0]))
+            self.assertEqual(self.model_posts, 3)
+            self.assertEqual(client.stats.throttled_responses, 2)
+
+    async def test_big_presets_use_async_mapping_jobs(self):
+        model = DataModelRoot.from_dict(self.models[0])
+        mapping = MappingRoot.from_dict(_preset(0) | {'id': None, 'name': 'Big'})
+        small_mapping = MappingRoot.from_dict(_preset(0) | {'id': None, 'name': 'Small'})
+        async with self._client(async_mapping_threshold=50, job_poll_initial_delay=0.02, job_poll_max_delay=0.05) as client:
+            other_work_done = asyncio.Event()
+
+            async def _other_work():
+                for _ in range(3):
+                    await client.get_datamodels_by_id()
+                other_work_done.set()
+
+            async def _create():
+                preset = await client.create_preset(model, mapping)
+                self.assertTrue(other_work_done.is_set())  # requests kept flowing while the job was polled
+                return preset
+
+            preset, _ = await asyncio.gather(_create(), _other_work())
+            self.assertEqual((preset.id, preset.name), ('p100', 'Big'))
+
+            client._async_mapping_threshold = 10_000
+            self.assertEqual((await client.create_preset(model, small_mapping)).name, 'Small')  # plain POST
+
+        self.assertEqual(len(self.mapping_jobs), 1)
+
+    async def test_failed_mapping_job(self):
+        mapping = MappingRoot.from_dict(_preset(0) | {'id': None, 'name': 'Broken'})
+        async with self._client(async_mapping_threshold=1, job_poll_initial_delay=0.01, job_poll_max_delay=0.01) as client:
+            with self.assertRaisesRegex(AssertionError, 'invalid'):
+                await client.create_preset(DataModelRoot.from_dict(self.models[0]), mapping)
+
+    async def test_compressed_transfers(self):
+        properties = {f'Leaf{i}': {'type': 'integer', 'version': '1.0.0'} for i in range(50)}
+        model = DataModelRoot.from_dict(self.models[0] | {'json': {'type': 'object', 'instanceOf': 'Model:1.0.0', 'properties': properties}})
+        async with self._client(gzip_request_threshold=256) as client:
+            presets = await client.get_presets_by_id()
+            self.assertEqual(len(presets), len(self.presets))
+            self.assertLess(client.stats.wire_bytes_received, client.stats.bytes_received)
+
+            mapping = MappingRoot.from_dict(_preset(0) | {'id': None, 'name': 'Zipped', 'data': {'type': 'object', 'instanceOf': 'Model:1.0.0', 'properties': properties}})
+            with count_uploads() as uploads:
+                self.assertEqual((await client.create_preset(model, mapping)).data.properties.keys(), properties.keys())  # gzipped by the server side
+            self.assertLess(client.stats.wire_bytes_sent, client.stats.bytes_sent)
+            self.assertEqual((uploads.requests, uploads.bytes_sent), (1, client.stats.bytes_sent))  # GETs carry no body
+            self.assertLess(uploads.wire_bytes_sent, uploads.bytes_sent)
+
+            # refused once: sent again uncompressed, and from then on
+            self.assertEqual((await client.update_data_model_by_id('m1', model)).version, '1.1.0')
+            await client.update_data_model_by_id('m1', model)
+
+        self.assertEqual(self.request_encodings, ['gzip', 'gzip', None, None])
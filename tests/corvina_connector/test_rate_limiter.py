@@ -0,0 +1,32 @@
+import time
+import unittest
+
+from corvina_connector.rate_limiter import AdaptiveTokenBucket, backoff_delay, parse_retry_after
+
+
+class AdaptiveTokenBucketTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def test_rate_adapts(self):
+        bucket = AdaptiveTokenBucket(max_rate=100.0, burst=2, min_rate=10.0, increase_step=30.0)
+        await bucket.acquire()
+        await bucket.acquire()  # burst
+
+        bucket.on_throttled(0.05)
+        self.assertEqual(bucket.rate, 50.0)
+        start = time.monotonic()
+        await bucket.acquire()  # paused by Retry-After
+        self.assertGreaterEqual(time.monotonic() - start, 0.045)
+
+        for _ in range(3):
+            bucket.on_throttled(None)
+        self.assertEqual(bucket.rate, 10.0)  # never below min_rate
+        for _ in range(5):
+            bucket.on_success()
+        self.assertEqual(bucket.rate, 100.0)  # never above max_rate
+
+    def test_retry_after_and_backoff(self):
+        self.assertEqual(parse_retry_after('3'), 3.0)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)  # in the past
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertIsNone(parse_retry_after(None))
+        self.assertTrue(all(0 <= backoff_delay(10, 0.5, 4.0) <= 4.0 for _ in range(100)))
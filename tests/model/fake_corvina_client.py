@@ -0,0 +1,157 @@
+import asyncio
+import itertools
+
+import orjson
+
+from corvina_connector.corvina_client import record_upload
+from model.datamodel.datamodel_root import DataModelRoot
+from model.device.corvina_device import CorvinaDevice
+from model.mapping.mapping_root import MappingRoot
+from utils.corvina_version_utils import version_re
+from utils.payload_utils import dumps_payload
+
+
+class FakeCorvinaClient:
+    """
+    In-memory stand-in for CorvinaClient, implementing only the calls used by CorvinaManager.
+    Every call sleeps a little so that concurrent callers overlap, and the maximum number of in-flight calls is tracked.
+    """
+
+    def __init__(self, latency: float = 0.01):
+        self.models: dict[str, DataModelRoot] = {}
+        self.presets: dict[str, MappingRoot] = {}
+        self.devices: dict[str, CorvinaDevice] = {}
+        self.calls: list[tuple[str, str]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._latency = latency
+        self._ids = itertools.count()
+
+    async def _call(self, op: str, target: str):
+        self.calls.append((op, target))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self._latency)
+        finally:
+            self.in_flight -= 1
+
+    def _store(self, name: str, version: str, data_model: DataModelRoot, model_id: str | None = None) -> DataModelRoot:
+        model_id = model_id or f'id{next(self._ids)}'
+        raw = dumps_payload(data_model.get_create_model_payload())
+        record_upload(len(raw), len(raw))
+        payload = orjson.loads(raw)
+        payload.update(id=model_id, name=name, version=version)
+        stored = DataModelRoot.from_dict(payload)
+        stored.data.instanceOf = f'{name}:{version}'
+        self.models[model_id] = stored
+        return stored
+
+    def add_model_tree(self, data_model: DataModelRoot):
+        """ Stores the provided model and all its sub models, as if it were deployed at version 1.0.0 """
+        self._store(data_model.clear_name, data_model.version, data_model)
+        for sub_model in data_model.get_intermediate_elems():
+            node = self._find_node(data_model.data, sub_model)
+            self._store(version_re.match(sub_model)[1], version_re.match(sub_model)[2], DataModelRoot.from_intermediate_node(node))
+
+    @staticmethod
+    def _find_node(node, instance_of: str):
+        for child in node.get_tree_node_children().values():
+            if getattr(child, 'instanceOf', None) == instance_of:
+                return child
+            found = FakeCorvinaClient._find_node(child, instance_of)
+            if found is not None:
+                return found
+        return None
+
+    async def iter_devices(self):
+        await self._call('iter_devices', '*')
+        for device in list(self.devices.values()):
+            yield device
+
+    async def set_device_mapping(self, device_id: str, mapping: MappingRoot):
+        await self._call('set_device_mapping', device_id)
+        assert device_id in self.devices, f'Unknown device {device_id}'
+        self.devices[device_id].presetId = mapping.id
+
+    async def iter_datamodels(self):
+        await self._call('iter_datamodels', '*')
+        for model in list(self.models.values()):
+            yield model
+
+    async def iter_datamodel_keys(self):
+        await self._call('iter_datamodel_keys', '*')
+        for model in list(self.models.values()):
+            yield model.id, model.name, model.version
+
+    async def get_datamodels_from_ids(self, data_model_ids) -> list[DataModelRoot]:
+        data_model_ids = list(data_model_ids)
+        await self._call('get_datamodels_from_ids', ','.join(data_model_ids))
+        return [self.models[i] for i in data_model_ids]
+
+    async def get_datamodels_by_id(self) -> dict[str, DataModelRoot]:
+        await self._call('get_datamodels_by_id', '*')
+        return dict(self.models)
+
+    async def get_datamodel_from_name(self, name: str) -> list[DataModelRoot]:
+        await self._call('get_datamodel_from_name', name)
+        return [m for m in self.models.values() if m.name == name]
+
+    async def create_data_model(self, data_model: DataModelRoot) -> DataModelRoot:
+        await self._call('create_data_model', data_model.clear_name)
+        return self._store(data_model.clear_name, data_model.version, data_model)
+
+    async def update_data_model_by_id(self, data_model_id: str, new_data_model: DataModelRoot) -> DataModelRoot:
+        await self._call('update_data_model_by_id', new_data_model.clear_name)
+        major, minor, _ = self.models[data_model_id].version.split('.')
+        return self._store(new_data_model.clear_name, f'{major}.{int(minor) + 1}.0', new_data_model, data_model_id)
+
+    async def delete_data_model(self, data_model: DataModelRoot, catalog=None):
+        await self._call('delete_data_model', data_model.clear_name)
+        for model_id, m in list(self.models.items()):
+            if m.name == data_model.clear_name and m.version == data_model.version:
+                del self.models[model_id]
+                if catalog is not None:
+                    catalog.remove(model_id)
+
+    async def create_preset(self, data_model: DataModelRoot, mapping: MappingRoot) -> MappingRoot:
+        await self._call('create_preset', mapping.name)
+        raw = dumps_payload(mapping.get_create_mapping_payload(data_model))
+        record_upload(len(raw), len(raw))
+        preset = MappingRoot.from_dict(orjson.loads(raw))
+        preset.id = f'id{next(self._ids)}'
+        self.presets[preset.id] = preset
+        return preset
+
+    async def delete_data_model_by_id(self, data_model_id: str):
+        await self._call('delete_data_model_by_id', data_model_id)
+        model = self.models[data_model_id]
+        reference = f'{model.name}:{model.version}'
+        users = [m.name for m in self.models.values() if reference in m.get_intermediate_elems()]
+        assert len(users) == 0, f'Model {reference} still referenced by {users}'
+        del self.models[data_model_id]
+
+    async def iter_presets(self, **filters):
+        await self._call('iter_presets', '*')
+        for preset in list(self.presets.values()):
+            yield preset
+
+    async def find_preset_id(self, name: str, instance_of: str) -> str | None:
+        await self._call('find_preset_id', name)
+        return next((p.id for p in reversed(self.presets.values()) if p.name == name and p.data.instanceOf == instance_of), None)
+
+    async def find_latest_preset(self, name: str, model_name: str) -> MappingRoot | None:
+        await self._call('find_latest_preset', name)
+        versions = [m for m in self.models.values() if m.name == model_name]
+        if len(versions) == 0:
+            return None
+        latest = max(versions, key=lambda m: tuple(int(v) for v in m.version.split('.')))
+        newest_first = reversed(self.presets.values())  # as ordered by creationDate desc
+        return next((p for p in newest_first if p.name == name and p.data.instanceOf == f'{model_name}:{latest.version}'), None)
+
+    async def delete_preset(self, mapping: MappingRoot):
+        await self._call('delete_preset', mapping.name)
+
+    async def delete_preset_by_id(self, preset_id: str):
+        await self._call('delete_preset_by_id', preset_id)
+        del self.presets[preset_id]
@@ -0,0 +1,36 @@
+import pathlib
+
+import orjson
+
+from model.corvina_manager import CorvinaManager
+from model.datamodel.datamodel_root import DataModelRoot
+from model.mapping.mapping_root import MappingRoot
+from tests.model.fake_corvina_client import FakeCorvinaClient
+
+SAMPLE_FILES = pathlib.Path(__file__).parents[2] / 'sample_files'
+
+
+def load_sample(name: str) -> dict:
+    return orjson.loads((SAMPLE_FILES / name).read_bytes())
+
+
+def load_model(name: str) -> DataModelRoot:
+    return DataModelRoot.from_dict(load_sample(name))
+
+
+def load_mapping(name: str) -> MappingRoot:
+    return MappingRoot.from_dict(load_sample(name))
+
+
+def deployed_connector(latency: float = 0.01) -> FakeCorvinaClient:
+    """ Fake client holding every model of sample datamodel_1, as left by its first deploy """
+    connector = FakeCorvinaClient(latency=latency)
+    connector.add_model_tree(load_model('datamodel_1.json'))
+    return connector
+
+
+async def deploy_sample_preset(connector: FakeCorvinaClient) -> MappingRoot:
+    """ Syncs sample datamodel_1/mapping_1 on `connector` (see deployed_connector), then forgets the recorded calls """
+    preset = await CorvinaManager(connector, dry_run=False).add_deploy_from_files(load_model('datamodel_1.json'), load_mapping('mapping_1.json'))
+    connector.calls.clear()
+    return preset
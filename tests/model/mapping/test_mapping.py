@@ -1,8 +1,17 @@
 
+import copy
 import json
+import pathlib
 import unittest
 
+import orjson
+
+from model.corvina_datatype import CorvinaDatatype
+from model.mapping.mapping_leaf import MappingLeaf
 from model.mapping.mapping_root import MappingRoot
+from model.mapping.send_policy_dto import SendPolicyDto
+from utils.payload_utils import dumps_payload
+from utils.tree_visit_utils import dfs
 
 
 class MappingRootTestCase(unittest.TestCase):
@@ -15,4 +24,36 @@ class MappingRootTestCase(unittest.TestCase):
         for d in data:
             dm = MappingRoot.from_dict(d)
 
-        self.assertTrue(True)
\ No newline at end of file
+        self.assertTrue(True)
+
+    def test_from_dict_leaves_input_untouched(self):
+        raw = orjson.loads((pathlib.Path(__file__).parents[3] / 'sample_files' / 'mapping_4.json').read_bytes())
+        raw_copy = copy.deepcopy(raw)
+
+        mapping = MappingRoot.from_dict(raw)
+
+        self.assertEqual(raw, raw_copy)
+        self.assertIsNot(mapping.data.properties, raw['data']['properties'])
+        self.assertEqual(MappingRoot.from_dict(orjson.loads(orjson.dumps(mapping))), mapping)
+
+    def test_leaves_share_policies(self):
+        raw = orjson.loads((pathlib.Path(__file__).parents[3] / 'sample_files' / 'mapping_4.json').read_bytes())
+        mapping = MappingRoot.from_dict(raw)
+
+        leaves = []
+        dfs(mapping.data, lambda node, _: leaves.append(node) or True)
+        leaves = [n for n in leaves if isinstance(n, MappingLeaf)]
+        self.assertGreater(len(leaves), 1)
+        self.assertEqual(len({id(leaf.sendPolicy) for leaf in leaves}), 1)
+        self.assertEqual(len({id(leaf.historyPolicy) for leaf in leaves}), 1)
+        self.assertFalse(hasattr(leaves[0], '__dict__'))
+        self.assertEqual(orjson.loads(dumps_payload(mapping.data)), raw['data'])
+
+    def test_policies_keep_unknown_fields(self):
+        leaf = MappingLeaf.from_dict({
+            'version': '1.0.0', 'type': 'integer', 'mode': 'R', 'historyPolicy': {'enabled': False},
+            'sendPolicy': {'triggers': [{'changeMask': 'value', 'minIntervalMs': 1000, 'skipFirstNChanges': 0, 'type': 'onchange', 'sendPolicyMode': ''}]},
+            'datalink': {'source': 'Prova.123'}
+        })
+        self.assertEqual(leaf.sendPolicy['triggers'][0]['sendPolicyMode'], '')
+        self.assertIs(MappingLeaf.create_default('a', CorvinaDatatype.INTEGER).sendPolicy, SendPolicyDto.create_default())
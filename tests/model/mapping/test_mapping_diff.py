@@ -0,0 +1,70 @@
+import unittest
+
+from model.mapping.mapping_diff import diff_mappings
+from model.mapping.mapping_root import MappingRoot
+from tests.model.fixtures import load_sample
+
+
+def _iter_raw_leaves(node: dict, path: str = ''):
+    for name, child in node['properties'].items():
+        child_path = f'{path}.{name}' if path else name
+        if child['type'] == 'object':
+            yield from _iter_raw_leaves(child, child_path)
+        else:
+            yield child_path, child
+
+
+class MappingDiffTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.current = MappingRoot.from_dict(load_sample('mapping_1.json'))
+        self.instance_of = self.current.data.instanceOf
+
+    def test_identical_mappings(self):
+        mapping_diff = diff_mappings(self.current, MappingRoot.from_dict(load_sample('mapping_1.json')), self.instance_of)
+
+        self.assertTrue(mapping_diff.is_empty)
+        self.assertFalse(diff_mappings(self.current, MappingRoot.from_dict(load_sample('mapping_1.json')), 'Other:1.0.0').is_empty)
+
+    def test_policies_as_stored_by_corvina(self):
+        raw = load_sample('mapping_1.json')
+        for _, leaf in _iter_raw_leaves(raw['data']):
+            leaf['sendPolicy'] = {'sendPolicyMode': 'triggers', 'triggers': [dict(t, extraField=1) for t in leaf['sendPolicy']['triggers']]}
+        current = MappingRoot.from_dict(raw)
+
+        self.assertTrue(diff_mappings(current, MappingRoot.from_dict(load_sample('mapping_1.json')), self.instance_of).is_empty)
+
+        raw = load_sample('mapping_1.json')
+        for _, leaf in _iter_raw_leaves(raw['data']):
+            leaf['sendPolicy']['triggers'][0].pop('skipFirstNChanges')  # default value, left out
+        self.assertTrue(diff_mappings(current, MappingRoot.from_dict(raw), self.instance_of).is_empty)
+
+        raw = load_sample('mapping_1.json')  # parsed policies are shared: never edit them once parsed
+        leaf_path, leaf = next(_iter_raw_leaves(raw['data']))
+        leaf['sendPolicy'] = {'triggers': [dict(leaf['sendPolicy']['triggers'][0], minIntervalMs=10)]}
+        self.assertEqual(diff_mappings(current, MappingRoot.from_dict(raw), self.instance_of).changed_leaves, [leaf_path])
+
+    def test_leaf_changes(self):
+        raw = load_sample('mapping_1.json')
+        machine = raw['data']['properties']['S']['properties']['A1']['properties']['PLine2']['properties']['WCell4']['properties']['DriverMachine']
+        leaf_name, leaf = next((k, v) for k, v in machine['properties'].items() if v['type'] != 'object')
+        leaf['datalink'] = dict(leaf['datalink'], source=leaf['datalink']['source'] + '.Edited')
+        machine['properties']['NewLeaf'] = leaf
+        raw['data']['properties']['S2']['properties'].pop('A2')
+
+        mapping_diff = diff_mappings(self.current, MappingRoot.from_dict(raw), self.instance_of)
+
+        self.assertEqual(mapping_diff.changed_leaves, [f'S.A1.PLine2.WCell4.DriverMachine.{leaf_name}'])
+        self.assertEqual(mapping_diff.added_leaves, ['S.A1.PLine2.WCell4.DriverMachine.NewLeaf'])
+        self.assertGreater(len(mapping_diff.removed_leaves), 0)
+        self.assertTrue(all(p.startswith('S2.A2.') for p in mapping_diff.removed_leaves))
+        self.assertFalse(mapping_diff.references_changed)
+
+    def test_sub_model_reference_change(self):
+        raw = load_sample('mapping_1.json')
+        raw['data']['properties']['S']['instanceOf'] = 'PanaTest-Minikube.S:1.1.0'
+
+        mapping_diff = diff_mappings(self.current, MappingRoot.from_dict(raw), self.instance_of)
+
+        self.assertTrue(mapping_diff.references_changed)
+        self.assertEqual(mapping_diff.leaf_changes, 0)
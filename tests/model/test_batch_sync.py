@@ -0,0 +1,43 @@
+import pathlib
+import tempfile
+import unittest
+
+import orjson
+
+from model.batch_sync import DeployStatus, format_results_table, load_batch_jobs, run_batch_sync
+from tests.model.fake_corvina_client import FakeCorvinaClient
+from tests.model.fixtures import SAMPLE_FILES
+
+
+class BatchSyncTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def test_batch_sync(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = pathlib.Path(tmp) / 'manifest.json'
+            manifest.write_bytes(orjson.dumps([
+                {'datamodel': str(SAMPLE_FILES / 'datamodel_4.json'), 'mapping': str(SAMPLE_FILES / 'mapping_4.json')},
+                {'datamodel': str(SAMPLE_FILES / 'datamodel_4.json'), 'mapping': 'missing_mapping.json'},
+            ]))
+            jobs = await load_batch_jobs(str(manifest))
+
+        connector = FakeCorvinaClient()
+        results = await run_batch_sync(connector, jobs, dry_run=False, deploy_concurrency=2)
+
+        self.assertEqual([r.status for r in results], [DeployStatus.SYNCED, DeployStatus.FAILED])
+        self.assertEqual(results[0].deploy_name, 'PanaTest')
+        self.assertIn('missing_mapping.json', results[1].error)
+        self.assertEqual(sum(1 for op, _ in connector.calls if op == 'iter_datamodels'), 1)  # one shared catalog
+        self.assertEqual(len(connector.presets), 1)
+        self.assertTrue(format_results_table(results).endswith('1 synced, 1 failed'))
+
+    async def test_load_jobs_from_directory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ('b', 'a'):
+                (pathlib.Path(tmp) / name).mkdir()
+                (pathlib.Path(tmp) / name / 'datamodel.json').write_text('{}')
+                (pathlib.Path(tmp) / name / 'mapping.json').write_text('{}')
+            (pathlib.Path(tmp) / 'not_a_deploy').mkdir()
+
+            jobs = await load_batch_jobs(tmp)
+
+        self.assertEqual([pathlib.Path(j.datamodel).parent.name for j in jobs], ['a', 'b'])
@@ -1,4 +1,3 @@
-import functools
 import unittest
 
 import orjson
@@ -6,7 +5,10 @@ import orjson
 from model.corvina_manager import CorvinaManager
 from model.datamodel.datamodel_root import DataModelRoot
 from model.mapping.mapping_root import MappingRoot
-from utils.tree_visit_utils import dfs
+from tests.model.fake_corvina_client import FakeCorvinaClient
+from tests.model.fixtures import deployed_connector, load_model
+from utils.tree_index import TreeIndex
+from utils.tree_visit_utils import walk_tree
 
 
 class CorvinaManagerTestCase(unittest.TestCase):
@@ -15,8 +17,39 @@ class CorvinaManagerTestCase(unittest.TestCase):
         upgraded_model = DataModelRoot.from_dict(orjson.loads('{"id":null,"name":"PanaTest-Minikube","data":{"type":"object","instanceOf":"PanaTest-Minikube:1.0.0","properties":{"S":{"type":"object","instanceOf":"PanaTest-Minikube.S:9.9.9","properties":{"A1":{"type":"object","instanceOf":"PanaTest-Minikube.S.A1:9.9.9","properties":{"PLine2":{"type":"object","instanceOf":"PanaTest-Minikube.S.A1.PLine2:9.9.9","properties":{"WCell4":{"type":"object","instanceOf":"PanaTest-Minikube.S.A1.PLine2.WCell4:9.9.9","properties":{"DriverMachine":{"type":"object","instanceOf":"PanaTest-Minikube.S.A1.PLine2.WCell4.DriverMachine:9.9.9","properties":{"IntegerValue":{"version":"1.0.0","type":"integer"},"IntegratedSin":{"version":"1.0.0","type":"double"}}}}}}}}},"A2":{"type":"object","instanceOf":"PanaTest-Minikube.S.A2:9.9.9","properties":{"PLine2":{"type":"object","instanceOf":"PanaTest-Minikube.S.A2.PLine2:9.9.9","properties":{"WCell3":{"type":"object","instanceOf":"PanaTest-Minikube.S.A2.PLine2.WCell3:9.9.9","properties":{"Modbus":{"type":"object","instanceOf":"PanaTest-Minikube.S.A2.PLine2.WCell3.Modbus:9.9.9","properties":{"IntegerValue":{"version":"1.0.0","type":"integer"},"IntegratedSin":{"version":"1.0.0","type":"double"}}}}},"WCell4":{"type":"object","instanceOf":"PanaTest-Minikube.S.A2.PLine2.WCell4:9.9.9","properties":{"DriverMachine":{"type":"object","instanceOf":"PanaTest-Minikube.S.A2.PLine2.WCell4.DriverMachine:9.9.9","properties":{"IntegerValue":{"version":"1.0.0","type":"integer"},"IntegratedSin":{"version":"1.0.0","type":"double"}}}}}}}}}}},"S2":{"type":"object","instanceOf":"PanaTest-Minikube.S2:9.9.9","properties":{"A1":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A1:9.9.9","properties":{"PLine2":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A1.PLine2:9.9.9","properties":{"WCell4":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A1.PLine2.WCell4:9.9.9","properties":{"DriverMachine":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A1.PLine2.WCell4.DriverMachine:9.9.9","properties":{"IntegerValue":{"version":"1.0.0","type":"integer"},"IntegratedSin":{"version":"1.0.0","type":"double"}}}}}}}}},"A2":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A2:9.9.9","properties":{"PLine2":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A2.PLine2:9.9.9","properties":{"WCell4":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A2.PLine2.WCell4:9.9.9","properties":{"DriverMachine":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A2.PLine2.WCell4.DriverMachine:9.9.9","properties":{"IntegerValue":{"version":"1.0.0","type":"integer"},"IntegratedSin":{"version":"1.0.0","type":"double"}}}}}}}}}}}},"label":"","unit":"","description":"","UUID":null,"tags":[]},"deleted":false,"version":"1.0.0"}'))
         mapping = MappingRoot.from_dict(orjson.loads('{"id":null,"name":"PanaTest-Minikube_Mapping","data":{"type":"object","instanceOf":"PanaTest-Minikube:1.0.0","properties":{"S":{"type":"object","instanceOf":"PanaTest-Minikube.S:1.0.0","properties":{"A1":{"type":"object","instanceOf":"PanaTest-Minikube.S.A1:1.0.0","properties":{"PLine2":{"type":"object","instanceOf":"PanaTest-Minikube.S.A1.PLine2:1.0.0","properties":{"WCell4":{"type":"object","instanceOf":"PanaTest-Minikube.S.A1.PLine2.WCell4:1.0.0","properties":{"DriverMachine":{"type":"object","instanceOf":"PanaTest-Minikube.S.A1.PLine2.WCell4.DriverMachine:1.0.0","properties":{"IntegerValue":{"version":"1.0.0","type":"integer","mode":"R","historyPolicy":{"enabled":true},"sendPolicy":{"triggers":[{"changeMask":"value","minIntervalMs":1000,"skipFirstNChanges":0,"type":"onchange"}]},"datalink":{"source":"Minikube.S.A1.PLine2.WCell4.DriverMachine.IntegerValue"}},"IntegratedSin":{"version":"1.0.0","type":"double","mode":"R","historyPolicy":{"enabled":true},"sendPolicy":{"triggers":[{"changeMask":"value","minIntervalMs":1000,"skipFirstNChanges":0,"type":"onchange"}]},"datalink":{"source":"Minikube.S.A1.PLine2.WCell4.DriverMachine.IntegratedSin"}}}}}}}}}},"A2":{"type":"object","instanceOf":"PanaTest-Minikube.S.A2:1.0.0","properties":{"PLine2":{"type":"object","instanceOf":"PanaTest-Minikube.S.A2.PLine2:1.0.0","properties":{"WCell3":{"type":"object","instanceOf":"PanaTest-Minikube.S.A2.PLine2.WCell3:1.0.0","properties":{"Modbus":{"type":"object","instanceOf":"PanaTest-Minikube.S.A2.PLine2.WCell3.Modbus:1.0.0","properties":{"IntegerValue":{"version":"1.0.0","type":"integer","mode":"R","historyPolicy":{"enabled":true},"sendPolicy":{"triggers":[{"changeMask":"value","minIntervalMs":1000,"skipFirstNChanges":0,"type":"onchange"}]},"datalink":{"source":"Minikube.S.A2.PLine2.WCell3.Modbus.IntegerValue"}},"IntegratedSin":{"version":"1.0.0","type":"double","mode":"R","historyPolicy":{"enabled":true},"sendPolicy":{"triggers":[{"changeMask":"value","minIntervalMs":1000,"skipFirstNChanges":0,"type":"onchange"}]},"datalink":{"source":"Minikube.S.A2.PLine2.WCell3.Modbus.IntegratedSin"}}}}}},"WCell4":{"type":"object","instanceOf":"PanaTest-Minikube.S.A2.PLine2.WCell4:1.0.0","properties":{"DriverMachine":{"type":"object","instanceOf":"PanaTest-Minikube.S.A2.PLine2.WCell4.DriverMachine:1.0.0","properties":{"IntegerValue":{"version":"1.0.0","type":"integer","mode":"R","historyPolicy":{"enabled":true},"sendPolicy":{"triggers":[{"changeMask":"value","minIntervalMs":1000,"skipFirstNChanges":0,"type":"onchange"}]},"datalink":{"source":"Minikube.S.A2.PLine2.WCell4.DriverMachine.IntegerValue"}},"IntegratedSin":{"version":"1.0.0","type":"double","mode":"R","historyPolicy":{"enabled":true},"sendPolicy":{"triggers":[{"changeMask":"value","minIntervalMs":1000,"skipFirstNChanges":0,"type":"onchange"}]},"datalink":{"source":"Minikube.S.A2.PLine2.WCell4.DriverMachine.IntegratedSin"}}}}}}}}}}}},"S2":{"type":"object","instanceOf":"PanaTest-Minikube.S2:1.0.0","properties":{"A1":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A1:1.0.0","properties":{"PLine2":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A1.PLine2:1.0.0","properties":{"WCell4":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A1.PLine2.WCell4:1.0.0","properties":{"DriverMachine":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A1.PLine2.WCell4.DriverMachine:1.0.0","properties":{"IntegerValue":{"version":"1.0.0","type":"integer","mode":"R","historyPolicy":{"enabled":true},"sendPolicy":{"triggers":[{"changeMask":"value","minIntervalMs":1000,"skipFirstNChanges":0,"type":"onchange"}]},"datalink":{"source":"Minikube.S2.A1.PLine2.WCell4.DriverMachine.IntegerValue"}},"IntegratedSin":{"version":"1.0.0","type":"double","mode":"R","historyPolicy":{"enabled":true},"sendPolicy":{"triggers":[{"changeMask":"value","minIntervalMs":1000,"skipFirstNChanges":0,"type":"onchange"}]},"datalink":{"source":"Minikube.S2.A1.PLine2.WCell4.DriverMachine.IntegratedSin"}}}}}}}}}},"A2":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A2:1.0.0","properties":{"PLine2":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A2.PLine2:1.0.0","properties":{"WCell4":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A2.PLine2.WCell4:1.0.0","properties":{"DriverMachine":{"type":"object","instanceOf":"PanaTest-Minikube.S2.A2.PLine2.WCell4.DriverMachine:1.0.0","properties":{"IntegerValue":{"version":"1.0.0","type":"integer","mode":"R","historyPolicy":{"enabled":true},"sendPolicy":{"triggers":[{"changeMask":"value","minIntervalMs":1000,"skipFirstNChanges":0,"type":"onchange"}]},"datalink":{"source":"Minikube.S2.A2.PLine2.WCell4.DriverMachine.IntegerValue"}},"IntegratedSin":{"version":"1.0.0","type":"double","mode":"R","historyPolicy":{"enabled":true},"sendPolicy":{"triggers":[{"changeMask":"value","minIntervalMs":1000,"skipFirstNChanges":0,"type":"onchange"}]},"datalink":{"source":"Minikube.S2.A2.PLine2.WCell4.DriverMachine.IntegratedSin"}}}}}}}}}}}}},"label":"","unit":"","description":"","UUID":null,"tags":[]},"deleted":null,"modelId":null}'))
 
-        dfs(upgraded_model.data, functools.partial(CorvinaManager._mapping_update_fun, mapping.data))
+        mapping_index = TreeIndex(mapping.data)
+        for node, path, _ in walk_tree(upgraded_model.data):
+            CorvinaManager._mapping_update_fun(mapping_index, node, path)
 
-        print(mapping)
+        self.assertEqual(mapping.data.properties['S2'].properties['A1'].instanceOf, 'PanaTest-Minikube.S2.A1:9.9.9')
 
-        self.assertTrue(True)
\ No newline at end of file
+
+class CorvinaManagerUpgradeTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def _upgrade(self, concurrency: int) -> tuple[FakeCorvinaClient, DataModelRoot]:
+        connector = deployed_connector()
+        current_model = next(m for m in connector.models.values() if m.name == 'PanaTest-Minikube')
+
+        manager = CorvinaManager(connector, dry_run=False, concurrency=concurrency)
+        upgraded = await manager._perform_model_upgrade(current_model, load_model('datamodel_4.json'))
+        return connector, upgraded
+
+    async def test_model_upgrade_runs_siblings_concurrently(self):
+        serial_connector, serial_model = await self._upgrade(concurrency=1)
+        parallel_connector, parallel_model = await self._upgrade(concurrency=8)
+
+        self.assertEqual(serial_connector.max_in_flight, 1)
+        self.assertGreater(parallel_connector.max_in_flight, 1)
+        self.assertEqual(sorted(serial_connector.calls), sorted(parallel_connector.calls))
+        self.assertEqual(orjson.dumps(serial_model), orjson.dumps(parallel_model))
+
+    async def test_model_upgrade_resolves_children_without_lookups(self):
+        connector, upgraded_model = await self._upgrade(concurrency=8)
+
+        self.assertNotIn('get_datamodel_from_name', {op for op, _ in connector.calls})
+        site = upgraded_model.data.properties['S']
+        self.assertEqual(site.instanceOf, 'PanaTest-Minikube.S:1.1.0')
+
+        stored_site = next(m for m in connector.models.values() if m.name == 'PanaTest-Minikube.S' and m.version == '1.1.0')
+        self.assertEqual(stored_site.data.properties['A1'].instanceOf, 'PanaTest-Minikube.S.A1:1.1.0')
+        self.assertEqual(stored_site.data.properties['SiteCommon'].instanceOf, 'PanaTest-Minikube.S.SiteCommon:1.0.0')
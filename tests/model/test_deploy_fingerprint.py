@@ -0,0 +1,93 @@
+import unittest
+
+from model.corvina_manager import CorvinaManager
+from model.datamodel.datamodel_root import DataModelRoot
+from model.deploy_fingerprint import compute_fingerprints, read_fingerprints, set_fingerprints
+from model.deploy_plan import DeployPlan
+from model.mapping.mapping_root import MappingRoot
+from tests.model.fixtures import deploy_sample_preset, deployed_connector, load_mapping, load_model, load_sample
+
+
+def edited_mapping() -> MappingRoot:
+    """ mapping_1 with a different datalink: the model is unchanged """
+    raw = load_sample('mapping_1.json')
+    leaf = next(iter(raw['data']['properties']['S']['properties'].values()))
+    while leaf['type'] == 'object':
+        leaf = next(iter(leaf['properties'].values()))
+    leaf['datalink']['source'] += '.Edited'
+    return MappingRoot.from_dict(raw)
+
+
+class FingerprintTestCase(unittest.TestCase):
+
+    def test_fingerprints_ignore_key_order_ids_and_tags(self):
+        data_model, mapping = load_model('datamodel_1.json'), load_mapping('mapping_1.json')
+        fingerprints = compute_fingerprints(data_model, mapping, False)
+
+        reordered = DataModelRoot.from_dict(dict(reversed(load_sample('datamodel_1.json').items())))
+        reordered.id = 'some-id'
+        set_fingerprints(mapping, 'f', 'm')
+        self.assertEqual(compute_fingerprints(reordered, mapping, False), fingerprints)
+        self.assertEqual(read_fingerprints(mapping), ('f', 'm'))
+
+        deploy, model = compute_fingerprints(data_model, edited_mapping(), False)
+        self.assertNotEqual(deploy, fingerprints[0])
+        self.assertEqual(model, fingerprints[1])
+        self.assertNotEqual(compute_fingerprints(data_model, mapping, True)[1], fingerprints[1])
+
+
+class FingerprintSyncTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.connector = deployed_connector(latency=0)
+        self.first_preset = await deploy_sample_preset(self.connector)
+
+    async def test_unchanged_deploy_is_skipped(self):
+        preset = await CorvinaManager(self.connector, dry_run=False).add_deploy_from_files(
+            load_model('datamodel_1.json'), load_mapping('mapping_1.json')
+        )
+
+        self.assertEqual([op for op, _ in self.connector.calls], ['find_latest_preset'])
+        self.assertEqual(preset.id, self.first_preset.id)
+
+    async def test_mapping_only_change_skips_the_model_diff(self):
+        plan = await CorvinaManager(self.connector, dry_run=False).plan_deploy(load_model('datamodel_1.json'), edited_mapping())
+        self.assertFalse(plan.up_to_date)
+        self.assertEqual(plan.steps, [])
+        plan = DeployPlan.from_json(plan.to_json())
+
+        with self.assertLogs('app.model_manager', 'INFO') as logs:
+            preset = await CorvinaManager(self.connector, dry_run=False).apply_plan(plan)
+
+        self.assertEqual([op for op, _ in self.connector.calls], ['find_latest_preset', 'create_preset', 'delete_preset_by_id'])
+        self.assertEqual(list(self.connector.presets), [preset.id])  # the superseded preset is gone
+        self.assertNotEqual(preset.id, self.first_preset.id)
+        self.assertTrue(any('uploaded' in line and 'in 1 requests' in line for line in logs.output))
+        self.assertEqual(preset.data.instanceOf, self.first_preset.data.instanceOf)
+        self.assertEqual(read_fingerprints(preset), (plan.fingerprint, plan.model_fingerprint))
+        site2 = preset.data.properties['S2']
+        self.assertEqual(site2.instanceOf, self.first_preset.data.properties['S2'].instanceOf)
+
+    async def test_resync_after_a_mapping_change_is_a_no_op(self):
+        changed = await CorvinaManager(self.connector, dry_run=False).add_deploy_from_files(load_model('datamodel_1.json'), edited_mapping())
+        self.connector.calls.clear()
+
+        preset = await CorvinaManager(self.connector, dry_run=False).add_deploy_from_files(load_model('datamodel_1.json'), edited_mapping())
+
+        self.assertEqual([op for op, _ in self.connector.calls], ['find_latest_preset'])
+        self.assertEqual(preset.id, changed.id)
+
+    async def test_model_change_runs_the_full_sync(self):
+        preset = await CorvinaManager(self.connector, dry_run=False).add_deploy_from_files(
+            load_model('datamodel_4.json'), load_mapping('mapping_4.json')
+        )
+
+        self.assertIn('iter_datamodels', {op for op, _ in self.connector.calls})
+        self.assertNotEqual(preset.data.instanceOf, self.first_preset.data.instanceOf)
+
+    async def test_force_runs_the_full_diff(self):
+        await CorvinaManager(self.connector, dry_run=False, skip_unchanged=False).add_deploy_from_files(
+            load_model('datamodel_1.json'), load_mapping('mapping_1.json')
+        )
+
+        self.assertEqual({op for op, _ in self.connector.calls}, {'find_latest_preset', 'iter_datamodels'})  # identical preset: no upload
@@ -0,0 +1,68 @@
+import unittest
+
+import orjson
+
+from model.corvina_manager import CorvinaManager
+from model.datamodel.datamodel_root import DataModelRoot
+from model.deploy_plan import DeployPlan, PlanOp
+from tests.model.fake_corvina_client import FakeCorvinaClient
+from tests.model.fixtures import deployed_connector, load_mapping, load_model
+
+
+class DeployPlanTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def _plan(self) -> tuple[FakeCorvinaClient, DeployPlan]:
+        connector = deployed_connector(latency=0)
+        manager = CorvinaManager(connector, dry_run=False)
+        plan = await manager.plan_deploy(load_model('datamodel_4.json'), load_mapping('mapping_4.json'))
+        return connector, plan
+
+    async def test_plan_is_offline_and_ordered(self):
+        connector, plan = await self._plan()
+
+        self.assertEqual({op for op, _ in connector.calls}, {'find_latest_preset', 'iter_datamodels'})  # only the catalog after the fingerprint check
+        self.assertFalse(plan.new_deploy)
+        self.assertEqual(plan.root_step, f'{PlanOp.UPDATE_MODEL.value}:PanaTest-Minikube')
+
+        seen = set()
+        for step in plan.steps:
+            self.assertTrue(set(step.depends_on) <= seen, f'{step.id} listed before its dependencies')
+            seen.add(step.id)
+        site_step = next(s for s in plan.steps if s.id == f'{PlanOp.UPDATE_MODEL.value}:PanaTest-Minikube.S')
+        self.assertIn(site_step.id, next(s for s in plan.steps if s.id == plan.root_step).depends_on)
+        self.assertEqual(site_step.children['A1'], 'PanaTest-Minikube.S.A1')  # upgraded by the plan itself
+
+    async def test_saved_plan_applies_like_direct_sync(self):
+        connector, plan = await self._plan()
+        saved_plan = DeployPlan.from_json(plan.to_json())
+        self.assertEqual(saved_plan.to_json(), plan.to_json())
+
+        new_mapping = await CorvinaManager(connector, dry_run=False).apply_plan(saved_plan)
+
+        direct_connector = deployed_connector(latency=0)
+        direct_mapping = await CorvinaManager(direct_connector, dry_run=False).add_deploy_from_files(
+            load_model('datamodel_4.json'), load_mapping('mapping_4.json')
+        )
+
+        self.assertEqual(new_mapping.data.instanceOf, direct_mapping.data.instanceOf)
+        self.assertEqual(orjson.dumps(new_mapping.data), orjson.dumps(direct_mapping.data))
+        self.assertEqual(
+            sorted((m.name, m.version) for m in connector.models.values()),
+            sorted((m.name, m.version) for m in direct_connector.models.values())
+        )
+
+    async def test_saved_plan_fetches_unresolved_sub_models(self):
+        connector, plan = await self._plan()
+        saved_plan = DeployPlan.from_json(plan.to_json())
+        root_step = next(s for s in saved_plan.steps if s.id == saved_plan.root_step)
+        shared = DataModelRoot.from_dict({'name': 'Shared', 'version': '1.0.0', 'json': {'type': 'object', 'instanceOf': 'Shared:1.0.0', 'properties': {}}})
+        connector._store('Shared', '1.2.0', shared)  # created after the plan was saved
+        root_step.children['Shared'] = 'Shared'
+        connector.calls.clear()
+
+        await CorvinaManager(connector, dry_run=False).apply_plan(saved_plan)  # fresh manager: no catalog
+
+        self.assertIn(('get_datamodel_from_name', 'Shared'), connector.calls)
+        self.assertNotIn('iter_datamodels', {op for op, _ in connector.calls})
+        root_model = next(m for m in connector.models.values() if m.id == root_step.model_id)
+        self.assertEqual(root_model.data.properties['Shared'].instanceOf, 'Shared:1.2.0')
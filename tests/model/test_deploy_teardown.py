@@ -0,0 +1,79 @@
+import unittest
+
+from model.corvina_manager import CorvinaManager
+from model.deploy_teardown import model_delete_dependencies
+from tests.model.fake_corvina_client import FakeCorvinaClient
+from tests.model.fixtures import deploy_sample_preset, deployed_connector, load_mapping, load_model
+
+
+class DeployTeardownTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def _deploy(self) -> FakeCorvinaClient:
+        connector = deployed_connector()
+        await deploy_sample_preset(connector)
+        connector.max_in_flight = 0
+        return connector
+
+    def test_parents_go_first(self):
+        connector = deployed_connector()
+        models = {m.name: m for m in connector.models.values()}
+
+        dependencies = model_delete_dependencies(models.values())
+
+        self.assertEqual(dependencies[models['PanaTest-Minikube'].id], [])
+        site_id = models['PanaTest-Minikube.S'].id
+        self.assertEqual(dependencies[site_id], [models['PanaTest-Minikube'].id])
+        self.assertIn(site_id, dependencies[models['PanaTest-Minikube.S.A1'].id])
+
+    async def test_remove_by_name(self):
+        connector = await self._deploy()
+        model_count = len(connector.models)
+
+        outcomes = await CorvinaManager(connector, dry_run=False).remove_deploy_by_name('PanaTest')
+
+        self.assertTrue(all(o.ok and not o.skipped for o in outcomes))
+        self.assertEqual(sum(1 for o in outcomes if o.kind == 'model'), model_count)
+        self.assertEqual(connector.models, {})
+        self.assertEqual(connector.presets, {})
+        self.assertGreater(connector.max_in_flight, 1)
+        self.assertFalse(any(op == 'delete_data_model' for op, _ in connector.calls))  # ids resolved up front
+
+    async def test_remove_from_files(self):
+        connector = await self._deploy()
+
+        outcomes = await CorvinaManager(connector, dry_run=False).remove_deploy_from_files(
+            load_model('datamodel_1.json'), load_mapping('mapping_1.json')
+        )
+
+        self.assertTrue(all(o.ok and not o.skipped for o in outcomes))
+        self.assertEqual(connector.models, {})
+        self.assertEqual(connector.presets, {})
+        self.assertEqual([op for op, _ in connector.calls].count('iter_datamodels'), 1)
+
+    async def test_dry_run_deletes_nothing(self):
+        connector = await self._deploy()
+        model_count = len(connector.models)
+
+        outcomes = await CorvinaManager(connector, dry_run=True).remove_deploy_by_name('PanaTest')
+
+        self.assertTrue(all(o.ok and o.skipped for o in outcomes))
+        self.assertEqual(len(connector.models), model_count)
+        self.assertEqual(len(connector.presets), 1)
+
+    async def test_failed_parent_keeps_its_sub_models(self):
+        connector = await self._deploy()
+        site_id = next(i for i, m in connector.models.items() if m.name == 'PanaTest-Minikube.S')
+        delete_data_model_by_id = connector.delete_data_model_by_id
+
+        async def _failing_delete(data_model_id: str):
+            assert data_model_id != site_id, 'Simulated failure'
+            await delete_data_model_by_id(data_model_id)
+
+        connector.delete_data_model_by_id = _failing_delete
+        outcomes = {o.target: o for o in await CorvinaManager(connector, dry_run=False).remove_deploy_by_name('PanaTest')}
+
+        self.assertFalse(outcomes['PanaTest-Minikube.S:1.0.0'].ok)
+        self.assertTrue(outcomes['PanaTest-Minikube:1.0.0'].ok)
+        self.assertFalse(outcomes['PanaTest-Minikube.S.A1:1.0.0'].ok)
+        self.assertTrue(outcomes['PanaTest-Minikube.S.A1:1.0.0'].skipped)
+        self.assertTrue(outcomes['PanaTest-Minikube.S2:1.0.0'].ok)
@@ -0,0 +1,41 @@
+import unittest
+
+from model.device.corvina_device import CorvinaDevice
+from model.fleet_assignment import DeviceSelector, assign_mapping_to_devices
+from model.mapping.mapping_root import MappingRoot
+from tests.model.fake_corvina_client import FakeCorvinaClient
+
+
+def _device(device_id: str, tags: list[str] | None, attributes: dict) -> CorvinaDevice:
+    return CorvinaDevice(
+        id=device_id, deviceId=device_id, realmId='test', deleted=False, orgResourceId='test', label=device_id,
+        creationDate=0, updatedAt=0, lastConnUpdateAt=0, lastConfigUpdateAt=0,
+        configurationApplied=True, configurationSent=True, configurationError='', connected=True,
+        modelId='m', modelVersion='1.0.0', modelName='Model', presetName='Old', presetId='old',
+        attributes=attributes, tags=tags
+    )
+
+
+class FleetAssignmentTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.connector = FakeCorvinaClient()
+        for i in range(20):
+            self.connector.devices[f'd{i}'] = _device(f'd{i}', ['plant'] if i % 2 == 0 else None, {'line': str(i % 4)})
+        self.mapping = MappingRoot.from_dict({'id': 'new', 'name': 'Mapping', 'data': {'type': 'object', 'instanceOf': 'Model:1.0.0', 'properties': {}}})
+
+    async def test_assign_by_selector(self):
+        selector = DeviceSelector(device_ids=['d1', 'missing'], tags=['plant'], attributes={'line': '0'})
+        results = await assign_mapping_to_devices(self.connector, self.mapping, selector, dry_run=False, concurrency=3)
+
+        self.assertEqual([r.target for r in results], ['d1', 'missing', 'd0', 'd4', 'd8', 'd12', 'd16'])
+        self.assertEqual([r.target for r in results if not r.ok], ['missing'])
+        self.assertEqual({d.id for d in self.connector.devices.values() if d.presetId == 'new'}, {'d1', 'd0', 'd4', 'd8', 'd12', 'd16'})
+        self.assertLessEqual(self.connector.max_in_flight, 3)
+
+    async def test_dry_run(self):
+        results = await assign_mapping_to_devices(self.connector, self.mapping, DeviceSelector(tags=['plant']), dry_run=True)
+
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(r.skipped for r in results))
+        self.assertFalse(any(d.presetId == 'new' for d in self.connector.devices.values()))
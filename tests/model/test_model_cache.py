@@ -0,0 +1,49 @@
+import tempfile
+import unittest
+
+from model.datamodel.datamodel_root import DataModelRoot
+from model.model_cache import ModelCache
+from model.model_catalog import ModelCatalog
+from tests.model.fixtures import deployed_connector
+from utils.payload_utils import dumps_payload
+
+
+class ModelCacheTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.connector = deployed_connector(latency=0)
+
+    async def asyncTearDown(self):
+        self.tmp.cleanup()
+
+    def _downloaded(self) -> list[str]:
+        return [t for op, t in self.connector.calls if op == 'get_datamodels_from_ids' and t != '']
+
+    async def _fetch(self) -> ModelCatalog:
+        cache = ModelCache(self.tmp.name, 'test')
+        try:
+            return await ModelCatalog.fetch(self.connector, cache)
+        finally:
+            cache.close()
+
+    async def test_revalidation(self):
+        catalog = await self._fetch()
+        self.assertEqual(len(catalog), len(self.connector.models))
+        self.assertEqual(len(self._downloaded()), 1)
+
+        catalog = await self._fetch()  # everything is still valid: nothing downloaded
+        self.assertEqual(len(self._downloaded()), 1)
+        for model in self.connector.models.values():
+            self.assertEqual(dumps_payload(catalog.get(model.id)), dumps_payload(model))
+
+        removed_id = next(iter(self.connector.models))
+        del self.connector.models[removed_id]
+        new_model = await self.connector.create_data_model(DataModelRoot.from_dict({
+            'name': 'New', 'version': '1.0.0', 'json': {'type': 'object', 'instanceOf': 'New:1.0.0', 'properties': {}}
+        }))
+
+        catalog = await self._fetch()
+        self.assertEqual(self._downloaded()[-1], new_model.id)  # only the new model
+        self.assertNotIn(removed_id, catalog)
+        self.assertEqual(catalog.find('New', '1.0.0').id, new_model.id)
@@ -0,0 +1,42 @@
+
+import unittest
+
+from model.datamodel.datamodel_root import DataModelRoot
+from model.model_catalog import ModelCatalog
+
+
+def _model(model_id: str, name: str, version: str) -> DataModelRoot:
+    return DataModelRoot.from_dict({
+        'id': model_id, 'name': name, 'version': version,
+        'json': {'type': 'object', 'instanceOf': f'{name}:{version}', 'properties': {}}
+    })
+
+
+class ModelCatalogTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = ModelCatalog([
+            _model('a1', 'PanaTest-Minikube', '1.0.0'),
+            _model('a2', 'PanaTest-Minikube', '1.1.0'),
+            _model('b1', 'PanaTest-Minikube.S', '1.0.0'),
+            _model('c1', 'PanaTest2-Minikube', '1.0.0'),
+            _model('d1', 'Other', '1.0.0'),
+        ])
+
+    def test_lookups(self):
+        self.assertEqual(self.catalog.find('PanaTest-Minikube', '1.1.0').id, 'a2')
+        self.assertIsNone(self.catalog.find('PanaTest-Minikube', '2.0.0'))
+        self.assertEqual({m.id for m in self.catalog.find_by_name('PanaTest-Minikube')}, {'a1', 'a2'})
+        self.assertEqual({m.id for m in self.catalog.find_by_prefix('PanaTest-')}, {'a1', 'a2', 'b1'})
+        self.assertEqual(self.catalog.get('d1').name, 'Other')
+
+    def test_updates_in_place(self):
+        self.catalog.add(_model('b2', 'PanaTest-Minikube.S', '1.1.0'))
+        self.assertEqual(self.catalog.find('PanaTest-Minikube.S', '1.1.0').id, 'b2')
+
+        self.catalog.remove('b1')
+        self.catalog.remove('b2')
+        self.assertEqual(self.catalog.find_by_name('PanaTest-Minikube.S'), [])
+        self.assertEqual({m.id for m in self.catalog.find_by_prefix('PanaTest-')}, {'a1', 'a2'})
+        self.assertIsNone(self.catalog.remove('b1'))
+        self.assertEqual(len(self.catalog), 4)
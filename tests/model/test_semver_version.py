@@ -0,0 +1,39 @@
+
+import unittest
+
+from model.semver_version import SemverVersion
+from model.tree.intermediate_node import IntermediateNode
+from utils.corvina_version_utils import split_instance_of
+
+
+class SemverVersionTestCase(unittest.TestCase):
+
+    def test_equality_and_hash(self):
+        self.assertEqual(SemverVersion(1, 2, 3), SemverVersion.from_string('1.2.3'))
+        self.assertNotEqual(SemverVersion(1, 2, 3), SemverVersion(2, 2, 3))
+        self.assertNotEqual(SemverVersion(1, 2, 3), SemverVersion(1, 1, 3))
+        self.assertEqual(len({SemverVersion(1, 2, 3), SemverVersion.from_string('1.2.3'), SemverVersion(1, 3, 2)}), 2)
+
+    def test_ordering(self):
+        versions = [SemverVersion.from_string(v) for v in ['1.10.0', '1.2.0', '0.9.99', '1.2.10', '10.0.0']]
+        self.assertEqual([str(v) for v in sorted(versions)], ['0.9.99', '1.2.0', '1.2.10', '1.10.0', '10.0.0'])
+        self.assertLess(SemverVersion(1, 999, 999), SemverVersion(2, 0, 0))
+        self.assertGreaterEqual(SemverVersion(1, 1, 0), SemverVersion(1, 1, 0))
+
+    def test_split_instance_of(self):
+        for instance_of in ['A.S:1.0.0', 'A.S:1.10.0', 'A.S:12.0.123']:
+            name, version = split_instance_of(instance_of)
+            self.assertEqual(name, 'A.S')
+            self.assertEqual(SemverVersion.from_string(version), SemverVersion.from_instance_of_string(instance_of))
+        self.assertEqual(split_instance_of('A.S:1.10.0'), ('A.S', '1.10.0'))
+        self.assertIsNone(split_instance_of('A.S'))
+        self.assertIsNone(split_instance_of('A.S:1.0'))
+
+        node = IntermediateNode(type='object', instanceOf='A.S:1.10.0', properties={})
+        self.assertEqual((node.get_tree_node_name(), node.get_node_version()), ('A.S', '1.10.0'))
+
+    def test_parsing_is_interned(self):
+        version = SemverVersion.from_string('1.1.0')
+        self.assertIs(version, SemverVersion.from_string('1.1.0'))
+        self.assertIs(version, SemverVersion.from_instance_of_string('PanaTest-Minikube.S:1.1.0'))
+        self.assertIsInstance(version.major, int)
@@ -0,0 +1,107 @@
+import unittest
+
+from model.corvina_manager import CorvinaManager
+from model.deploy_plan import PlanOp
+from model.mapping.mapping_root import MappingRoot
+from model.sub_model_dedup import canonicalize_sub_models, find_duplicate_sub_models, sync_mapping_sub_models
+from model.tree.intermediate_node import IntermediateNode
+from tests.model.fake_corvina_client import FakeCorvinaClient
+from tests.model.fixtures import deployed_connector, load_mapping, load_model
+
+
+def sub_model_references(node: IntermediateNode) -> list[str]:
+    res = []
+    for child in node.properties.values():
+        if isinstance(child, IntermediateNode):
+            res.append(child.instanceOf)
+            res.extend(sub_model_references(child))
+    return res
+
+
+class SubModelDedupTestCase(unittest.TestCase):
+
+    def test_canonicalize_keeps_the_first_occurrence(self):
+        model = load_model('datamodel_1.json')
+        references = sub_model_references(model.data)
+
+        aliases = canonicalize_sub_models(model.data)
+
+        site2 = model.data.properties['S2']
+        self.assertIs(site2.properties['A1'], model.data.properties['S'].properties['A1'])
+        self.assertEqual(aliases['PanaTest-Minikube.S2.A1'], 'PanaTest-Minikube.S.A1')
+        self.assertEqual(aliases['PanaTest-Minikube.S.A2.PLine2.WCell3.Modbus'], 'PanaTest-Minikube.S.A1.PLine2.WCell4.DriverMachine')
+        self.assertNotIn('PanaTest-Minikube.S2.A1.PLine2', aliases)  # replaced along with its parent
+        self.assertLess(len(set(sub_model_references(model.data))), len(set(references)))
+
+    def test_find_duplicates_prefers_known_models(self):
+        model = load_model('datamodel_1.json')
+        site, site2 = model.data.properties['S'], model.data.properties['S2']
+        candidates = [('PanaTest-Minikube.S2.A1', site2.properties['A1']), ('PanaTest-Minikube.S2.A2', site2.properties['A2'])]
+
+        self.assertEqual(find_duplicate_sub_models(candidates), {'PanaTest-Minikube.S2.A2': 'PanaTest-Minikube.S2.A1'})
+        self.assertEqual(find_duplicate_sub_models(candidates, [site.properties['A1']]), {
+            'PanaTest-Minikube.S2.A1': 'PanaTest-Minikube.S.A1',
+            'PanaTest-Minikube.S2.A2': 'PanaTest-Minikube.S.A1'
+        })
+
+    def test_sync_mapping_walks_by_property(self):
+        model = load_model('datamodel_1.json')
+        mapping = load_mapping('mapping_1.json')
+        canonicalize_sub_models(model.data)
+
+        sync_mapping_sub_models(model.data, mapping.data)
+
+        self.assertEqual(mapping.data.properties['S2'].properties['A1'].instanceOf, 'PanaTest-Minikube.S.A1:1.0.0')
+        self.assertEqual(sub_model_references(mapping.data), sub_model_references(model.data))
+
+
+class DedupDeployTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def _upgrade(self, dedup: bool) -> tuple[FakeCorvinaClient, CorvinaManager, MappingRoot]:
+        connector = deployed_connector(latency=0)
+        manager = CorvinaManager(connector, dry_run=False, dedup_sub_models=dedup)
+        plan = await manager.plan_deploy(load_model('datamodel_4.json'), load_mapping('mapping_4.json'))
+
+        seen = set()
+        for step in plan.steps:
+            self.assertTrue(set(step.depends_on) <= seen, f'{step.id} listed before its dependencies')
+            seen.add(step.id)
+        self.assertEqual(len(plan.aliases) > 0, dedup)
+
+        return connector, manager, await manager.apply_plan(plan)
+
+    @staticmethod
+    def _uploads(connector: FakeCorvinaClient) -> int:
+        return sum(1 for op, _ in connector.calls if op in ('create_data_model', 'update_data_model_by_id'))
+
+    async def test_dedup_saves_uploads(self):
+        plain_connector, _, _ = await self._upgrade(dedup=False)
+        dedup_connector, _, mapping = await self._upgrade(dedup=True)
+
+        self.assertLess(self._uploads(dedup_connector), self._uploads(plain_connector))
+        site, site2 = mapping.data.properties['S'], mapping.data.properties['S2']
+        self.assertEqual(site2.properties['A1'].instanceOf, site.properties['A1'].instanceOf)
+
+        # every sub model updated by the plan is referenced by the mapping with its stored version
+        stored = {f'{m.name}:{m.version}' for m in dedup_connector.models.values()}
+        self.assertIn(site.properties['A1'].instanceOf, stored)
+        self.assertIn(site2.instanceOf, stored)
+
+    async def test_dedup_upgrade_is_stable(self):
+        connector, _, _ = await self._upgrade(dedup=True)
+
+        manager = CorvinaManager(connector, dry_run=False, dedup_sub_models=True, skip_unchanged=False)  # full diff
+        plan = await manager.plan_deploy(load_model('datamodel_4.json'), load_mapping('mapping_4.json'))
+
+        self.assertEqual([s.op for s in plan.steps], [PlanOp.UPDATE_MODEL])  # only the root version, as without dedup
+        self.assertEqual(plan.aliases, {})
+
+    async def test_dedup_new_deploy(self):
+        connector = FakeCorvinaClient(latency=0)
+        manager = CorvinaManager(connector, dry_run=False, dedup_sub_models=True)
+        plan = await manager.plan_deploy(load_model('datamodel_4.json'), load_mapping('mapping_4.json'))
+        mapping = await manager.apply_plan(plan)
+
+        self.assertTrue(plan.new_deploy)
+        self.assertGreater(len(plan.aliases), 0)
+        self.assertEqual(sub_model_references(mapping.data), sub_model_references(plan.model.data))
@@ -0,0 +1,44 @@
+import asyncio
+import unittest
+
+from utils.async_utils import critical_path, run_dag
+
+
+class RunDagTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def test_parent_runs_as_soon_as_its_children_are_done(self):
+        # 'fast_parent' only depends on 'fast', so it must not wait for the unrelated (and slower) 'slow' branch
+        dependencies = {'fast': [], 'slow': [], 'fast_parent': ['fast'], 'root': ['fast_parent', 'slow']}
+        delays = {'fast': 0.01, 'slow': 0.1, 'fast_parent': 0.01, 'root': 0.01}
+        events = []
+
+        async def _run(key: str) -> str:
+            events.append(('start', key))
+            await asyncio.sleep(delays[key])
+            events.append(('end', key))
+            return key.upper()
+
+        results = await run_dag(dependencies, _run, limit=4)
+
+        self.assertEqual(results, {k: k.upper() for k in dependencies})
+        self.assertLess(events.index(('end', 'fast_parent')), events.index(('end', 'slow')))
+        self.assertGreater(events.index(('start', 'root')), events.index(('end', 'slow')))
+
+    async def test_failure_cancels_dependents(self):
+        started = []
+
+        async def _run(key: str):
+            started.append(key)
+            if key == 'child':
+                raise ValueError(key)
+            await asyncio.sleep(0.05)
+
+        with self.assertRaises(ValueError):
+            await run_dag({'child': [], 'other': [], 'parent': ['child']}, _run, limit=2)
+        self.assertNotIn('parent', started)
+
+    def test_critical_path(self):
+        dependencies = {'a': [], 'b': [], 'c': ['a', 'b'], 'd': []}
+        timings = {'a': (0.0, 1.0), 'b': (0.0, 3.0), 'c': (3.0, 4.0), 'd': (0.0, 2.0)}
+        self.assertEqual(critical_path(dependencies, timings), ['b', 'c'])
+        self.assertEqual(critical_path(dependencies, {}), [])
@@ -0,0 +1,85 @@
+import unittest
+
+import orjson
+
+from model.datamodel.datamodel_root import DataModelRoot
+from model.mapping.mapping_root import MappingRoot
+from model.tree.intermediate_node import IntermediateNode
+from model.tree.root_node_aux import RootNodeAux
+from tests.model.fixtures import load_sample
+from utils.corvina_version_utils import version_re
+from utils.dict_utils import remove_nulls
+from utils.payload_utils import dumps_payload
+from utils.tree_visit_utils import dfs
+
+
+def legacy_prepare(obj) -> bytes:
+    # The dumps -> loads -> remove_nulls -> dumps round trip dumps_payload replaced
+    data = orjson.loads(orjson.dumps(obj))
+    remove_nulls(data)
+    return orjson.dumps(data)
+
+
+def legacy_create_model_payload(model: DataModelRoot) -> dict:
+    data = orjson.loads(orjson.dumps(model))
+    if not version_re.match(data['name']):
+        data['name'] = data['name'] + ':1.0.0'
+    if not version_re.match(data['data']['instanceOf']):
+        data['data']['instanceOf'] = data['data']['instanceOf'] + ':1.0.0'
+    return data
+
+
+def legacy_create_mapping_payload(mapping: MappingRoot, model: DataModelRoot) -> dict:
+    data = orjson.loads(orjson.dumps(mapping))
+    data['data']['instanceOf'] = model.clear_name + ':' + model.version
+    return data
+
+
+def legacy_root_node_aux(node: IntermediateNode) -> RootNodeAux:
+    d = orjson.loads(orjson.dumps(node))
+    d['properties'] = RootNodeAux.properties_from_dict(d['properties'])
+    return RootNodeAux(**RootNodeAux.remove_extra_fields(d))
+
+
+class PayloadTestCase(unittest.TestCase):
+
+    def test_model_payloads_are_unchanged(self):
+        for i in range(1, 5):
+            model = DataModelRoot.from_dict(load_sample(f'datamodel_{i}.json'))
+            self.assertEqual(dumps_payload(model), legacy_prepare(model))
+            self.assertEqual(dumps_payload(model.get_create_model_payload()), legacy_prepare(legacy_create_model_payload(model)))
+
+            model.id = None  # null fields must be dropped
+            model.name = model.clear_name
+            self.assertEqual(dumps_payload(model.get_create_model_payload()), legacy_prepare(legacy_create_model_payload(model)))
+
+    def test_mapping_payloads_are_unchanged(self):
+        for i in range(1, 5):
+            model = DataModelRoot.from_dict(load_sample(f'datamodel_{i}.json'))
+            mapping = MappingRoot.from_dict(load_sample(f'mapping_{i}.json'))
+            self.assertEqual(dumps_payload(mapping), legacy_prepare(mapping))
+            self.assertEqual(
+                dumps_payload(mapping.get_create_mapping_payload(model)),
+                legacy_prepare(legacy_create_mapping_payload(mapping, model))
+            )
+
+    def test_sub_model_extraction_is_unchanged(self):
+        model = DataModelRoot.from_dict(load_sample('datamodel_4.json'))
+        sub_roots = []
+        dfs(model.data, lambda node, _: sub_roots.append(node) or True)
+        sub_roots = [n for n in sub_roots if isinstance(n, IntermediateNode) and version_re.match(n.instanceOf)]
+        self.assertGreater(len(sub_roots), 1)
+        for node in sub_roots:
+            sub_model = DataModelRoot.from_intermediate_node(node)
+            self.assertIsInstance(sub_model.data, RootNodeAux)
+            self.assertEqual(sub_model.data, legacy_root_node_aux(node))
+            self.assertEqual(dumps_payload(sub_model), legacy_prepare(sub_model))
+            self.assertEqual(
+                dumps_payload(sub_model.get_create_model_payload()),
+                legacy_prepare(legacy_create_model_payload(sub_model))
+            )
+
+    def test_nested_dicts_without_nulls(self):
+        payload = {'a': None, 'b': {'c': None, 'd': [{'e': None}]}, 'f': 1}
+        self.assertEqual(dumps_payload(payload), legacy_prepare(payload))
+        self.assertEqual(payload['b'], {'c': None, 'd': [{'e': None}]})  # input is not modified
@@ -0,0 +1,39 @@
+import unittest
+
+from model.tree.intermediate_node import IntermediateNode
+from tests.model.fixtures import load_model
+from utils.tree_index import TreeIndex, path_key
+
+
+class TreeIndexTestCase(unittest.TestCase):
+
+    def test_lookup(self):
+        model = load_model('datamodel_4.json')
+        index = TreeIndex(model.data)
+
+        a1 = model.data.properties['S'].properties['A1']
+        self.assertIs(index[('S', 'A1')], a1)
+        self.assertIs(index[path_key('PanaTest-Minikube.S.A1')], a1)
+        self.assertIs(index[()], model.data)
+        self.assertIs(index[('S', 'A1', 'PLine2', 'WCell4', 'DriverMachine', 'IntegerValue')], a1.properties['PLine2'].properties['WCell4'].properties['DriverMachine'].properties['IntegerValue'])
+        self.assertNotIn(('S', 'Nope'), index)
+        self.assertIsNone(index.get(('Nope', 'A1')))
+        with self.assertRaises(KeyError):
+            _ = index[('S', 'Nope')]
+        self.assertTrue(all(isinstance(node, IntermediateNode) for _, node in index.items()))
+
+    def test_replace_keeps_index_and_digests_consistent(self):
+        model = load_model('datamodel_4.json')
+        index = TreeIndex(model.data)
+        root_digest = model.data.get_tree_node_digest()
+
+        site2_a1 = index[('S2', 'A1')]
+        new_a1 = index[('S', 'A2')]
+        index.replace(('S2', 'A1'), new_a1)
+
+        self.assertIs(model.data.properties['S2'].properties['A1'], new_a1)
+        self.assertNotIn(('S2', 'A1', 'AreaCommon'), index)  # only in the old subtree
+        self.assertIs(index[('S2', 'A1', 'PLine2', 'WCell3')], new_a1.properties['PLine2'].properties['WCell3'])
+        self.assertTrue(all(node is not site2_a1 for _, node in index.items()))
+        self.assertNotEqual(model.data.get_tree_node_digest(), root_digest)
+        self.assertEqual(len(index), len(TreeIndex(model.data)))
@@ -0,0 +1,59 @@
+import copy
+import unittest
+import unittest.mock
+
+from model.corvina_datatype import CorvinaDatatype
+from model.datamodel.datamodel_leaf import DataModelLeaf
+from model.mapping.mapping_leaf import MappingLeaf
+from model.tree.tree_node import TreeNode
+from tests.model.fixtures import load_model
+from utils.tree_utils import compute_data_model_difference_map
+
+
+class TreeDigestTestCase(unittest.TestCase):
+
+    def test_digest_is_structural(self):
+        model = load_model('datamodel_4.json')
+        same_model = load_model('datamodel_4.json')
+        self.assertEqual(model.get_tree_node_digest(), same_model.get_tree_node_digest())
+
+        # sub models with the same shape share the digest, whatever their name
+        s_driver = model.data.properties['S'].properties['A1'].properties['PLine2'].properties['WCell4']
+        s2_driver = model.data.properties['S2'].properties['A1'].properties['PLine2'].properties['WCell4']
+        self.assertNotEqual(s_driver.instanceOf, s2_driver.instanceOf)
+        self.assertEqual(s_driver.get_tree_node_digest(), s2_driver.get_tree_node_digest())
+
+        leaf = same_model.data.properties['ECommon'].properties
+        leaf_name = next(iter(leaf))
+        leaf[leaf_name] = copy.copy(leaf[leaf_name])
+        leaf[leaf_name].version = '1.1.0'
+        leaf[leaf_name].invalidate_tree_node_digest()
+        same_model.data.properties['ECommon'].invalidate_tree_node_digest()
+        same_model.data.invalidate_tree_node_digest()
+        same_model.invalidate_tree_node_digest()
+        self.assertNotEqual(model.get_tree_node_digest(), same_model.get_tree_node_digest())
+
+    def test_leaf_digest_covers_every_field(self):
+        leaf = DataModelLeaf.from_dict({'version': '1.0.0', 'type': 'integer'})
+        self.assertEqual(leaf.get_tree_node_digest(), DataModelLeaf(version='1.0.0', type=CorvinaDatatype.INTEGER).get_tree_node_digest())
+        self.assertNotEqual(leaf.get_tree_node_digest(), DataModelLeaf(version='1.0.0', type=CorvinaDatatype.DOUBLE).get_tree_node_digest())
+        self.assertNotEqual(leaf.get_tree_node_digest(), DataModelLeaf(version='1.0.0', type=CorvinaDatatype.INTEGER, deprecated=True).get_tree_node_digest())
+
+        mapping_leaf = MappingLeaf.create_default('Tag1', CorvinaDatatype.INTEGER)
+        self.assertEqual(mapping_leaf.get_tree_node_digest(), MappingLeaf.create_default('Tag1', CorvinaDatatype.INTEGER).get_tree_node_digest())
+        self.assertNotEqual(mapping_leaf.get_tree_node_digest(), MappingLeaf.create_default('Tag2', CorvinaDatatype.INTEGER).get_tree_node_digest())
+        self.assertNotEqual(
+            mapping_leaf.get_tree_node_digest(), MappingLeaf.create_default('Tag1', CorvinaDatatype.INTEGER, history_policy=False).get_tree_node_digest()
+        )
+
+    def test_diff_matches_full_walk(self):
+        for old_name, new_name in [('datamodel_1.json', 'datamodel_4.json'), ('datamodel_2.json', 'datamodel_3.json'), ('datamodel_4.json', 'datamodel_4.json')]:
+            diff_map = compute_data_model_difference_map(load_model(old_name), load_model(new_name))
+            with unittest.mock.patch.object(TreeNode, 'get_tree_node_digest', lambda node: id(node)):
+                full_diff_map = compute_data_model_difference_map(load_model(old_name), load_model(new_name))
+
+            self.assertEqual(
+                {k: (v.op, v.path) for k, v in diff_map.items()},
+                {k: (v.op, v.path) for k, v in full_diff_map.items()}
+            )
+        self.assertEqual(diff_map, {})
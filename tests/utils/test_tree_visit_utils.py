@@ -0,0 +1,65 @@
+import sys
+import unittest
+
+from model.datamodel.datamodel_leaf import DataModelLeaf
+from model.tree.intermediate_node import IntermediateNode
+from tests.model.fixtures import load_model
+from utils.tree_visit_utils import bfs, dfs, walk_tree
+
+
+def build_chain(depth: int) -> IntermediateNode:
+    """ A chain of `depth` nested sub models, built without recursion """
+    node = IntermediateNode(type='object', instanceOf=f'Chain.L{depth}:1.0.0', properties={'Value': DataModelLeaf(type='integer', version='1.0.0')})
+    for level in range(depth - 1, -1, -1):
+        node = IntermediateNode(type='object', instanceOf=f'Chain.L{level}:1.0.0', properties={f'L{level + 1}': node})
+    return node
+
+
+class WalkTreeTestCase(unittest.TestCase):
+
+    def test_paths_and_depths(self):
+        model = load_model('datamodel_1.json')
+
+        visited = list(walk_tree(model.data))
+
+        self.assertEqual(visited[0], (model.data, (), 0))
+        for node, path, depth in visited:
+            self.assertEqual(depth, len(path))
+            if isinstance(node, IntermediateNode) and depth > 0:
+                self.assertEqual(node.get_tree_node_name().split('.')[1:], list(path))
+        self.assertEqual(len({id(node) for node, _, _ in visited}), len(visited))
+
+    def test_breadth_first_visits_each_node_once(self):
+        model = load_model('datamodel_1.json')
+        depth_first = list(walk_tree(model.data))
+
+        breadth_first = list(walk_tree(model.data, breadth_first=True))
+        names = []
+        bfs(model.data, lambda node, path: names.append(path) or True)
+
+        self.assertEqual(sorted(path for _, path, _ in breadth_first), sorted(path for _, path, _ in depth_first))
+        self.assertEqual([depth for _, _, depth in breadth_first], sorted(depth for _, _, depth in breadth_first))
+        self.assertEqual(len(names), len(depth_first))
+
+    def test_prune(self):
+        model = load_model('datamodel_1.json')
+
+        visited = [path for _, path, _ in walk_tree(model.data, prune=lambda node, path, depth: depth == 1 or path == ())]
+        self.assertEqual(visited, [()])
+
+        visited = [path for _, path, _ in walk_tree(model.data, prune=lambda node, path, depth: depth == 1)]
+        self.assertEqual(visited, [(), *((name,) for name in model.data.properties)])
+
+    def test_deep_tree_within_recursion_limit(self):
+        depth = sys.getrecursionlimit() * 2
+        root = build_chain(depth)
+
+        *_, (leaf, path, leaf_depth) = walk_tree(root)
+        self.assertIsInstance(leaf, DataModelLeaf)
+        self.assertEqual(leaf_depth, depth + 1)
+        self.assertEqual(path[-2:], (f'L{depth}', 'Value'))
+
+        visited = []
+        dfs(root, lambda node, path: visited.append(path) or len(visited) < 10)  # False stops the visit
+        self.assertEqual(len(visited), 10)
+        self.assertEqual(visited[2], 'L1.L2')